@@ -0,0 +1,441 @@
+"""
+Async Gmail Connector - asyncio variant of GmailConnector
+Speaks IMAP over asyncio streams so many mailboxes and analysis calls share one event loop
+"""
+
+import asyncio
+import imaplib
+import re
+import ssl
+from typing import AsyncIterator, Dict, List, Optional
+
+from config import (
+    GMAIL_IMAP_SERVER, GMAIL_IMAP_PORT, FETCH_BATCH_SIZE, STREAM_BATCH_SIZE, FETCH_MODE,
+    STORE_BATCH_SIZE, DEFAULT_FOLDER, DEFAULT_GMAIL_QUERY
+)
+from gmail_connector import (
+    GmailConnector, BULK_ACTION_STORES, FULL_FETCH_ITEMS, PARTIAL_FETCH_ITEMS
+)
+
+
+# Response parsing, mirroring imaplib's untagged response layout
+LITERAL_RE = re.compile(rb'\{(\d+)\}$')
+UNTAGGED_STATUS_RE = re.compile(rb'^\* (\d+) ([A-Z-]+)(?: (.*))?$', re.DOTALL)
+UNTAGGED_RE = re.compile(rb'^\* ([A-Z-]+)(?: (.*))?$', re.DOTALL)
+RESPONSE_CODE_RE = re.compile(rb'\[([A-Z-]+)(?: ([^\]]*))?\]')
+TAGGED_RE = re.compile(rb'^(\w+) (OK|NO|BAD)(?: (.*))?$', re.DOTALL)
+
+
+class AsyncImapClient:
+    """
+    Minimal IMAP4rev1 client on asyncio streams
+
+    Only covers what the connector needs. Untagged data is collected in
+    the same shape imaplib produces, so GmailConnector's parsers apply as is.
+    """
+
+    def __init__(self, host: str = GMAIL_IMAP_SERVER, port: int = GMAIL_IMAP_PORT):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.untagged_responses: Dict[str, list] = {}
+        self._tag_counter = 0
+        self._lock = asyncio.Lock()
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port, ssl=ssl.create_default_context()
+        )
+        greeting = await self.reader.readline()
+        if not greeting.startswith(b"* OK"):
+            raise imaplib.IMAP4.error(f"Unexpected greeting: {greeting!r}")
+
+    async def login(self, user: str, password: str):
+        status, data = await self.command("LOGIN", _quote(user), _quote(password))
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"LOGIN failed: {data}")
+        return status, data
+
+    async def select(self, mailbox: str, readonly: bool = False):
+        # Responses from the previous mailbox no longer apply
+        self.untagged_responses = {}
+        return await self.command("EXAMINE" if readonly else "SELECT", mailbox, response="EXISTS")
+
+    async def uid(self, command: str, *args):
+        command = command.upper()
+        response = "SEARCH" if command == "SEARCH" else "FETCH"
+        return await self.command("UID", command, *args, response=response)
+
+    async def noop(self):
+        return await self.command("NOOP")
+
+    async def logout(self):
+        try:
+            return await self.command("LOGOUT", response="BYE")
+        finally:
+            self.writer.close()
+
+    def response(self, name: str):
+        """Pop collected untagged data for name, like imaplib.IMAP4.response"""
+        return name, self.untagged_responses.pop(name.upper(), [None])
+
+    async def command(self, name: str, *args, response: Optional[str] = None):
+        """
+        Send a tagged command and collect its untagged responses
+
+        str arguments are sent verbatim, bytes arguments as literals.
+
+        Returns:
+            (status, untagged data for `response` - defaults to the command name)
+        """
+
+        async with self._lock:
+            self._tag_counter += 1
+            tag = f"A{self._tag_counter:04d}".encode()
+
+            line = tag + b" " + name.encode()
+            for arg in args:
+                if arg is None:
+                    continue
+                if isinstance(arg, bytes):
+                    # Literal: announce, wait for the continuation, then send it
+                    self.writer.write(line + b" {" + str(len(arg)).encode() + b"}\r\n")
+                    await self.writer.drain()
+                    continuation = await self.reader.readline()
+                    if not continuation.startswith(b"+"):
+                        raise imaplib.IMAP4.error(f"Literal refused: {continuation!r}")
+                    line = arg
+                else:
+                    line += b" " + arg.encode()
+
+            self.writer.write(line + b"\r\n")
+            await self.writer.drain()
+
+            while True:
+                parts, last_line = await self._read_response()
+                tagged = TAGGED_RE.match(last_line) if not parts else None
+
+                if tagged and tagged.group(1) == tag:
+                    status = tagged.group(2).decode()
+                    key = (response or name).upper()
+                    return status, self.untagged_responses.pop(key, [tagged.group(3)])
+
+                self._store_untagged(parts, last_line)
+
+    async def _read_response(self):
+        """Read one response line plus any literals it carries"""
+
+        parts = []
+        line = await self.reader.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("connection closed")
+        line = line.rstrip(b"\r\n")
+
+        while True:
+            literal = LITERAL_RE.search(line)
+            if not literal:
+                break
+            data = await self.reader.readexactly(int(literal.group(1)))
+            parts.append((line, data))
+            line = (await self.reader.readline()).rstrip(b"\r\n")
+
+        return parts, line
+
+    def _store_untagged(self, parts: list, last_line: bytes):
+        first = parts[0][0] if parts else last_line
+
+        status = UNTAGGED_STATUS_RE.match(first)
+        plain = UNTAGGED_RE.match(first)
+        if status:
+            key, head = status.group(2), status.group(1) + (b" " + status.group(3) if status.group(3) else b"")
+        elif plain:
+            key, head = plain.group(1), plain.group(2) or b""
+            # "* OK [UIDVALIDITY 3857529045]" style response codes
+            code = RESPONSE_CODE_RE.search(head)
+            if key in (b"OK", b"NO", b"BAD") and code:
+                self.untagged_responses.setdefault(code.group(1).decode(), []).append(code.group(2))
+        else:
+            return
+
+        entries = self.untagged_responses.setdefault(key.decode(), [])
+        if parts:
+            entries.append((head, parts[0][1]))
+            entries.extend(parts[1:])
+            entries.append(last_line)
+        else:
+            entries.append(head)
+
+
+class AsyncGmailConnector(GmailConnector):
+    """
+    asyncio variant of GmailConnector
+
+    Same methods (connect, fetch_emails, iter_emails, execute_bulk_actions,
+    star/spam/archive/read, disconnect), awaited. Response parsing, search
+    criteria, sync checkpoints and the message cache are shared with the
+    blocking connector; their SQLite/JSON I/O runs in worker threads so the
+    event loop never blocks on disk. There is no session pool - open more
+    connectors instead.
+
+    IDLE is not supported: the inherited wait_for_new_mail works only on
+    imaplib sessions. Use GmailConnector with IdleWatcher to watch a mailbox.
+    """
+
+    async def connect(self) -> bool:
+        """Establish connection to Gmail IMAP server"""
+
+        print(f"\n🔌 Connecting to Gmail (async)...")
+        print(f"   Server: {GMAIL_IMAP_SERVER}")
+        print(f"   Email: {self.email_address}")
+
+        try:
+            self.imap = AsyncImapClient()
+            await self.imap.open()
+            await self.imap.login(self.email_address, self.password)
+            self.connected = True
+
+            print(f"   ✓ Connection successful!")
+            return True
+
+        except imaplib.IMAP4.error as e:
+            print(f"   ❌ Login failed: {e}")
+            print(f"\n💡 Use an App Password: https://myaccount.google.com/apppasswords")
+            return False
+        except Exception as e:
+            print(f"   ❌ Connection error: {e}")
+            return False
+
+    async def fetch_emails(self, date_range: str = "latest7", batch_size: Optional[int] = None,
+                           fetch_mode: Optional[str] = None, query: Optional[str] = None,
+                           folder: Optional[str] = None) -> List[Dict]:
+        """Fetch emails based on date range (see GmailConnector.fetch_emails)"""
+
+        return [
+            email_data async for email_data in
+            self.iter_emails(date_range, batch_size or FETCH_BATCH_SIZE, fetch_mode, query, folder)
+        ]
+
+    async def iter_emails(self, date_range: str = "latest7", batch_size: Optional[int] = None,
+                          fetch_mode: Optional[str] = None, query: Optional[str] = None,
+                          folder: Optional[str] = None) -> AsyncIterator[Dict]:
+        """Yield emails as each fetch batch arrives (see GmailConnector.iter_emails)"""
+
+        self.last_fetch_total = 0
+
+        if not self.connected:
+            print(f"❌ Not connected to Gmail")
+            return
+
+        folder = folder or DEFAULT_FOLDER
+        query = query if query is not None else DEFAULT_GMAIL_QUERY
+
+        print(f"\n📬 Fetching emails...")
+        print(f"   Range: {date_range}")
+
+        try:
+            mailbox, recent_uids = await self._search_range(date_range, folder, query)
+        except Exception as e:
+            print(f"   ❌ Error fetching emails: {e}")
+            return
+
+        if not recent_uids:
+            return
+
+        self.last_fetch_total = len(recent_uids)
+        self.failed_uids = set()
+
+        ordered_uids = list(reversed(recent_uids))
+        batch_size = max(1, batch_size or STREAM_BATCH_SIZE)
+        fetch_mode = "partial" if (fetch_mode or FETCH_MODE) == "partial" else "full"
+        fetch_batch = self._fetch_batch_partial if fetch_mode == "partial" else self._fetch_batch
+        use_cache = self.message_cache is not None and mailbox['uidvalidity'] is not None
+
+        if use_cache:
+            await asyncio.to_thread(self.message_cache.prune_stale, self.email_address, folder, mailbox['uidvalidity'])
+
+        delivered = set()
+        try:
+            for start in range(0, len(ordered_uids), batch_size):
+                batch = ordered_uids[start:start + batch_size]
+
+                cached = {}
+                if use_cache:
+                    cached = await asyncio.to_thread(
+                        self.message_cache.get_many,
+                        self.email_address, folder, mailbox['uidvalidity'], [int(uid) for uid in batch], fetch_mode
+                    )
+
+                missing = [uid for uid in batch if int(uid) not in cached]
+                fetched = await fetch_batch(missing) if missing else []
+                if use_cache:
+                    await asyncio.to_thread(
+                        self.message_cache.put_many, self.email_address, folder, mailbox['uidvalidity'], fetched, fetch_mode
+                    )
+
+                merged = dict(cached)
+                merged.update((int(email_data['msg_id']), email_data) for email_data in fetched)
+
+                for uid in batch:
+                    if int(uid) in merged:
+                        delivered.add(int(uid))
+                        yield merged[int(uid)]
+        except Exception as e:
+            print(f"   ❌ Error fetching emails: {e}")
+            return
+
+        # Only advance the checkpoint once the delta was consumed, and never past a failed fetch
+        if date_range == "new":
+            await asyncio.to_thread(
+                self._save_checkpoint, mailbox, *self._checkpoint_uids(recent_uids, delivered), self._sync_key(folder, query)
+            )
+
+        print(f"   ✓ Successfully fetched {len(delivered)} emails")
+
+    async def _search_range(self, date_range: str, folder: str, query: str):
+        """Select the folder and find the UIDs for a date range"""
+
+        status, data = await self.imap.select(self._quote(folder))
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"Cannot open folder {folder}: {data}")
+        self.folder = folder
+        mailbox = self._read_mailbox_status()
+
+        criteria, last_uid = self._range_criteria(date_range, mailbox, self._sync_key(folder, query))
+        email_uids = await self._uid_search(criteria, query) if criteria else []
+
+        return mailbox, self._select_range_uids(date_range, email_uids, last_uid)
+
+    async def _uid_search(self, criteria: str, query: Optional[str] = None) -> List[bytes]:
+        """UID SEARCH, narrowed server-side by Gmail search syntax when given"""
+
+        args, literal = self._search_args(criteria, query)
+        if literal is not None:
+            args = args + (literal,)
+
+        status, messages = await self.imap.uid("search", *args)
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"Search failed: {messages}")
+
+        return [uid for line in messages if line for uid in line.split()]
+
+    async def _fetch_batch(self, uids: List[bytes], imap=None) -> List[Dict]:
+        """Fetch a batch of emails with a single UID FETCH round trip"""
+
+        uid_set = b",".join(uids).decode()
+
+        try:
+            status, msg_data = await self.imap.uid("fetch", uid_set, FULL_FETCH_ITEMS)
+            if status != "OK":
+                print(f"   ⚠️  Error fetching batch {uid_set}: {status}")
+                self.failed_uids.update(int(uid) for uid in uids)
+                return []
+        except imaplib.IMAP4.error as e:
+            print(f"   ⚠️  Error fetching batch {uid_set}: {e}")
+            self.failed_uids.update(int(uid) for uid in uids)
+            return []
+
+        fetched = self._parse_full_response(msg_data)
+        return [fetched[int(uid)] for uid in uids if int(uid) in fetched]
+
+    async def _fetch_batch_partial(self, uids: List[bytes], imap=None) -> List[Dict]:
+        """Fetch headers, BODYSTRUCTURE and bounded text snippets for a batch"""
+
+        uid_set = b",".join(uids).decode()
+
+        try:
+            status, msg_data = await self.imap.uid("fetch", uid_set, PARTIAL_FETCH_ITEMS)
+            if status != "OK":
+                print(f"   ⚠️  Error fetching batch {uid_set}: {status}")
+                self.failed_uids.update(int(uid) for uid in uids)
+                return []
+        except imaplib.IMAP4.error as e:
+            print(f"   ⚠️  Error fetching batch {uid_set}: {e}")
+            self.failed_uids.update(int(uid) for uid in uids)
+            return []
+
+        fetched, text_parts = self._parse_partial_response(msg_data)
+
+        for section, parts in text_parts.items():
+            section_set = ",".join(str(uid) for uid in parts)
+            status, body_data = await self.imap.uid("fetch", section_set, self._snippet_fetch_items(section))
+            if status == "OK":
+                self._apply_snippets(fetched, section, parts, body_data)
+
+        return [fetched[int(uid)] for uid in uids if int(uid) in fetched]
+
+    async def execute_bulk_actions(self, results: List[Dict]) -> Dict[str, bool]:
+        """Apply analysis actions with one UID-set STORE per action"""
+
+        groups = {}
+        for result in results:
+            action = result['analysis'].action
+            if action in BULK_ACTION_STORES:
+                groups.setdefault(action, []).append(result['email']['msg_id'])
+
+        outcome = {}
+        for action, msg_ids in groups.items():
+            command, label = BULK_ACTION_STORES[action]
+            print(f"   {action.value}: {len(msg_ids)} email(s)")
+            outcome.update(await self._store_uids(msg_ids, command, label))
+
+        return outcome
+
+    async def _store_uids(self, msg_ids: List[str], command: str, label: str) -> Dict[str, bool]:
+        """Run UID STORE on a set of UIDs and report per-message success"""
+
+        outcome = {}
+        unique_ids = sorted({int(msg_id) for msg_id in msg_ids})
+
+        for start in range(0, len(unique_ids), STORE_BATCH_SIZE):
+            batch = unique_ids[start:start + STORE_BATCH_SIZE]
+
+            try:
+                status, data = await self.imap.uid("store", self._uid_set(batch), command, label)
+            except Exception as e:
+                print(f"   ❌ Bulk {command} {label} failed: {e}")
+                outcome.update({str(uid): False for uid in batch})
+                continue
+
+            outcome.update(self._store_outcome(batch, status, data))
+
+        return outcome
+
+    async def star_email(self, msg_id: str) -> bool:
+        """Star/flag an important email"""
+        return await self._store_one(msg_id, '+FLAGS', '\\Flagged', "star email")
+
+    async def move_to_spam(self, msg_id: str) -> bool:
+        """Move email to spam folder"""
+        return await self._store_one(msg_id, '+X-GM-LABELS', '\\Spam', "move to spam")
+
+    async def archive_email(self, msg_id: str) -> bool:
+        """Archive email (remove from inbox)"""
+        return await self._store_one(msg_id, '+X-GM-LABELS', '\\Archive', "archive")
+
+    async def mark_as_read(self, msg_id: str) -> bool:
+        """Mark email as read"""
+        return await self._store_one(msg_id, '+FLAGS', '\\Seen', "mark as read")
+
+    async def _store_one(self, msg_id: str, command: str, label: str, description: str) -> bool:
+        try:
+            status, _ = await self.imap.uid("store", str(msg_id), command, label)
+            return status == "OK"
+        except Exception as e:
+            print(f"   ❌ Failed to {description}: {e}")
+            return False
+
+    async def disconnect(self):
+        """Close Gmail connection"""
+        if self.imap and self.connected:
+            try:
+                await self.imap.command("CLOSE")
+                await self.imap.logout()
+                print(f"\n👋 Disconnected from Gmail")
+            except Exception:
+                pass
+            self.connected = False
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
@@ -0,0 +1,148 @@
+"""
+Compression Cache - Content-addressed store of ScaleDown results
+In-memory LRU in front of an optional SQLite tier that survives restarts
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from config import (
+    COMPRESSION_CACHE_MAX_ENTRIES, COMPRESSION_CACHE_TTL_SECONDS,
+    COMPRESSION_CACHE_DISK_ENABLED, COMPRESSION_CACHE_DISK_MAX_ENTRIES, COMPRESSION_CACHE_PATH
+)
+from sqlite_store import SqliteStore
+
+
+# Prune the disk tier back under its cap every this many writes
+DISK_PRUNE_INTERVAL = 100
+
+
+class CompressionCache(SqliteStore):
+    """Two-tier cache of compression results keyed by hash(context, prompt, rate)"""
+
+    def __init__(self, max_entries: int = COMPRESSION_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = COMPRESSION_CACHE_TTL_SECONDS,
+                 disk_path: Optional[str] = COMPRESSION_CACHE_PATH if COMPRESSION_CACHE_DISK_ENABLED else None,
+                 disk_max_entries: int = COMPRESSION_CACHE_DISK_MAX_ENTRIES):
+        super().__init__(disk_path)
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.disk_max_entries = disk_max_entries
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key → (stored_at, result)
+        self._writes = 0
+
+        if self._db is not None:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS compressions (
+                    key TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    stored_at REAL NOT NULL
+                )
+            """)
+            self._db.commit()
+
+    @staticmethod
+    def make_key(context: str, prompt: str, rate) -> str:
+        """Content address for a compression request"""
+        raw = json.dumps([context, prompt, rate], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a cached result, promoting disk hits into memory"""
+
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    return dict(entry[1])
+                del self._memory[key]
+
+            if self._db is None:
+                return None
+
+            row = self._db.execute(
+                "SELECT data, stored_at FROM compressions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[1], now):
+                self._db.execute("DELETE FROM compressions WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+
+            result = json.loads(row[0])
+            self._remember(key, row[1], result)
+            return dict(result)
+
+    def put(self, key: str, result: Dict):
+        """Store a successful compression result in both tiers"""
+
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, now, dict(result))
+
+            if self._db is None:
+                return
+
+            self._db.execute(
+                "INSERT OR REPLACE INTO compressions VALUES (?, ?, ?)",
+                (key, json.dumps(result), now)
+            )
+            self._writes += 1
+            if self._writes % DISK_PRUNE_INTERVAL == 0:
+                self._prune_disk(now)
+            self._db.commit()
+
+    def get_statistics(self) -> Dict:
+        """Get entry counts for both tiers"""
+        with self._lock:
+            return {
+                'memory_entries': len(self._memory),
+                'disk_entries': self._size()
+            }
+
+    def _size(self) -> int:
+        return self._count_rows("compressions")
+
+    def _remember(self, key: str, stored_at: float, result: Dict):
+        self._memory[key] = (stored_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - stored_at > self.ttl_seconds
+
+    def _prune_disk(self, now: float):
+        """Drop expired rows, then the oldest rows beyond the size cap"""
+
+        if self.ttl_seconds:
+            self._db.execute("DELETE FROM compressions WHERE stored_at < ?", (now - self.ttl_seconds,))
+        self._db.execute("""
+            DELETE FROM compressions WHERE key IN (
+                SELECT key FROM compressions ORDER BY stored_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.disk_max_entries,))
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_compression_cache() -> CompressionCache:
+    """Process-wide cache, so results outlive individual analyzers (e.g. Streamlit reruns)"""
+
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = CompressionCache()
+        return _shared_cache
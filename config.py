@@ -15,15 +15,135 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 # Email Settings
 GMAIL_IMAP_SERVER = "imap.gmail.com"
 GMAIL_IMAP_PORT = 993
+FETCH_BATCH_SIZE = 100        # Messages per UID FETCH round trip
+STREAM_BATCH_SIZE = 20        # Smaller batches for iter_emails, so analysis starts sooner
+STORE_BATCH_SIZE = 500        # Messages per bulk UID STORE
+IMAP_POOL_SIZE = 4            # Concurrent IMAP sessions for large fetches (1 = off)
+IMAP_POOL_PARALLEL_THRESHOLD = 50  # Only parallelize ranges at least this large
+IMAP_POOL_HEALTH_CHECK_SECONDS = 60  # NOOP pooled sessions idle longer than this
+FETCH_MODE = "partial"        # "partial" (headers + text snippet) or "full" (RFC822)
+DEFAULT_FOLDER = "INBOX"      # Folder or Gmail label to fetch from
+DEFAULT_GMAIL_QUERY = ""      # Gmail search syntax applied server-side (X-GM-RAW)
+IDLE_RENEW_SECONDS = 25 * 60  # Re-issue IDLE before Gmail's 29 minute timeout
+IDLE_POLL_SECONDS = 60        # Poll interval when the server does not support IDLE
+
+# Local State
+DATA_DIR = os.getenv("TRIAGE_DATA_DIR", ".triage_data")
+SYNC_STATE_PATH = os.path.join(DATA_DIR, "sync_state.json")
+MESSAGE_CACHE_ENABLED = True  # Reuse parsed emails across runs (keyed by UIDVALIDITY + UID)
+MESSAGE_CACHE_PATH = os.path.join(DATA_DIR, "messages.db")
+MESSAGE_CACHE_TTL_SECONDS = 30 * 24 * 3600  # Re-download emails cached longer ago than this (0 = never)
+MESSAGE_CACHE_MAX_ENTRIES = 20000  # Oldest cached emails beyond this are dropped (0 = no cap)
+COMPRESSION_CACHE_ENABLED = True  # Reuse ScaleDown results for identical (context, prompt, rate)
+COMPRESSION_CACHE_MAX_ENTRIES = 512  # In-memory LRU size
+COMPRESSION_CACHE_TTL_SECONDS = 7 * 24 * 3600  # 0 = never expire
+COMPRESSION_CACHE_DISK_ENABLED = True  # Keep results across restarts
+COMPRESSION_CACHE_DISK_MAX_ENTRIES = 10000
+COMPRESSION_CACHE_PATH = os.path.join(DATA_DIR, "compressions.db")
+VERDICT_CACHE_ENABLED = True  # Skip compression + AI for emails already analyzed with the same prompt/models
+VERDICT_CACHE_TTL_SECONDS = 30 * 24 * 3600  # 0 = never expire
+VERDICT_CACHE_PATH = os.path.join(DATA_DIR, "verdicts.db")
+NEAR_DUPLICATE_ENABLED = True  # Reuse the verdict of an almost identical analyzed email (MinHash LSH)
+NEAR_DUPLICATE_MIN_SIMILARITY = 0.8  # Estimated Jaccard similarity of word shingles needed for reuse
+NEAR_DUPLICATE_MIN_TOKENS = 20  # Shorter emails are too generic to match
+NEAR_DUPLICATE_SAME_SENDER = True  # Only match emails from the same sender domain
+NEAR_DUPLICATE_MAX_ENTRIES = 20000
+NEAR_DUPLICATE_INDEX_PATH = os.path.join(DATA_DIR, "near_duplicates.db")
+SENDER_REPUTATION_ENABLED = True  # Track verdicts per sender/domain; trusted senders skip the LLM
+SENDER_REPUTATION_MIN_EMAILS = 5  # Verdicts needed before a sender is trusted
+SENDER_REPUTATION_MIN_SHARE = 0.95  # Share of those verdicts in one category (and one action)
+SENDER_REPUTATION_FALLBACK_MIN_SHARE = 0.6  # Looser bar for seeding the keyword fallback
+SENDER_REPUTATION_FAST_PATH_CATEGORIES = ["NEWSLETTER", "PROMOTIONAL", "SPAM", "LOW_PRIORITY"]
+SENDER_REPUTATION_PATH = os.path.join(DATA_DIR, "senders.db")
+SENDER_REPUTATION_RECORDED_TTL_SECONDS = 90 * 24 * 3600  # How long a message stays "already counted"
+# Providers whose domain says nothing about the sender - tracked per address only
+SHARED_MAIL_DOMAINS = [
+    "gmail.com", "googlemail.com", "outlook.com", "hotmail.com", "live.com", "yahoo.com",
+    "icloud.com", "me.com", "aol.com", "proton.me", "protonmail.com", "gmx.com"
+]
+
+# HTTP Settings
+HTTP_POOL_CONNECTIONS = 4     # Hosts to keep connection pools for
+HTTP_POOL_MAXSIZE = 10        # Keep-alive connections per host
+HTTP_USE_HTTP2 = True         # Use HTTP/2 when httpx + h2 are installed
 
 # AI Settings
 MAX_EMAIL_BODY_LENGTH = 2000  # Characters to analyze
+PARTIAL_BODY_BYTES = MAX_EMAIL_BODY_LENGTH * 4  # Snippet bytes (room for base64/multibyte)
 ANALYSIS_TEMPERATURE = 0.3    # Lower = more consistent
 MAX_TOKENS_ANALYSIS = 800     # Token limit for analysis
+SCALEDOWN_RATE = "auto"       # ScaleDown compression rate
+ANALYSIS_CONCURRENCY = 4      # Emails analyzed in parallel (analyze_many, Streamlit fetch page)
+PIPELINE_COMPRESS_WORKERS = 2 # Fetch → compress → analyze pipeline stage sizes
+PIPELINE_ANALYZE_WORKERS = ANALYSIS_CONCURRENCY
+PIPELINE_QUEUE_SIZE = 20      # Emails buffered between stages (backpressure)
+SCALEDOWN_REQUESTS_PER_MINUTE = 300  # Client-side rate limits (0 = unlimited)
+SCALEDOWN_TOKENS_PER_MINUTE = 0
+GEMINI_REQUESTS_PER_MINUTE = 15
+GEMINI_TOKENS_PER_MINUTE = 1000000
+RETRY_MAX_ATTEMPTS = 4        # Attempts per upstream call (429/5xx/timeouts)
+RETRY_BASE_DELAY_SECONDS = 1.0
+RETRY_MAX_DELAY_SECONDS = 30.0
+CIRCUIT_FAILURE_THRESHOLD = 5 # Consecutive failures before an endpoint's circuit opens
+CIRCUIT_RESET_SECONDS = 60    # Cooldown before a half-open probe
+EMAIL_TIME_BUDGET_SECONDS = 120  # Max time upstream calls may spend on one email
+GEMINI_BATCH_SIZE = 10        # Emails per Gemini request in batched analysis
+GEMINI_MODEL_FAILURE_THRESHOLD = 2  # Consecutive failures before a model is benched
+GEMINI_MODEL_COOLDOWN_SECONDS = 120  # How long a failing model is skipped
+GEMINI_MODEL_NOT_FOUND_COOLDOWN_SECONDS = 3600  # How long a 404 model is skipped
+COMPRESSION_MIN_TOKENS = 200  # Send shorter prompts to the LLM uncompressed
+COMPRESSION_MIN_SAVED_MS = None  # e.g. 50: also require this much expected LLM time saved net of the round trip
+LLM_MS_PER_INPUT_TOKEN = 0.3  # Rough LLM prefill cost used by the policy above
+COMPRESS_STATIC_PROMPT = True # Compress the shared analysis instructions once (False = send as is)
+STATIC_PROMPT_RETRY_SECONDS = 300  # After a failed compression, send them uncompressed this long before retrying
+
+# Keyword Rules (weights are summed per email; compiled into one matcher per list)
+SPAM_KEYWORDS = {
+    "win": 1.0, "prize": 1.0, "click here": 1.0, "free money": 1.0, "!!!": 1.0, "$$$": 1.0
+}
+SPAM_SCORE_THRESHOLD = 1.0    # Fallback marks spam at or above this score (subject + body)
+URGENT_KEYWORDS = {
+    "urgent": 1.0, "asap": 1.0, "immediately": 1.0, "critical": 1.0, "emergency": 1.0
+}
+URGENT_SCORE_THRESHOLD = 1.0  # Fallback stars at or above this score (subject only)
+
+# Rule-Based Pre-Classifier (runs before compression and AI)
+PRE_CLASSIFIER_ENABLED = True
+PRE_CLASSIFIER_MIN_SCORE = 2  # Independent signals needed before skipping the LLM
+PROMO_SENDER_PREFIXES = [
+    "deals", "offers", "promo", "promotions", "marketing", "sales", "shop", "store", "specials"
+]
+PROMO_SENDER_DOMAINS = [
+    "mailchimp.com", "mcsv.net", "sendgrid.net", "klaviyomail.com", "exacttarget.com", "mktomail.com"
+]
+# Matched as whole words, so plurals are listed explicitly
+PROMO_SUBJECT_KEYWORDS = [
+    "% off", "sale", "sales", "deal", "deals", "discount", "discounts", "coupon", "coupons",
+    "limited time", "free shipping"
+]
+NEWSLETTER_KEYWORDS = ["newsletter", "newsletters", "digest", "weekly", "monthly", "roundup", "edition"]
+# Subjects containing these always go to the LLM
+PROTECTED_KEYWORDS = [
+    "urgent", "invoice", "invoices", "receipt", "receipts", "payment", "payments", "password", "passwords",
+    "security", "verify", "verification", "order", "orders", "interview"
+]
+
+# Local Classifier (trained on past AI verdicts: python local_classifier.py train)
+LOCAL_CLASSIFIER_ENABLED = True  # Used once a trained model exists
+LOCAL_CLASSIFIER_MIN_CONFIDENCE = 0.9  # Less confident emails go to the LLM
+LOCAL_CLASSIFIER_RECORD_EXAMPLES = True  # Keep AI-analyzed emails as training examples
+LOCAL_CLASSIFIER_MIN_EXAMPLES = 200  # Refuse to train on fewer
+LOCAL_CLASSIFIER_MAX_EXAMPLES = 20000  # Oldest examples are dropped beyond this
+LOCAL_CLASSIFIER_FEATURES = 2 ** 18  # Hashed feature space
+LOCAL_CLASSIFIER_MIN_DF = 2   # Ignore features seen in fewer training emails
+LOCAL_CLASSIFIER_HOLDOUT = 0.2  # Share of examples held out for calibration / evaluation
+LOCAL_CLASSIFIER_MODEL_PATH = os.path.join(DATA_DIR, "local_classifier.json")
+TRAINING_EXAMPLES_PATH = os.path.join(DATA_DIR, "training.db")
 
 # Date Range Options
 DATE_RANGES = {
     "latest7": "Latest 7 emails",
+    "new": "New since last run",
     "today": "Today's new emails",
     "yesterday": "Yesterday's emails",
     "7days": "Last 7 days",
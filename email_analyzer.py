@@ -3,13 +3,37 @@ Email Analyzer - Intelligent Email Content Analysis
 Deeply understands email content and context to make smart decisions
 """
 
-import json
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
 from dataclasses import dataclass
 from enum import Enum
 
+from config import (
+    VERDICT_CACHE_ENABLED, NEAR_DUPLICATE_ENABLED, SENDER_REPUTATION_ENABLED, SENDER_REPUTATION_FALLBACK_MIN_SHARE,
+    PRE_CLASSIFIER_ENABLED, LOCAL_CLASSIFIER_ENABLED, LOCAL_CLASSIFIER_RECORD_EXAMPLES,
+    GEMINI_BATCH_SIZE, ANALYSIS_CONCURRENCY, EMAIL_TIME_BUDGET_SECONDS,
+    SPAM_KEYWORDS, SPAM_SCORE_THRESHOLD, URGENT_KEYWORDS, URGENT_SCORE_THRESHOLD
+)
 from scaledown_service import ScaleDownService
 from gemini_service import GeminiService
+from verdict_cache import VerdictCache
+from near_duplicate import NearDuplicateIndex
+from pre_classifier import RuleClassifier, PROTECTED_MATCHER
+from sender_reputation import SenderReputation
+from local_classifier import LocalClassifier, TrainingStore
+from keyword_matcher import KeywordMatcher
+from resilience import time_budget
+
+
+# Short query that steers ScaleDown while it compresses an email's context
+ANALYSIS_FOCUS = "Classify this email: category, action, priority, intent and whether it needs a response."
+
+# Fallback keyword rules, compiled once
+SPAM_MATCHER = KeywordMatcher(SPAM_KEYWORDS)
+URGENT_MATCHER = KeywordMatcher(URGENT_KEYWORDS)
+
+# Placeholder email used to fingerprint the context template for verdict cache versioning
+CONTEXT_TEMPLATE_PROBE = {'sender': '{sender}', 'subject': '{subject}', 'date': '{date}', 'body': '{body}'}
 
 
 class EmailCategory(Enum):
@@ -43,6 +67,7 @@ class EmailAnalysisResult:
     key_points: list
     sentiment: str
     requires_response: bool
+    duplicate_of: Optional[Dict] = None  # Set when the verdict was reused from a near-duplicate email
 
 
 class EmailAnalyzer:
@@ -51,6 +76,19 @@ class EmailAnalyzer:
     def __init__(self):
         self.scaledown = ScaleDownService()
         self.gemini = GeminiService()
+        self.pre_classifier = RuleClassifier() if PRE_CLASSIFIER_ENABLED else None
+        self.verdict_cache = VerdictCache() if VERDICT_CACHE_ENABLED else None
+        self.local_classifier = LocalClassifier.load() if LOCAL_CLASSIFIER_ENABLED else None
+        self.training_store = TrainingStore() if LOCAL_CLASSIFIER_RECORD_EXAMPLES else None
+        # Prompt or model changes invalidate earlier verdicts
+        self.verdict_version = VerdictCache.make_version(
+            self._build_analysis_prompt(), ANALYSIS_FOCUS, self._build_analysis_context(CONTEXT_TEMPLATE_PROBE),
+            *self.gemini.models
+        )
+        if self.verdict_cache is not None:
+            self.verdict_cache.prune(self.verdict_version)
+        self.near_duplicates = NearDuplicateIndex(self.verdict_version) if NEAR_DUPLICATE_ENABLED else None
+        self.sender_reputation = SenderReputation() if SENDER_REPUTATION_ENABLED else None
     
     def analyze(self, email_data: Dict) -> EmailAnalysisResult:
         """
@@ -70,25 +108,218 @@ class EmailAnalyzer:
         print(f"Subject: {email_data['subject']}")
         print(f"Date: {email_data['date']}")
         
-        # Step 1: Build context for AI
-        email_context = self._build_analysis_context(email_data)
+        # Obvious bulk mail or already analyzed with this prompt and model set - skip compression and AI
+        digest, cached_result = self.local_verdict(email_data)
+        if cached_result is not None:
+            return cached_result
+        
+        # Step 1: Analysis instructions - identical for every email, compressed once per session
+        instructions = self.analysis_instructions()
+        
+        # Upstream retries for this email share one time budget
+        with time_budget(EMAIL_TIME_BUDGET_SECONDS):
+            # Step 2: Build and compress only the per-email context
+            compressed_context = self.compress_email(email_data)['compressed_prompt']
+            
+            # Step 3: Get AI analysis with the instructions attached locally, then parse and validate it
+            return self.analyze_compressed(email_data, compressed_context, instructions, digest)
+    
+    def analyze_many(self, emails: Iterable[Dict], concurrency: Optional[int] = None) -> List[EmailAnalysisResult]:
+        """
+        Analyze emails in parallel worker threads
+        
+        Requests to ScaleDown and Gemini are paced by the shared per-upstream
+        rate limiters, so raising concurrency cannot exceed provider quotas.
+        
+        Args:
+            emails: Email dicts, as for analyze()
+            concurrency: Emails in flight at once (default ANALYSIS_CONCURRENCY)
+        
+        Returns:
+            EmailAnalysisResult per email, in input order
+        """
+        
+        emails = list(emails)
+        concurrency = max(1, concurrency or ANALYSIS_CONCURRENCY)
+        
+        if concurrency == 1 or len(emails) <= 1:
+            return [self.analyze(email_data) for email_data in emails]
+        
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(emails)), thread_name_prefix="analyze") as executor:
+            return list(executor.map(self.analyze, emails))
+    
+    def analyze_batch(self, emails: List[Dict], batch_size: Optional[int] = None) -> List[EmailAnalysisResult]:
+        """
+        Analyze several emails with one Gemini request per batch
+        
+        The shared instructions are sent once per batch instead of once per
+        email. Any email whose entry is missing or invalid in the batch
+        response is re-analyzed on its own.
+        
+        Args:
+            emails: Email dicts, as for analyze()
+            batch_size: Emails per Gemini request (default GEMINI_BATCH_SIZE)
         
-        # Step 2: Build analysis prompt
-        analysis_prompt = self._build_analysis_prompt()
+        Returns:
+            EmailAnalysisResult per email, in input order
+        """
+        
+        batch_size = max(1, batch_size or GEMINI_BATCH_SIZE)
+        results: List[Optional[EmailAnalysisResult]] = [None] * len(emails)
+        pending = []  # (index, digest, compressed context)
         
-        # Step 3: Compress using ScaleDown
-        compression_result = self.scaledown.compress_prompt(email_context, analysis_prompt)
-        compressed_prompt = compression_result['compressed_prompt']
+        print(f"\n{'='*70}")
+        print(f"📧 ANALYZING {len(emails)} EMAILS (batches of {batch_size})")
+        print(f"{'='*70}")
+        
+        for index, email_data in enumerate(emails):
+            digest, cached_result = self.local_verdict(email_data)
+            if cached_result is not None:
+                results[index] = cached_result
+            else:
+                with time_budget(EMAIL_TIME_BUDGET_SECONDS):
+                    pending.append((index, digest, self.compress_email(email_data)['compressed_prompt']))
+        
+        if not pending:
+            return results
+        
+        analysis_prompt = self.analysis_instructions()
+        
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            
+            responses = {}
+            if len(batch) > 1:
+                with time_budget(EMAIL_TIME_BUDGET_SECONDS):
+                    items = self.gemini.analyze_email_batch(
+                        self._build_batch_prompt(batch, analysis_prompt), len(batch), self._build_batch_schema()
+                    )
+                for item in items or []:
+                    if isinstance(item, dict) and 'id' in item:
+                        item = dict(item)
+                        responses[str(item.pop('id'))] = item
+            
+            for index, digest, compressed_context in batch:
+                ai_response = responses.get(str(index))
+                
+                if self._is_valid_ai_response(ai_response):
+                    results[index] = self._finish_analysis(emails[index], ai_response, digest)
+                    continue
+                
+                if len(batch) > 1:
+                    print(f"   ⚠️  No valid batch result for email {index + 1}, analyzing it alone")
+                with time_budget(EMAIL_TIME_BUDGET_SECONDS):
+                    results[index] = self.analyze_compressed(emails[index], compressed_context, analysis_prompt, digest)
+        
+        return results
+    
+    def local_verdict(self, email_data: Dict):
+        """
+        Try to settle an email without compression or AI
         
-        # Step 4: Get AI analysis
-        ai_response = self.gemini.analyze_email(compressed_prompt)
+        Checks the rule-based pre-classifier, the verdict cache, the
+        near-duplicate index, the sender's reputation, then the local model
+        trained on past verdicts. Every verdict except a reputation one is
+        added to the sender's statistics, once per message.
+        
+        Returns:
+            (verdict cache digest or None, result or None)
+        """
+        
+        if self.pre_classifier is not None:
+            rule_response = self.pre_classifier.classify(email_data)
+            if rule_response is not None:
+                print(f"\n📏 Classified by header rules: {email_data['subject'][:60]}")
+                return None, self._record_sender(email_data, self._parse_ai_response(rule_response))
+        
+        digest = None
+        if self.verdict_cache is not None:
+            digest = VerdictCache.email_digest(email_data)
+            cached_response = self.verdict_cache.get(digest, self.verdict_version)
+            if cached_response is not None:
+                print(f"\n♻️  Reusing cached analysis: {email_data['subject'][:60]}")
+                return digest, self._record_sender(email_data, self._parse_ai_response(cached_response), digest)
+        
+        if self.near_duplicates is not None:
+            duplicate = self.near_duplicates.find(email_data)
+            if duplicate is not None:
+                print(f"\n🔁 Near-duplicate of an analyzed email ({duplicate['similarity']:.0%} similar): "
+                      f"{email_data['subject'][:60]}")
+                result = self._parse_ai_response(duplicate['ai_response'])
+                result.duplicate_of = {
+                    'digest': duplicate['digest'],
+                    'subject': duplicate['subject'],
+                    'similarity': duplicate['similarity']
+                }
+                return digest, self._record_sender(email_data, result, digest)
+        
+        # Consistent senders of bulk mail - unless the subject looks personally important
+        if self.sender_reputation is not None and not PROTECTED_MATCHER.search(email_data['subject']):
+            reputation_response = self.sender_reputation.classify(email_data)
+            if reputation_response is not None:
+                print(f"\n👤 Classified by sender reputation: {email_data['subject'][:60]}")
+                return digest, self._parse_ai_response(reputation_response)
+        
+        if self.local_classifier is not None:
+            model_response = self.local_classifier.classify(email_data)
+            if model_response is not None:
+                print(f"\n🧮 Classified by local model: {email_data['subject'][:60]}")
+                return digest, self._record_sender(email_data, self._parse_ai_response(model_response), digest)
+        
+        return digest, None
+    
+    def analysis_instructions(self) -> str:
+        """Shared analysis instructions, compressed once per process"""
+        return self.scaledown.compress_static(self._build_analysis_prompt())
+    
+    def analysis_context(self, email_data: Dict) -> str:
+        """Per-email context that compress_email sends to ScaleDown"""
+        return self._build_analysis_context(email_data)
+    
+    def compress_email(self, email_data: Dict) -> Dict:
+        """Build an email's context and compress it with ScaleDown (returns the compression result)"""
+        return self.scaledown.compress_prompt(self.analysis_context(email_data), ANALYSIS_FOCUS)
+    
+    def analyze_compressed(self, email_data: Dict, compressed_context: str, instructions: str,
+                           digest: Optional[str] = None) -> EmailAnalysisResult:
+        """
+        Ask Gemini about a compressed email and record the verdict
+        
+        Args:
+            email_data: The email, for caching, statistics and fallback rules
+            compressed_context: compress_email(email_data)['compressed_prompt']
+            instructions: analysis_instructions()
+            digest: Digest returned by local_verdict, if any
+        """
+        
+        ai_response = self.gemini.analyze_email(f"{compressed_context}\n\n{instructions}")
+        return self._finish_analysis(email_data, ai_response, digest)
+    
+    def _finish_analysis(self, email_data: Dict, ai_response: Optional[Dict], digest: Optional[str]) -> EmailAnalysisResult:
+        """Cache and parse an AI response, or fall back to keyword rules"""
         
-        # Step 5: Parse and validate response
         if ai_response:
-            return self._parse_ai_response(ai_response)
+            if self._is_valid_ai_response(ai_response):
+                if digest is not None:
+                    self.verdict_cache.put(digest, self.verdict_version, ai_response)
+                if self.near_duplicates is not None:
+                    self.near_duplicates.add(email_data, digest or VerdictCache.email_digest(email_data), ai_response)
+                # Only LLM verdicts become training data, never the local model's own
+                if self.training_store is not None:
+                    self.training_store.add(email_data, ai_response, digest)
+            return self._record_sender(email_data, self._parse_ai_response(ai_response), digest)
         else:
             print(f"   ⚠️  AI analysis failed, using fallback categorization")
-            return self._fallback_analysis(email_data)
+            return self.fallback_analysis(email_data)
+    
+    def _record_sender(self, email_data: Dict, result: EmailAnalysisResult,
+                       digest: Optional[str] = None) -> EmailAnalysisResult:
+        """Add a verdict to the sender's reputation (once per message) and pass the result through"""
+        
+        if self.sender_reputation is not None:
+            self.sender_reputation.record(email_data, digest or VerdictCache.email_digest(email_data),
+                                          result.category.name, result.action.name, result.priority_score)
+        return result
     
     def _build_analysis_context(self, email_data: Dict) -> str:
         """Build detailed email context for AI understanding"""
@@ -157,6 +388,54 @@ Respond in JSON format with your analysis:
 Think carefully and analyze the actual content and meaning.
 """
     
+    def _build_batch_prompt(self, batch: List, analysis_prompt: str) -> str:
+        """Pack several compressed emails behind one copy of the instructions"""
+        
+        emails_text = "\n\n".join(
+            f"=== EMAIL id={index} ===\n{compressed_context}"
+            for index, _, compressed_context in batch
+        )
+        
+        return f"""
+You will analyze {len(batch)} separate emails. Apply the instructions below to each email independently.
+Respond with a JSON array containing exactly one analysis object per email, in the same order,
+and set "id" in each object to that email's id.
+
+{analysis_prompt}
+
+{emails_text}
+"""
+    
+    def _build_batch_schema(self) -> Dict:
+        """Gemini response schema: an array of analysis objects tagged with the email id"""
+        
+        return {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "id": {"type": "STRING"},
+                    "category": {"type": "STRING", "enum": list(EmailCategory.__members__)},
+                    "action": {"type": "STRING", "enum": list(EmailAction.__members__)},
+                    "priority_score": {"type": "INTEGER"},
+                    "summary": {"type": "STRING"},
+                    "reasoning": {"type": "STRING"},
+                    "key_points": {"type": "ARRAY", "items": {"type": "STRING"}},
+                    "sentiment": {"type": "STRING"},
+                    "requires_response": {"type": "BOOLEAN"}
+                },
+                "required": ["id", "category", "action", "priority_score", "summary"]
+            }
+        }
+    
+    def _is_valid_ai_response(self, ai_response: Dict) -> bool:
+        """Check the AI response names a known category and action"""
+        return (
+            isinstance(ai_response, dict)
+            and ai_response.get("category", "NORMAL") in EmailCategory.__members__
+            and ai_response.get("action", "NOTHING") in EmailAction.__members__
+        )
+    
     def _parse_ai_response(self, ai_response: Dict) -> EmailAnalysisResult:
         """Parse AI response into structured result"""
         
@@ -194,41 +473,55 @@ Think carefully and analyze the actual content and meaning.
             print(f"   Response was: {ai_response}")
             return self._create_default_result()
     
-    def _fallback_analysis(self, email_data: Dict) -> EmailAnalysisResult:
+    def fallback_analysis(self, email_data: Dict) -> EmailAnalysisResult:
         """Fallback analysis when AI fails"""
         
-        # Simple keyword-based fallback
-        subject_lower = email_data['subject'].lower()
-        body_lower = email_data['body'].lower()
+        # Keyword rules - each field is scanned once by a compiled matcher
+        spam_hits = SPAM_MATCHER.scan({'subject': email_data['subject'], 'body': email_data['body']})
         
         # Check for obvious spam indicators
-        spam_keywords = ['win', 'prize', 'click here', 'free money', '!!!', '$$$']
-        if any(keyword in subject_lower or keyword in body_lower for keyword in spam_keywords):
+        if spam_hits and sum(hit.weight for hit in spam_hits) >= SPAM_SCORE_THRESHOLD:
             return EmailAnalysisResult(
                 category=EmailCategory.SPAM,
                 action=EmailAction.MOVE_TO_SPAM,
                 priority_score=1,
                 summary="Detected as spam based on content",
-                reasoning="Contains spam indicators",
+                reasoning="Contains spam indicators: " + ", ".join(sorted({hit.keyword for hit in spam_hits})),
                 key_points=["Spam detected"],
                 sentiment="negative",
                 requires_response=False
             )
         
         # Check for urgency
-        urgent_keywords = ['urgent', 'asap', 'immediately', 'critical', 'emergency']
-        if any(keyword in subject_lower for keyword in urgent_keywords):
+        urgent_hits = URGENT_MATCHER.find_all(email_data['subject'], 'subject')
+        if urgent_hits and sum(hit.weight for hit in urgent_hits) >= URGENT_SCORE_THRESHOLD:
             return EmailAnalysisResult(
                 category=EmailCategory.URGENT,
                 action=EmailAction.STAR,
                 priority_score=9,
                 summary="Urgent email requiring attention",
-                reasoning="Subject indicates urgency",
+                reasoning="Subject indicates urgency: " + ", ".join(sorted({hit.keyword for hit in urgent_hits})),
                 key_points=["Urgent matter"],
                 sentiment="urgent",
                 requires_response=True
             )
         
+        # Seed from the sender's history when it mostly gets one verdict
+        history = self.sender_reputation.lookup(email_data) if self.sender_reputation is not None else None
+        if (history and history['count'] >= self.sender_reputation.min_emails
+                and history['category_share'] >= SENDER_REPUTATION_FALLBACK_MIN_SHARE):
+            return EmailAnalysisResult(
+                category=EmailCategory[history['category']],
+                action=EmailAction[history['action']],
+                priority_score=round(history['average_priority']),
+                summary="Categorized from sender history",
+                reasoning=f"{history['category_share']:.0%} of {history['count']} earlier emails from this sender "
+                          f"were {history['category']}",
+                key_points=["Sender history"],
+                sentiment="neutral",
+                requires_response=False
+            )
+        
         # Default: normal email
         return self._create_default_result()
     
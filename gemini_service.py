@@ -3,10 +3,27 @@ Gemini AI Service - Email Content Understanding and Analysis
 Uses Google's Gemini AI to deeply understand email content
 """
 
-import requests
 import json
-from typing import Optional, Dict
-from config import GEMINI_API_KEY, ANALYSIS_TEMPERATURE, MAX_TOKENS_ANALYSIS
+import threading
+import time
+from typing import Optional, Dict, List
+from config import (
+    GEMINI_API_KEY, ANALYSIS_TEMPERATURE, MAX_TOKENS_ANALYSIS,
+    GEMINI_MODEL_FAILURE_THRESHOLD, GEMINI_MODEL_COOLDOWN_SECONDS, GEMINI_MODEL_NOT_FOUND_COOLDOWN_SECONDS
+)
+from http_session import get_http_session
+from rate_limiter import get_rate_limiter
+from token_estimator import estimate_tokens
+from resilience import call_with_retry, ResilienceError, BudgetExhaustedError
+
+
+# Observed model health, shared by every GeminiService in the process
+_model_health: Dict[str, Dict] = {}
+_last_working_model: Optional[str] = None
+_health_lock = threading.Lock()
+
+# Weight for new observations in the latency/error moving averages
+HEALTH_SMOOTHING = 0.3
 
 
 class GeminiService:
@@ -19,6 +36,8 @@ class GeminiService:
             'gemini-1.5-pro',
             'gemini-pro'
         ]
+        self.session = get_http_session()
+        self.rate_limiter = get_rate_limiter("gemini")
     
     def analyze_email(self, email_content: str) -> Optional[Dict]:
         """
@@ -34,9 +53,42 @@ class GeminiService:
         print(f"\n🤖 Gemini AI Analysis:")
         print(f"   Sending to AI for deep content analysis...")
         
-        # Try each model until one works
-        for model_name in self.models:
+        return self._generate_json(email_content, {
+            "temperature": ANALYSIS_TEMPERATURE,
+            "maxOutputTokens": MAX_TOKENS_ANALYSIS,
+            "responseMimeType": "application/json"  # Force JSON output
+        })
+    
+    def analyze_email_batch(self, batch_content: str, email_count: int, response_schema: Dict) -> Optional[List]:
+        """
+        Analyze several emails in one request
+        
+        Args:
+            batch_content: Prompt carrying every email plus the shared instructions
+            email_count: Number of emails in the prompt (scales the output budget)
+            response_schema: JSON schema for the array of analyses
+        
+        Returns:
+            List of analysis dicts (one per email, possibly incomplete) or None if failed
+        """
+        
+        print(f"\n🤖 Gemini AI Batch Analysis:")
+        print(f"   Sending {email_count} emails in one request...")
+        
+        return self._generate_json(batch_content, {
+            "temperature": ANALYSIS_TEMPERATURE,
+            "maxOutputTokens": MAX_TOKENS_ANALYSIS * email_count,
+            "responseMimeType": "application/json",
+            "responseSchema": response_schema
+        }, expected_type=list)
+    
+    def _generate_json(self, content: str, generation_config: Dict, expected_type: Optional[type] = None):
+        """Run a JSON-mode generateContent call through the model fallback chain"""
+        
+        # Try each model until one works - last working model first, benched models skipped
+        for model_name in self._ordered_models():
             print(f"   Trying model: {model_name}")
+            started = time.monotonic()
             
             url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={self.api_key}"
             
@@ -44,17 +96,19 @@ class GeminiService:
             
             data = {
                 "contents": [{
-                    "parts": [{"text": email_content}]
+                    "parts": [{"text": content}]
                 }],
-                "generationConfig": {
-                    "temperature": ANALYSIS_TEMPERATURE,
-                    "maxOutputTokens": MAX_TOKENS_ANALYSIS,
-                    "responseMimeType": "application/json"  # Force JSON output
-                }
+                "generationConfig": generation_config
             }
             
             try:
-                response = requests.post(url, headers=headers, json=data, timeout=60)
+                response = call_with_retry(
+                    f"gemini:{model_name}",
+                    lambda timeout: self.session.post(url, headers=headers, json=data, timeout=timeout),
+                    timeout=60,
+                    rate_limiter=self.rate_limiter,
+                    tokens=estimate_tokens(content) + generation_config.get("maxOutputTokens", 0)
+                )
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -67,22 +121,41 @@ class GeminiService:
                         # Parse JSON response
                         try:
                             analysis = json.loads(ai_text)
-                            print(f"   ✓ Parsed successfully")
-                            return analysis
                         except json.JSONDecodeError as e:
                             print(f"   ⚠️  JSON parse error: {e}")
                             print(f"   Raw response: {ai_text[:200]}...")
+                            self._record_failure(model_name)
+                            continue
+                        
+                        if expected_type is not None and not isinstance(analysis, expected_type):
+                            print(f"   ⚠️  Expected JSON {expected_type.__name__}, got {type(analysis).__name__}")
+                            self._record_failure(model_name)
                             continue
+                        
+                        print(f"   ✓ Parsed successfully")
+                        self._record_success(model_name, time.monotonic() - started)
+                        return analysis
+                    
+                    self._record_failure(model_name)
                     
                 elif response.status_code == 404:
                     print(f"   ⚠️  Model not found, trying next...")
+                    self._record_failure(model_name, not_found=True)
                     continue
                 else:
                     print(f"   ⚠️  HTTP {response.status_code}, trying next...")
+                    self._record_failure(model_name)
                     continue
                     
+            except BudgetExhaustedError as e:
+                print(f"   ⚠️  {e}")
+                break
+            except ResilienceError as e:
+                print(f"   ⚠️  {e}, trying next...")
+                continue
             except Exception as e:
                 print(f"   ⚠️  Error: {e}")
+                self._record_failure(model_name)
                 continue
         
         print(f"   ❌ All models failed")
@@ -93,7 +166,8 @@ class GeminiService:
         
         print(f"\n✍️  Generating draft response...")
         
-        for model_name in self.models:
+        for model_name in self._ordered_models():
+            started = time.monotonic()
             url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={self.api_key}"
             
             headers = {'Content-Type': 'application/json'}
@@ -109,7 +183,13 @@ class GeminiService:
             }
             
             try:
-                response = requests.post(url, headers=headers, json=data, timeout=60)
+                response = call_with_retry(
+                    f"gemini:{model_name}",
+                    lambda timeout: self.session.post(url, headers=headers, json=data, timeout=timeout),
+                    timeout=60,
+                    rate_limiter=self.rate_limiter,
+                    tokens=estimate_tokens(email_context) + data["generationConfig"]["maxOutputTokens"]
+                )
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -117,9 +197,99 @@ class GeminiService:
                     if 'candidates' in result and len(result['candidates']) > 0:
                         draft = result['candidates'][0]['content']['parts'][0]['text']
                         print(f"   ✓ Draft generated")
+                        self._record_success(model_name, time.monotonic() - started)
                         return draft.strip()
+                
+                self._record_failure(model_name, not_found=response.status_code == 404)
                         
+            except BudgetExhaustedError:
+                break
+            except ResilienceError:
+                continue
             except Exception:
+                self._record_failure(model_name)
                 continue
         
         return None
+    
+    def get_model_status(self) -> Dict:
+        """Get observed health of each model (latency, error rate, cooldown)"""
+        now = time.monotonic()
+        with _health_lock:
+            return {
+                model: {
+                    'latency': health['latency'],
+                    'error_rate': health['error_rate'],
+                    'benched_for': max(0.0, health['benched_until'] - now),
+                    'last_working': model == _last_working_model
+                }
+                for model, health in _model_health.items() if model in self.models
+            }
+    
+    def _ordered_models(self) -> List[str]:
+        """
+        Models to try, best first
+        
+        The model that last succeeded leads, then the rest by observed
+        error rate and latency. Benched models are skipped until their
+        cooldown ends - unless every model is benched.
+        """
+        
+        now = time.monotonic()
+        with _health_lock:
+            health = {model: _model_health.get(model) for model in self.models}
+            
+            def rank(model):
+                observed = health[model]
+                if observed is None:
+                    return (0.0, 0.0, self.models.index(model))
+                return (observed['error_rate'], observed['latency'], self.models.index(model))
+            
+            available = [m for m in self.models if health[m] is None or health[m]['benched_until'] <= now]
+            if not available:
+                # Everything is benched - try the one that comes back soonest first
+                return sorted(self.models, key=lambda m: health[m]['benched_until'])
+            
+            ordered = sorted(available, key=rank)
+            if _last_working_model in ordered:
+                ordered.remove(_last_working_model)
+                ordered.insert(0, _last_working_model)
+            return ordered
+    
+    def _record_success(self, model_name: str, latency: float):
+        global _last_working_model
+        with _health_lock:
+            health = self._health(model_name)
+            health['latency'] = latency if health['calls'] == 0 else (
+                HEALTH_SMOOTHING * latency + (1 - HEALTH_SMOOTHING) * health['latency']
+            )
+            health['error_rate'] *= (1 - HEALTH_SMOOTHING)
+            health['calls'] += 1
+            health['consecutive_failures'] = 0
+            health['benched_until'] = 0.0
+            _last_working_model = model_name
+    
+    def _record_failure(self, model_name: str, not_found: bool = False):
+        global _last_working_model
+        with _health_lock:
+            health = self._health(model_name)
+            health['error_rate'] = HEALTH_SMOOTHING + (1 - HEALTH_SMOOTHING) * health['error_rate']
+            health['consecutive_failures'] += 1
+            
+            if not_found:
+                health['benched_until'] = time.monotonic() + GEMINI_MODEL_NOT_FOUND_COOLDOWN_SECONDS
+            elif health['consecutive_failures'] >= GEMINI_MODEL_FAILURE_THRESHOLD:
+                health['benched_until'] = time.monotonic() + GEMINI_MODEL_COOLDOWN_SECONDS
+            
+            if _last_working_model == model_name:
+                _last_working_model = None
+    
+    def _health(self, model_name: str) -> Dict:
+        """Health record for a model (caller holds _health_lock)"""
+        return _model_health.setdefault(model_name, {
+            'latency': 0.0,
+            'error_rate': 0.0,
+            'calls': 0,
+            'consecutive_failures': 0,
+            'benched_until': 0.0
+        })
@@ -4,11 +4,52 @@ Gmail Connector - Handle Gmail IMAP connections and email operations
 
 import imaplib
 import email
+import base64
+import math
+import quopri
+import re
+import select
+import ssl
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from email.header import decode_header
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional
 
-from config import GMAIL_IMAP_SERVER, MAX_EMAIL_BODY_LENGTH
+from config import (
+    GMAIL_IMAP_SERVER, MAX_EMAIL_BODY_LENGTH, FETCH_BATCH_SIZE, STREAM_BATCH_SIZE, FETCH_MODE, PARTIAL_BODY_BYTES,
+    DEFAULT_FOLDER, DEFAULT_GMAIL_QUERY, STORE_BATCH_SIZE, IMAP_POOL_SIZE, IMAP_POOL_PARALLEL_THRESHOLD,
+    MESSAGE_CACHE_ENABLED
+)
+from sync_state import SyncStateStore
+from imap_pool import ImapConnectionPool
+from message_cache import MessageCache
+from email_analyzer import EmailAction
+
+
+# FETCH response parsing: "12 (UID 345 RFC822 {1234}"
+FETCH_START_RE = re.compile(rb'^(\d+) \(')
+FETCH_UID_RE = re.compile(rb'[( ]UID (\d+)')
+FETCH_LITERAL_RE = re.compile(rb'([A-Z0-9.\-]+(?:\[[^\]]*\])?(?:<\d+>)?) \{\d+\}$', re.IGNORECASE)
+IMAP_ATOM_RE = re.compile(rb'[^\s()"]+')
+IDLE_EXISTS_RE = re.compile(rb'^\* \d+ EXISTS')
+
+# UID STORE arguments for each bulk action
+BULK_ACTION_STORES = {
+    EmailAction.STAR: ('+FLAGS', '\\Flagged'),
+    EmailAction.MOVE_TO_SPAM: ('+X-GM-LABELS', '\\Spam'),
+    EmailAction.ARCHIVE: ('+X-GM-LABELS', '\\Archive'),
+    EmailAction.MARK_READ: ('+FLAGS', '\\Seen')
+}
+
+# Extra headers kept on each email dict for the rule-based pre-classifier
+TRIAGE_HEADERS = ("List-Unsubscribe", "List-Id", "Precedence", "Authentication-Results")
+
+# FETCH items for the full and partial fetch modes
+PARTIAL_HEADER_FIELDS = "FROM SUBJECT DATE LIST-UNSUBSCRIBE LIST-ID PRECEDENCE AUTHENTICATION-RESULTS"
+FULL_FETCH_ITEMS = "(UID RFC822)"
+PARTIAL_FETCH_ITEMS = f"(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({PARTIAL_HEADER_FIELDS})])"
 
 
 class GmailConnector:
@@ -19,6 +60,13 @@ class GmailConnector:
         self.password = password
         self.imap = None
         self.connected = False
+        self.condstore = False
+        self.sync_state = SyncStateStore()
+        self.pool = None
+        self.last_fetch_total = 0
+        self.failed_uids = set()  # UIDs whose FETCH failed during the current iter_emails
+        self.folder = DEFAULT_FOLDER
+        self.message_cache = MessageCache() if MESSAGE_CACHE_ENABLED else None
     
     def connect(self) -> bool:
         """Establish connection to Gmail IMAP server"""
@@ -31,6 +79,11 @@ class GmailConnector:
             self.imap = imaplib.IMAP4_SSL(GMAIL_IMAP_SERVER)
             self.imap.login(self.email_address, self.password)
             self.connected = True
+            self._enable_condstore()
+            
+            # Extra sessions for parallel fetches are opened lazily
+            if IMAP_POOL_SIZE > 1 and self.pool is None:
+                self.pool = ImapConnectionPool(self.email_address, self.password, IMAP_POOL_SIZE)
             
             print(f"   ✓ Connection successful!")
             return True
@@ -46,68 +99,308 @@ class GmailConnector:
             print(f"   ❌ Connection error: {e}")
             return False
     
-    def fetch_emails(self, date_range: str = "latest7") -> List[Dict]:
+    def _enable_condstore(self):
+        """Enable CONDSTORE so SELECT reports HIGHESTMODSEQ (best effort)"""
+        try:
+            status, data = self.imap.capability()
+            capabilities = data[0].upper().split() if status == "OK" and data else []
+            if b'CONDSTORE' in capabilities and b'ENABLE' in capabilities:
+                self.imap.capabilities = tuple(c.decode() for c in capabilities)
+                status, _ = self.imap.enable("CONDSTORE")
+                self.condstore = status == "OK"
+        except Exception:
+            self.condstore = False
+    
+    def fetch_emails(self, date_range: str = "latest7", batch_size: Optional[int] = None,
+                     fetch_mode: Optional[str] = None, query: Optional[str] = None,
+                     folder: Optional[str] = None) -> List[Dict]:
         """
         Fetch emails based on date range
         
         Args:
-            date_range: "latest7", "today", "yesterday", "7days", "15days"
+            date_range: "latest7", "today", "yesterday", "7days", "15days",
+                        or "new" (only mail since the last "new" run)
+            batch_size: Messages per UID FETCH round trip (default: FETCH_BATCH_SIZE)
+            fetch_mode: "full" (whole RFC822 message) or "partial" (headers,
+                        BODYSTRUCTURE and a bounded text snippet, default: FETCH_MODE)
+            query: Gmail search syntax applied server-side via X-GM-RAW,
+                   e.g. "-category:promotions is:unread" (default: DEFAULT_GMAIL_QUERY)
+            folder: Folder or Gmail label to read, e.g. "Work" or "[Gmail]/All Mail"
+                    (default: DEFAULT_FOLDER)
         
         Returns:
             List of email dicts
         """
         
+        return list(self.iter_emails(date_range, batch_size or FETCH_BATCH_SIZE, fetch_mode, query, folder))
+    
+    def iter_emails(self, date_range: str = "latest7", batch_size: Optional[int] = None,
+                    fetch_mode: Optional[str] = None, query: Optional[str] = None,
+                    folder: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Yield emails as each fetch batch arrives, most recent first
+        
+        Lets analysis start after the first small batch instead of after the
+        whole range, and keeps at most one window of batches in memory.
+        After the search, last_fetch_total holds the number of matches.
+        
+        Args:
+            date_range: Same options as fetch_emails
+            batch_size: Messages per UID FETCH round trip (default: STREAM_BATCH_SIZE)
+            fetch_mode: "full" or "partial" (default: FETCH_MODE)
+            query: Gmail search syntax (X-GM-RAW), as in fetch_emails
+            folder: Folder or Gmail label, as in fetch_emails
+        
+        Yields:
+            Email dicts
+        """
+        
+        self.last_fetch_total = 0
+        
         if not self.connected:
             print(f"❌ Not connected to Gmail")
-            return []
+            return
+        
+        folder = folder or DEFAULT_FOLDER
+        query = query if query is not None else DEFAULT_GMAIL_QUERY
         
         print(f"\n📬 Fetching emails...")
         print(f"   Range: {date_range}")
+        if folder != "INBOX":
+            print(f"   Folder: {folder}")
+        if query:
+            print(f"   Gmail filter: {query}")
         
         try:
-            # Select inbox
-            self.imap.select("INBOX")
-            
-            # Build search criteria
-            search_criteria = self._build_search_criteria(date_range)
-            print(f"   Search: {search_criteria}")
-            
-            # Search emails
-            if date_range == "latest7":
-                status, messages = self.imap.search(None, "ALL")
-                email_ids = messages[0].split()
-                
-                if not email_ids or email_ids == [b'']:
-                    print(f"   📭 No emails found")
-                    return []
-                
-                # Get last 7
-                recent_ids = email_ids[-7:] if len(email_ids) >= 7 else email_ids
-                print(f"   ✓ Found {len(recent_ids)} emails")
-                
-            else:
-                status, messages = self.imap.search(None, search_criteria)
-                recent_ids = messages[0].split()
-                
-                if not recent_ids or recent_ids == [b'']:
-                    print(f"   📭 No emails found in this range")
-                    return []
-                
-                print(f"   ✓ Found {len(recent_ids)} emails")
-            
-            # Fetch email details
-            emails = []
-            for email_id in reversed(recent_ids):  # Most recent first
-                email_data = self._fetch_email_details(email_id)
-                if email_data:
-                    emails.append(email_data)
-            
-            print(f"   ✓ Successfully fetched {len(emails)} emails")
-            return emails
+            mailbox, recent_uids = self._search_range(date_range, folder, query)
+        except Exception as e:
+            print(f"   ❌ Error fetching emails: {e}")
+            return
+        
+        if not recent_uids:
+            return
+        
+        self.last_fetch_total = len(recent_uids)
+        self.failed_uids = set()
+        
+        # Fetch email details in batches, most recent first
+        ordered_uids = list(reversed(recent_uids))
+        batch_size = max(1, batch_size or STREAM_BATCH_SIZE)
+        fetch_mode = "partial" if (fetch_mode or FETCH_MODE) == "partial" else "full"
+        fetch_batch = self._fetch_batch_partial if fetch_mode == "partial" else self._fetch_batch
+        
+        # Serve unchanged messages from the local cache, fetch only the misses
+        to_download = len(ordered_uids)
+        if self.message_cache and mailbox['uidvalidity'] is not None:
+            self.message_cache.prune_stale(self.email_address, folder, mailbox['uidvalidity'])
+            cached_uids = self.message_cache.cached_uids(self.email_address, folder, mailbox['uidvalidity'], fetch_mode)
+            to_download = sum(1 for uid in ordered_uids if int(uid) not in cached_uids)
             
+            if to_download < len(ordered_uids):
+                print(f"   ✓ {len(ordered_uids) - to_download} emails in local cache, downloading {to_download}")
+            fetch_batch = self._with_message_cache(fetch_batch, folder, mailbox['uidvalidity'], fetch_mode)
+        
+        # Large ranges are spread over the pooled sessions
+        parallel = self.pool is not None and to_download >= IMAP_POOL_PARALLEL_THRESHOLD
+        if parallel:
+            batch_size = min(batch_size, math.ceil(len(ordered_uids) / self.pool.size))
+        
+        batches = [ordered_uids[start:start + batch_size] for start in range(0, len(ordered_uids), batch_size)]
+        
+        if parallel:
+            stream = self._iter_parallel(batches, fetch_batch, folder)
+        else:
+            stream = (email_data for batch in batches for email_data in fetch_batch(batch))
+        
+        delivered = set()
+        try:
+            for email_data in stream:
+                delivered.add(int(email_data['msg_id']))
+                yield email_data
         except Exception as e:
             print(f"   ❌ Error fetching emails: {e}")
+            return
+        fetched = len(delivered)
+        
+        # Only advance the checkpoint once the delta was consumed, and never past a failed fetch
+        if date_range == "new":
+            self._save_checkpoint(mailbox, *self._checkpoint_uids(recent_uids, delivered), self._sync_key(folder, query))
+        
+        print(f"   ✓ Successfully fetched {fetched} emails")
+    
+    def _search_range(self, date_range: str, folder: str, query: str):
+        """
+        Select the folder and find the UIDs for a date range
+        
+        Returns:
+            (mailbox status dict, list of UIDs in ascending order)
+        """
+        
+        status, data = self.imap.select(self._quote(folder))
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"Cannot open folder {folder}: {data}")
+        self.folder = folder
+        mailbox = self._read_mailbox_status()
+        
+        # Search emails (UIDs, so batches stay stable while we fetch)
+        criteria, last_uid = self._range_criteria(date_range, mailbox, self._sync_key(folder, query))
+        email_uids = self._uid_search(criteria, query) if criteria else []
+        
+        return mailbox, self._select_range_uids(date_range, email_uids, last_uid)
+    
+    def _range_criteria(self, date_range: str, mailbox: Dict, sync_key: str):
+        """
+        Work out the UID SEARCH criteria for a date range
+        
+        Returns:
+            (criteria or None when a search is unnecessary,
+             last checkpoint UID for "new" runs with a valid checkpoint)
+        """
+        
+        if date_range == "new":
+            return self._new_mail_criteria(mailbox, sync_key)
+        
+        criteria = "ALL" if date_range == "latest7" else self._build_search_criteria(date_range)
+        print(f"   Search: {criteria}")
+        return criteria, None
+    
+    def _select_range_uids(self, date_range: str, email_uids: List[bytes], last_uid: Optional[int]) -> List[bytes]:
+        """Trim search results to the requested range and report the count"""
+        
+        if date_range == "new":
+            if last_uid is None:
+                recent_uids = email_uids[-7:]
+            else:
+                # "n:*" always matches the highest UID, even when it is below n
+                recent_uids = [uid for uid in email_uids if int(uid) > last_uid]
+            
+            if not recent_uids:
+                print(f"   📭 No new emails since last run")
+            else:
+                print(f"   ✓ Found {len(recent_uids)} new emails")
+            return recent_uids
+        
+        if not email_uids:
+            print(f"   📭 No emails found" if date_range == "latest7" else f"   📭 No emails found in this range")
             return []
+        
+        # Get last 7
+        recent_uids = email_uids[-7:] if date_range == "latest7" else email_uids
+        print(f"   ✓ Found {len(recent_uids)} emails")
+        return recent_uids
+    
+    def _uid_search(self, criteria: str, query: Optional[str] = None) -> List[bytes]:
+        """UID SEARCH, narrowed server-side by Gmail search syntax when given"""
+        
+        args, literal = self._search_args(criteria, query)
+        if literal is not None:
+            self.imap.literal = literal
+        
+        status, messages = self.imap.uid("search", *args)
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"Search failed: {messages}")
+        
+        return [uid for uid in messages[0].split() if uid]
+    
+    def _search_args(self, criteria: str, query: Optional[str]):
+        """
+        Build UID SEARCH arguments, adding X-GM-RAW for a Gmail query
+        
+        Returns:
+            (argument tuple, UTF-8 literal to append or None)
+        """
+        
+        if not query:
+            return (None, criteria), None
+        if query.isascii():
+            return (None, criteria, "X-GM-RAW", self._quote(query)), None
+        
+        # Non-ASCII queries go as a UTF-8 literal
+        return ("CHARSET", "UTF-8", criteria, "X-GM-RAW"), query.encode("utf-8")
+    
+    def _quote(self, value: str) -> str:
+        """Quote an IMAP string argument (folder names, X-GM-RAW queries)"""
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    
+    def _sync_key(self, folder: str, query: Optional[str]) -> str:
+        """Checkpoints are per folder and filter - a filtered run skips mail"""
+        return f"{folder} [{query}]" if query else folder
+    
+    def _read_mailbox_status(self) -> Dict:
+        """Read UIDVALIDITY, UIDNEXT and HIGHESTMODSEQ reported by SELECT"""
+        
+        status = {}
+        for name in ("UIDVALIDITY", "UIDNEXT", "HIGHESTMODSEQ"):
+            _, data = self.imap.response(name)
+            try:
+                status[name.lower()] = int(data[-1]) if data and data[-1] else None
+            except (TypeError, ValueError):
+                status[name.lower()] = None
+        return status
+    
+    def _new_mail_criteria(self, mailbox: Dict, sync_key: str):
+        """
+        Search criteria for mail that arrived since the stored checkpoint
+        
+        Returns:
+            (criteria or None if nothing arrived, checkpoint UID or None on first run)
+        """
+        
+        state = self.sync_state.get(self.email_address, sync_key)
+        
+        if not state or state['uidvalidity'] != mailbox['uidvalidity']:
+            # First run, or the server renumbered the mailbox
+            print(f"   No valid sync checkpoint - starting from the latest 7 emails")
+            return "ALL", None
+        
+        last_uid = state['last_uid']
+        unchanged_modseq = (mailbox['highestmodseq'] is not None
+                            and mailbox['highestmodseq'] == state.get('highest_modseq'))
+        no_new_uids = mailbox['uidnext'] is not None and mailbox['uidnext'] <= last_uid + 1
+        
+        if unchanged_modseq or no_new_uids:
+            # Nothing arrived - skip the SEARCH round trip entirely
+            return None, last_uid
+        
+        print(f"   Search: UID {last_uid + 1}:*")
+        return f"UID {last_uid + 1}:*", last_uid
+    
+    def _checkpoint_uids(self, recent_uids: List[bytes], delivered: set):
+        """
+        UIDs the checkpoint may advance past
+        
+        Stops below the lowest UID whose fetch failed and was never delivered
+        (e.g. not recovered by a retry), so the next "new" run fetches it again.
+        
+        Returns:
+            (UIDs, whether the whole delta was delivered)
+        """
+        
+        lost = [int(uid) for uid in recent_uids if int(uid) in self.failed_uids and int(uid) not in delivered]
+        if not lost:
+            return recent_uids, True
+        
+        print(f"   ⚠️  {len(lost)} emails failed to download - they will be retried next run")
+        return [uid for uid in recent_uids if int(uid) < min(lost)], False
+    
+    def _save_checkpoint(self, mailbox: Dict, fetched_uids: List[bytes], complete: bool, sync_key: str):
+        """Advance the sync checkpoint past the UIDs we just fetched"""
+        
+        if mailbox['uidvalidity'] is None:
+            return
+        
+        state = self.sync_state.get(self.email_address, sync_key) or {}
+        last_uid = state.get('last_uid', 0) if state.get('uidvalidity') == mailbox['uidvalidity'] else 0
+        last_uid = max([last_uid] + [int(uid) for uid in fetched_uids])
+        
+        # A partial checkpoint must not let the MODSEQ shortcut skip the next SEARCH
+        self.sync_state.update(
+            self.email_address, sync_key,
+            uidvalidity=mailbox['uidvalidity'],
+            last_uid=last_uid,
+            highest_modseq=mailbox['highestmodseq'] if complete else None,
+            uid_next=mailbox['uidnext'] if complete else None
+        )
     
     def _build_search_criteria(self, date_range: str) -> str:
         """Build IMAP search criteria based on date range"""
@@ -135,37 +428,354 @@ class GmailConnector:
         else:
             return "ALL"
     
-    def _fetch_email_details(self, email_id) -> Optional[Dict]:
-        """Fetch full email details"""
+    def _with_message_cache(self, fetch_batch, folder: str, uidvalidity: int, fetch_mode: str):
+        """Wrap a batch fetcher so cache hits skip the network entirely"""
+        
+        def fetch_with_cache(uids: List[bytes], imap=None) -> List[Dict]:
+            cached = self.message_cache.get_many(
+                self.email_address, folder, uidvalidity, [int(uid) for uid in uids], fetch_mode
+            )
+            missing = [uid for uid in uids if int(uid) not in cached]
+            
+            fetched = fetch_batch(missing, imap) if missing else []
+            self.message_cache.put_many(self.email_address, folder, uidvalidity, fetched, fetch_mode)
+            
+            merged = dict(cached)
+            merged.update((int(email_data['msg_id']), email_data) for email_data in fetched)
+            return [merged[int(uid)] for uid in uids if int(uid) in merged]
+        
+        return fetch_with_cache
+    
+    def _iter_parallel(self, batches: List[List[bytes]], fetch_batch, folder: str) -> Iterator[Dict]:
+        """Fetch batches concurrently on pooled sessions, yielding in batch order"""
+        
+        print(f"   Fetching {len(batches)} batches over {self.pool.size} IMAP sessions...")
+        
+        def fetch_on_pooled_session(batch):
+            try:
+                with self.pool.session(self._quote(folder)) as imap:
+                    return fetch_batch(batch, imap)
+            except Exception as e:
+                print(f"   ⚠️  Pooled fetch failed ({e}), retrying on main session")
+                return []
+        
+        with ThreadPoolExecutor(max_workers=self.pool.size) as executor:
+            in_flight = deque()
+            
+            for batch in batches:
+                in_flight.append((batch, executor.submit(fetch_on_pooled_session, batch)))
+                
+                # Keep one batch per session in flight ahead of the consumer
+                if len(in_flight) > self.pool.size:
+                    yield from self._collect_batch(*in_flight.popleft(), fetch_batch)
+            
+            while in_flight:
+                yield from self._collect_batch(*in_flight.popleft(), fetch_batch)
+    
+    def _collect_batch(self, batch: List[bytes], future, fetch_batch) -> List[Dict]:
+        """Wait for a pooled batch; failed batches come back empty and are
+        retried on the main session, which is never shared with the workers"""
+        
+        fetched = future.result()
+        return fetched if fetched else fetch_batch(batch)
+    
+    def _fetch_batch(self, uids: List[bytes], imap=None) -> List[Dict]:
+        """Fetch a batch of emails with a single UID FETCH round trip"""
+        
+        imap = imap or self.imap
+        uid_set = b",".join(uids).decode()
+        
+        try:
+            status, msg_data = imap.uid("fetch", uid_set, FULL_FETCH_ITEMS)
+            if status != "OK":
+                print(f"   ⚠️  Error fetching batch {uid_set}: {status}")
+                self.failed_uids.update(int(uid) for uid in uids)
+                return []
+        except Exception as e:
+            print(f"   ⚠️  Error fetching batch {uid_set}: {e}")
+            self.failed_uids.update(int(uid) for uid in uids)
+            return []
+        
+        fetched = self._parse_full_response(msg_data)
+        
+        # Servers may answer in any order - keep the requested order
+        return [fetched[int(uid)] for uid in uids if int(uid) in fetched]
+    
+    def _fetch_batch_partial(self, uids: List[bytes], imap=None) -> List[Dict]:
+        """
+        Fetch a batch of emails without downloading full messages
+        
+        Asks for the analyzed headers plus BODYSTRUCTURE, then pulls only the
+        first PARTIAL_BODY_BYTES of each message's text/plain part. BODY.PEEK
+        leaves the \\Seen flag untouched.
+        """
+        
+        imap = imap or self.imap
+        uid_set = b",".join(uids).decode()
         
         try:
-            status, msg_data = self.imap.fetch(email_id, "(RFC822)")
+            status, msg_data = imap.uid("fetch", uid_set, PARTIAL_FETCH_ITEMS)
+            if status != "OK":
+                print(f"   ⚠️  Error fetching batch {uid_set}: {status}")
+                self.failed_uids.update(int(uid) for uid in uids)
+                return []
+        except Exception as e:
+            print(f"   ⚠️  Error fetching batch {uid_set}: {e}")
+            self.failed_uids.update(int(uid) for uid in uids)
+            return []
+        
+        fetched, text_parts = self._parse_partial_response(msg_data)
+        
+        # One snippet round trip per distinct part number (usually "1" or "1.1")
+        for section, parts in text_parts.items():
+            section_set = ",".join(str(uid) for uid in parts)
             
-            for response_part in msg_data:
-                if isinstance(response_part, tuple):
-                    msg = email.message_from_bytes(response_part[1])
-                    
-                    # Decode headers
-                    subject = self._decode_header(msg.get("Subject", ""))
-                    sender = self._decode_header(msg.get("From", ""))
-                    date = msg.get("Date", "")
-                    
-                    # Get body
-                    body = self._extract_body(msg)
-                    
-                    return {
-                        'msg_id': email_id.decode(),
-                        'subject': subject,
-                        'sender': sender,
-                        'date': date,
-                        'body': body
-                    }
+            try:
+                status, body_data = imap.uid("fetch", section_set, self._snippet_fetch_items(section))
+                if status != "OK":
+                    continue
+            except Exception as e:
+                print(f"   ⚠️  Error fetching bodies {section_set}: {e}")
+                continue
+            
+            self._apply_snippets(fetched, section, parts, body_data)
+        
+        # Servers may answer in any order - keep the requested order
+        return [fetched[int(uid)] for uid in uids if int(uid) in fetched]
+    
+    def _parse_full_response(self, msg_data) -> Dict[int, Dict]:
+        """Parse an RFC822 FETCH response into {uid: email dict}"""
+        
+        fetched = {}
+        for message in self._group_fetch_response(msg_data):
+            raw = message['literals'].get('RFC822')
+            if not raw or message['uid'] is None:
+                continue
             
+            try:
+                email_data = self._parse_message(email.message_from_bytes(raw), message['uid'])
+                fetched[message['uid']] = email_data
+            except Exception as e:
+                print(f"   ⚠️  Error parsing email UID {message['uid']}: {e}")
+        
+        return fetched
+    
+    def _parse_partial_response(self, msg_data):
+        """
+        Parse a headers + BODYSTRUCTURE FETCH response
+        
+        Returns:
+            ({uid: email dict without body}, {section: {uid: text part info}})
+        """
+        
+        fetched = {}
+        text_parts = {}
+        
+        for message in self._group_fetch_response(msg_data):
+            if message['uid'] is None:
+                continue
+            
+            header_bytes = next(
+                (value for key, value in message['literals'].items() if key.startswith('BODY[HEADER')), b''
+            )
+            
+            try:
+                email_data = self._parse_message(email.message_from_bytes(header_bytes), message['uid'])
+                fetched[message['uid']] = email_data
+                
+                part = self._find_text_part(self._parse_bodystructure(message['text']))
+                if part:
+                    text_parts.setdefault(part['section'], {})[message['uid']] = part
+            except Exception as e:
+                print(f"   ⚠️  Error parsing email UID {message['uid']}: {e}")
+        
+        return fetched, text_parts
+    
+    def _snippet_fetch_items(self, section: str) -> str:
+        """FETCH items for the first PARTIAL_BODY_BYTES of one body part"""
+        return f"(UID BODY.PEEK[{section}]<0.{PARTIAL_BODY_BYTES}>)"
+    
+    def _apply_snippets(self, fetched: Dict[int, Dict], section: str, parts: Dict[int, Dict], body_data):
+        """Decode snippet FETCH results into the matching email dicts"""
+        
+        for message in self._group_fetch_response(body_data):
+            raw = message['literals'].get(f"BODY[{section}]<0>")
+            if raw is None or message['uid'] not in parts:
+                continue
+            
+            part = parts[message['uid']]
+            fetched[message['uid']]['body'] = self._decode_partial_body(raw, part['encoding'], part['charset'])
+    
+    def _group_fetch_response(self, msg_data) -> List[Dict]:
+        """
+        Split a multi-message FETCH response into per-message parts
+        
+        imaplib returns a flat list where each literal arrives as a
+        (header, bytes) tuple and the rest of the line as plain bytes.
+        
+        Returns:
+            List of dicts with 'seq', 'uid', 'literals' (item name → bytes)
+            and 'text' (all non-literal response text)
+        """
+        
+        messages = []
+        current = None
+        
+        for part in msg_data:
+            text = part[0] if isinstance(part, tuple) else part
+            if not isinstance(text, bytes):
+                continue
+            
+            start = FETCH_START_RE.match(text)
+            if start:
+                current = {'seq': int(start.group(1)), 'uid': None, 'literals': {}, 'text': b''}
+                messages.append(current)
+            
+            if current is None:
+                continue
+            
+            if isinstance(part, tuple):
+                item = FETCH_LITERAL_RE.search(text)
+                if item:
+                    current['literals'][item.group(1).decode().upper()] = part[1]
+                    text = text[:item.start()]
+            
+            current['text'] += text + b' '
+        
+        for message in messages:
+            uid = FETCH_UID_RE.search(message['text'])
+            if uid:
+                message['uid'] = int(uid.group(1))
+        
+        return messages
+    
+    def _parse_message(self, msg, msg_id) -> Dict:
+        """Parse a full email.message.Message into the email dict shape"""
+        
+        # Decode headers
+        subject = self._decode_header(msg.get("Subject", ""))
+        sender = self._decode_header(msg.get("From", ""))
+        date = msg.get("Date", "")
+        
+        # Get body
+        body = self._extract_body(msg)
+        
+        # Unfolded, topmost instance only - for Authentication-Results that is the receiving
+        # server's verdict; lower ones were added by earlier (possibly forwarding) hops
+        headers = {
+            name.lower(): " ".join(str(msg.get_all(name)[0]).split())
+            for name in TRIAGE_HEADERS if msg.get(name) is not None
+        }
+        
+        return {
+            'msg_id': str(msg_id),
+            'subject': subject,
+            'sender': sender,
+            'date': date,
+            'body': body,
+            'headers': headers
+        }
+    
+    def _parse_bodystructure(self, response_text: bytes) -> Optional[list]:
+        """Extract and parse the BODYSTRUCTURE list from FETCH response text"""
+        
+        start = response_text.upper().find(b'BODYSTRUCTURE (')
+        if start < 0:
             return None
+        
+        structure, _ = self._parse_imap_list(response_text, start + len(b'BODYSTRUCTURE '))
+        return structure
+    
+    def _parse_imap_list(self, data: bytes, pos: int):
+        """Parse one parenthesized IMAP list starting at data[pos]"""
+        
+        items = []
+        pos += 1
+        
+        while pos < len(data):
+            char = data[pos:pos + 1]
             
-        except Exception as e:
-            print(f"   ⚠️  Error fetching email {email_id}: {e}")
+            if char == b')':
+                return items, pos + 1
+            elif char.isspace():
+                pos += 1
+            elif char == b'(':
+                item, pos = self._parse_imap_list(data, pos)
+                items.append(item)
+            elif char == b'"':
+                value = bytearray()
+                pos += 1
+                while pos < len(data) and data[pos:pos + 1] != b'"':
+                    if data[pos:pos + 1] == b'\\':
+                        pos += 1
+                    value += data[pos:pos + 1]
+                    pos += 1
+                items.append(value.decode(errors="ignore"))
+                pos += 1
+            else:
+                atom = IMAP_ATOM_RE.match(data, pos)
+                value = atom.group(0).decode(errors="ignore")
+                items.append(None if value.upper() == "NIL" else value)
+                pos = atom.end()
+        
+        return items, pos
+    
+    def _find_text_part(self, structure: Optional[list], section: str = "") -> Optional[Dict]:
+        """
+        Find the first text/plain part in a parsed BODYSTRUCTURE
+        
+        Mirrors _extract_body: the first text/plain part of a multipart
+        message, or the body of a single-part text message.
+        
+        Returns:
+            Dict with 'section', 'encoding' and 'charset', or None
+        """
+        
+        if not structure:
+            return None
+        
+        # Multipart: child parts first, then the subtype and extensions
+        if isinstance(structure[0], list):
+            for index, child in enumerate(structure, 1):
+                if not isinstance(child, list):
+                    break
+                found = self._find_text_part(child, f"{section}.{index}" if section else str(index))
+                if found:
+                    return found
             return None
+        
+        if len(structure) < 6 or str(structure[0]).lower() != "text":
+            return None
+        if section and str(structure[1]).lower() != "plain":
+            return None
+        
+        params = structure[2] if isinstance(structure[2], list) else []
+        params = {str(key).lower(): value for key, value in zip(params[0::2], params[1::2])}
+        
+        return {
+            'section': section or "1",
+            'encoding': str(structure[5] or "7bit").lower(),
+            'charset': params.get('charset') or "utf-8"
+        }
+    
+    def _decode_partial_body(self, raw: bytes, encoding: str, charset: str) -> str:
+        """Decode a (possibly truncated) body part snippet"""
+        
+        try:
+            if encoding == "base64":
+                compact = b"".join(raw.split())
+                raw = base64.b64decode(compact[:len(compact) - len(compact) % 4])
+            elif encoding == "quoted-printable":
+                raw = quopri.decodestring(raw)
+        except Exception:
+            pass
+        
+        try:
+            body = raw.decode(charset, errors="ignore")
+        except LookupError:
+            body = raw.decode(errors="ignore")
+        
+        return body[:MAX_EMAIL_BODY_LENGTH]
     
     def _decode_header(self, header: str) -> str:
         """Decode email header"""
@@ -209,10 +819,84 @@ class GmailConnector:
         # Limit body length
         return body[:MAX_EMAIL_BODY_LENGTH]
     
+    def execute_bulk_actions(self, results: List[Dict]) -> Dict[str, bool]:
+        """
+        Apply analysis actions with one UID-set STORE per action
+        
+        Args:
+            results: List of {'email': email dict, 'analysis': EmailAnalysisResult}
+        
+        Returns:
+            Dict of msg_id → success for every email with an action to apply
+        """
+        
+        groups = {}
+        for result in results:
+            action = result['analysis'].action
+            if action in BULK_ACTION_STORES:
+                groups.setdefault(action, []).append(result['email']['msg_id'])
+        
+        outcome = {}
+        for action, msg_ids in groups.items():
+            command, label = BULK_ACTION_STORES[action]
+            print(f"   {action.value}: {len(msg_ids)} email(s)")
+            outcome.update(self._store_uids(msg_ids, command, label))
+        
+        return outcome
+    
+    def _store_uids(self, msg_ids: List[str], command: str, label: str) -> Dict[str, bool]:
+        """Run UID STORE on a set of UIDs and report per-message success"""
+        
+        outcome = {}
+        unique_ids = sorted({int(msg_id) for msg_id in msg_ids})
+        
+        for start in range(0, len(unique_ids), STORE_BATCH_SIZE):
+            batch = unique_ids[start:start + STORE_BATCH_SIZE]
+            
+            try:
+                status, data = self.imap.uid('store', self._uid_set(batch), command, label)
+            except Exception as e:
+                print(f"   ❌ Bulk {command} {label} failed: {e}")
+                outcome.update({str(uid): False for uid in batch})
+                continue
+            
+            outcome.update(self._store_outcome(batch, status, data))
+        
+        return outcome
+    
+    def _store_outcome(self, batch: List[int], status: str, data) -> Dict[str, bool]:
+        """Per-message success of a UID STORE from its untagged FETCH echoes"""
+        
+        if status != "OK":
+            return {str(uid): False for uid in batch}
+        
+        # Each updated message comes back as an untagged FETCH with its UID
+        confirmed = set()
+        for line in data or []:
+            text = line[0] if isinstance(line, tuple) else line
+            match = FETCH_UID_RE.search(text) if isinstance(text, bytes) else None
+            if match:
+                confirmed.add(int(match.group(1)))
+        
+        # Servers may omit the FETCH echo; a tagged OK then covers the whole set
+        return {str(uid): (uid in confirmed if confirmed else True) for uid in batch}
+    
+    def _uid_set(self, uids: List[int]) -> str:
+        """Compress sorted UIDs into an IMAP sequence set ("1:4,7,9:10")"""
+        
+        ranges = []
+        for uid in uids:
+            if ranges and uid == ranges[-1][1] + 1:
+                ranges[-1][1] = uid
+            else:
+                ranges.append([uid, uid])
+        
+        return ",".join(str(low) if low == high else f"{low}:{high}" for low, high in ranges)
+    
     def star_email(self, msg_id: str) -> bool:
         """Star/flag an important email"""
         try:
-            self.imap.store(msg_id, '+FLAGS', '\\Flagged')
+            self.imap.uid('store', msg_id, '+FLAGS', '\\Flagged')
             return True
         except Exception as e:
             print(f"   ❌ Failed to star email: {e}")
@@ -221,7 +905,7 @@ class GmailConnector:
     def move_to_spam(self, msg_id: str) -> bool:
         """Move email to spam folder"""
         try:
-            self.imap.store(msg_id, '+X-GM-LABELS', '\\Spam')
+            self.imap.uid('store', msg_id, '+X-GM-LABELS', '\\Spam')
             return True
         except Exception as e:
             print(f"   ❌ Failed to move to spam: {e}")
@@ -230,7 +914,7 @@ class GmailConnector:
     def archive_email(self, msg_id: str) -> bool:
         """Archive email (remove from inbox)"""
         try:
-            self.imap.store(msg_id, '+X-GM-LABELS', '\\Archive')
+            self.imap.uid('store', msg_id, '+X-GM-LABELS', '\\Archive')
             return True
         except Exception as e:
             print(f"   ❌ Failed to archive: {e}")
@@ -239,14 +923,102 @@ class GmailConnector:
     def mark_as_read(self, msg_id: str) -> bool:
         """Mark email as read"""
         try:
-            self.imap.store(msg_id, '+FLAGS', '\\Seen')
+            self.imap.uid('store', msg_id, '+FLAGS', '\\Seen')
             return True
         except Exception as e:
             print(f"   ❌ Failed to mark as read: {e}")
             return False
     
+    def wait_for_new_mail(self, timeout: float) -> bool:
+        """
+        Block in IMAP IDLE until the server reports new mail or timeout expires
+        
+        Args:
+            timeout: Seconds to stay in IDLE (keep below Gmail's 29 minute cutoff)
+        
+        Returns:
+            True if an EXISTS notification arrived, False on timeout
+        
+        Raises:
+            imaplib.IMAP4.error if the server does not support or refuses IDLE
+            imaplib.IMAP4.abort / OSError if the session dies while idling
+        """
+        
+        if not self.connected:
+            return False
+        
+        if "IDLE" not in self.imap.capabilities:
+            raise imaplib.IMAP4.error("server does not support IDLE")
+        
+        tag = self.imap._new_tag()
+        self.imap.send(tag + b" IDLE\r\n")
+        
+        # Untagged updates may arrive ahead of the continuation
+        got_new_mail = False
+        while True:
+            line = self.imap.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed while entering IDLE")
+            if line.startswith(b"+"):
+                break
+            if line.startswith(tag):
+                raise imaplib.IMAP4.error(f"server refused IDLE: {line.strip().decode(errors='ignore')}")
+            if IDLE_EXISTS_RE.match(line):
+                got_new_mail = True
+        
+        deadline = time.monotonic() + timeout
+        sock = self.imap.sock
+        
+        try:
+            while not got_new_mail:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                
+                # Lines already buffered by imaplib or the SSL layer are invisible to select()
+                if not self._has_buffered_input():
+                    readable, _, _ = select.select([sock], [], [], remaining)
+                    if not readable:
+                        break
+                
+                line = self.imap.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort("connection closed during IDLE")
+                if IDLE_EXISTS_RE.match(line):
+                    got_new_mail = True
+        finally:
+            # Leave IDLE and consume everything up to the tagged completion
+            self.imap.send(b"DONE\r\n")
+            while True:
+                line = self.imap.readline()
+                if not line or line.startswith(tag):
+                    break
+        
+        return got_new_mail
+    
+    def _has_buffered_input(self) -> bool:
+        """Whether unread bytes are waiting in the SSL layer or imaplib's buffered reader"""
+        
+        sock = self.imap.sock
+        if hasattr(sock, "pending") and sock.pending():
+            return True
+        
+        # A non-blocking peek returns buffered bytes without waiting on the socket
+        timeout = sock.gettimeout()
+        sock.settimeout(0)
+        try:
+            return bool(self.imap.file.peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        finally:
+            sock.settimeout(timeout)
+    
     def disconnect(self):
         """Close Gmail connection"""
+        if self.pool:
+            self.pool.close()
+            self.pool = None
+        
         if self.imap and self.connected:
             try:
                 self.imap.close()
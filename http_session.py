@@ -0,0 +1,79 @@
+"""
+HTTP Session - Shared keep-alive connection pool for the ScaleDown and Gemini APIs
+Reuses TCP+TLS connections across emails instead of handshaking on every request
+"""
+
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_USE_HTTP2
+
+try:
+    import httpx
+    import h2  # noqa: F401 - httpx needs it for HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    httpx = None
+    HTTP2_AVAILABLE = False
+
+
+# Exceptions either client raises for transport and HTTP status failures
+HTTP_ERRORS = (requests.exceptions.RequestException,) + ((httpx.HTTPError,) if httpx else ())
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_http_session(pool_connections: int = HTTP_POOL_CONNECTIONS, pool_maxsize: int = HTTP_POOL_MAXSIZE,
+                        use_http2: bool = HTTP_USE_HTTP2):
+    """
+    Build a pooled client
+
+    Uses httpx with HTTP/2 when httpx and h2 are installed (one multiplexed
+    connection per host), otherwise a requests.Session with keep-alive pools.
+    Both expose post(url, headers=, json=, timeout=).
+
+    Args:
+        pool_connections: Number of hosts to keep pools for
+        pool_maxsize: Connections kept open per host
+        use_http2: Prefer HTTP/2 when available
+    """
+
+    if use_http2 and HTTP2_AVAILABLE:
+        return httpx.Client(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=pool_connections * pool_maxsize,
+                max_keepalive_connections=pool_connections * pool_maxsize
+            )
+        )
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_http_session():
+    """Process-wide pooled client shared by every service instance"""
+
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_http_session()
+        return _session
+
+
+def close_http_session(session: Optional[object] = None):
+    """Close the shared client (or a given one) and drop its connections"""
+
+    global _session
+    with _session_lock:
+        if session is None:
+            session, _session = _session, None
+        if session is not None:
+            session.close()
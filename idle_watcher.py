@@ -0,0 +1,100 @@
+"""
+IDLE Watcher - Near-real-time triage with IMAP IDLE
+Keeps the Gmail session open and analyzes mail as soon as it arrives
+"""
+
+import imaplib
+import time
+from typing import Callable, Dict, Optional
+
+from config import IDLE_RENEW_SECONDS, IDLE_POLL_SECONDS
+from gmail_connector import GmailConnector
+from email_analyzer import EmailAnalyzer, EmailAnalysisResult
+
+
+class IdleWatcher:
+    """Feeds newly arrived emails into EmailAnalyzer using IMAP IDLE"""
+
+    def __init__(self, gmail: GmailConnector, analyzer: EmailAnalyzer,
+                 on_result: Optional[Callable[[Dict, EmailAnalysisResult], None]] = None,
+                 renew_seconds: float = IDLE_RENEW_SECONDS, poll_seconds: float = IDLE_POLL_SECONDS):
+        self.gmail = gmail
+        self.analyzer = analyzer
+        self.on_result = on_result
+        self.renew_seconds = renew_seconds
+        self.poll_seconds = poll_seconds
+        self.idle_supported = True
+        self.running = False
+        self.emails_triaged = 0
+
+    def run(self, max_emails: Optional[int] = None):
+        """
+        Watch the inbox until stopped (Ctrl+C) or max_emails are triaged
+
+        New mail is found through the "new" incremental sync, so only UIDs
+        past the stored checkpoint are fetched after each EXISTS notification.
+        If the server refuses IDLE, the watcher polls every poll_seconds instead.
+        """
+
+        print(f"\n👀 Watching inbox for new mail (Ctrl+C to stop)...")
+        self.running = True
+
+        # Catch up on anything that arrived since the last run
+        self._triage_new_mail()
+
+        reconnect_attempts = 0
+
+        while self.running and (max_emails is None or self.emails_triaged < max_emails):
+            try:
+                if not self.gmail.connected:
+                    raise imaplib.IMAP4.abort("not connected")
+
+                if not self.idle_supported:
+                    time.sleep(self.poll_seconds)
+                    self._triage_new_mail()
+                elif self.gmail.wait_for_new_mail(self.renew_seconds):
+                    self._triage_new_mail()
+                # On timeout we simply loop and re-issue IDLE
+                reconnect_attempts = 0
+
+            except (imaplib.IMAP4.abort, OSError) as e:
+                reconnect_attempts += 1
+                delay = min(60, 2 ** reconnect_attempts)
+                print(f"   ⚠️  IDLE session lost ({e}), reconnecting in {delay}s...")
+                time.sleep(delay)
+                self._reconnect()
+
+            except imaplib.IMAP4.error as e:
+                # Refused rather than dropped - re-issuing IDLE would just spin
+                print(f"   ⚠️  IDLE unavailable ({e}), polling every {self.poll_seconds}s instead")
+                self.idle_supported = False
+
+        self.running = False
+
+    def stop(self):
+        """Stop watching after the current IDLE cycle"""
+        self.running = False
+
+    def _triage_new_mail(self) -> int:
+        """Fetch and analyze mail past the sync checkpoint"""
+
+        count = 0
+
+        for email_data in self.gmail.iter_emails("new"):
+            result = self.analyzer.analyze(email_data)
+            self.emails_triaged += 1
+            count += 1
+
+            if self.on_result:
+                self.on_result(email_data, result)
+
+        return count
+
+    def _reconnect(self):
+        """Replace a dead IMAP session with a fresh one"""
+        try:
+            self.gmail.disconnect()
+        except Exception:
+            pass
+        self.gmail.connected = False
+        self.gmail.connect()
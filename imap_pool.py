@@ -0,0 +1,154 @@
+"""
+IMAP Pool - Authenticated Gmail IMAP sessions shared by fetch workers
+Gmail allows several concurrent IMAP connections per account
+"""
+
+import imaplib
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from config import GMAIL_IMAP_SERVER, IMAP_POOL_SIZE, IMAP_POOL_HEALTH_CHECK_SECONDS
+
+
+class ImapConnectionPool:
+    """Thread-safe pool of logged-in IMAP sessions for one account"""
+
+    def __init__(self, email_address: str, password: str, size: int = IMAP_POOL_SIZE,
+                 health_check_seconds: float = IMAP_POOL_HEALTH_CHECK_SECONDS):
+        self.email_address = email_address
+        self.password = password
+        self.size = max(1, size)
+        self.health_check_seconds = health_check_seconds
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._sessions: Dict[int, Dict] = {}  # id(session) → metadata
+        self._opening = 0
+        self._closed = False
+
+    @contextmanager
+    def session(self, folder: Optional[str] = None, timeout: Optional[float] = None):
+        """
+        Borrow a session for the duration of a with-block
+
+        Args:
+            folder: Mailbox to EXAMINE (read-only) before handing it out
+            timeout: Seconds to wait for a free session
+        """
+
+        imap = self.acquire(timeout)
+        broken = False
+
+        try:
+            if folder and self._sessions[id(imap)]['folder'] != folder:
+                status, _ = imap.select(folder, readonly=True)
+                if status != "OK":
+                    raise imaplib.IMAP4.error(f"Could not select {folder}")
+                self._sessions[id(imap)]['folder'] = folder
+            yield imap
+        except (imaplib.IMAP4.abort, OSError):
+            broken = True
+            raise
+        finally:
+            self.release(imap, broken=broken)
+
+    def acquire(self, timeout: Optional[float] = None) -> imaplib.IMAP4_SSL:
+        """Take a healthy session, opening a new one while under the size limit"""
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            if self._closed:
+                raise imaplib.IMAP4.error("Connection pool is closed")
+
+            try:
+                imap = self._idle.get_nowait()
+            except queue.Empty:
+                imap = self._open_if_allowed()
+
+            if imap is None:
+                # Poll so a discarded session frees a slot for a new login
+                wait = 1.0 if deadline is None else min(1.0, deadline - time.monotonic())
+                if wait <= 0:
+                    raise TimeoutError("No IMAP session available")
+                try:
+                    imap = self._idle.get(timeout=wait)
+                except queue.Empty:
+                    continue
+
+            if self._is_healthy(imap):
+                return imap
+
+            self._discard(imap)
+
+    def release(self, imap: imaplib.IMAP4_SSL, broken: bool = False):
+        """Return a session to the pool (or drop it if it failed)"""
+
+        if broken or self._closed:
+            self._discard(imap)
+            return
+
+        meta = self._sessions.get(id(imap))
+        if meta is not None:
+            meta['last_used'] = time.monotonic()
+            self._idle.put(imap)
+
+    def close(self):
+        """Log out every pooled session"""
+
+        self._closed = True
+        with self._lock:
+            sessions = [meta['imap'] for meta in self._sessions.values()]
+        for imap in sessions:
+            self._discard(imap)
+
+    def get_statistics(self) -> Dict:
+        """Get pool size and usage"""
+        return {
+            'max_size': self.size,
+            'open_sessions': len(self._sessions),
+            'idle_sessions': self._idle.qsize()
+        }
+
+    def _open_if_allowed(self) -> Optional[imaplib.IMAP4_SSL]:
+        with self._lock:
+            if len(self._sessions) + self._opening >= self.size:
+                return None
+            self._opening += 1
+
+        try:
+            imap = imaplib.IMAP4_SSL(GMAIL_IMAP_SERVER)
+            imap.login(self.email_address, self.password)
+        finally:
+            with self._lock:
+                self._opening -= 1
+
+        with self._lock:
+            self._sessions[id(imap)] = {'imap': imap, 'folder': None, 'last_used': time.monotonic()}
+        return imap
+
+    def _is_healthy(self, imap: imaplib.IMAP4_SSL) -> bool:
+        """NOOP sessions that sat idle long enough for the server to drop them"""
+
+        meta = self._sessions.get(id(imap))
+        if meta is None:
+            return False
+        if time.monotonic() - meta['last_used'] < self.health_check_seconds:
+            return True
+
+        try:
+            status, _ = imap.noop()
+            return status == "OK"
+        except Exception:
+            return False
+
+    def _discard(self, imap: imaplib.IMAP4_SSL):
+        with self._lock:
+            self._sessions.pop(id(imap), None)
+        try:
+            imap.logout()
+        except Exception:
+            pass
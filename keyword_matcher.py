@@ -0,0 +1,114 @@
+"""
+Keyword Matcher - One compiled pattern for a whole weighted keyword list
+Each field is scanned once, however many keywords there are
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Union
+
+
+@dataclass
+class KeywordHit:
+    """One keyword occurrence"""
+    keyword: str
+    start: int
+    end: int
+    weight: float
+    field: str = ""
+
+
+class KeywordMatcher:
+    """
+    Case-insensitive multi-keyword matcher
+
+    Keywords are folded into a prefix trie and emitted as a single regex
+    (e.g. "free", "free money", "freebie" → free(?: money|bie)?), so the
+    scan costs one pass per field and shared prefixes are only tried once.
+    At each position the longest keyword wins.
+    """
+
+    def __init__(self, keywords: Union[Dict[str, float], Iterable[str]], whole_words: bool = False):
+        if isinstance(keywords, dict):
+            weights = {keyword.lower(): float(weight) for keyword, weight in keywords.items() if keyword}
+        else:
+            weights = {keyword.lower(): 1.0 for keyword in keywords if keyword}
+
+        self.weights = weights
+        self.whole_words = whole_words
+        self.pattern = self._compile(weights, whole_words)
+
+    def find_all(self, text: str, field: str = "") -> List[KeywordHit]:
+        """Every non-overlapping keyword occurrence in text, with positions"""
+
+        if self.pattern is None or not text:
+            return []
+
+        hits = []
+        for match in self.pattern.finditer(text):
+            keyword = self._keyword_for(match.group(0))
+            hits.append(KeywordHit(keyword, match.start(), match.end(), self.weights.get(keyword, 0.0), field))
+        return hits
+
+    def scan(self, fields: Dict[str, str]) -> List[KeywordHit]:
+        """find_all over several named fields (e.g. subject and body)"""
+
+        hits = []
+        for field, text in fields.items():
+            hits.extend(self.find_all(text, field))
+        return hits
+
+    def search(self, text: str) -> bool:
+        """Whether any keyword occurs in text"""
+        return self.pattern is not None and bool(text) and self.pattern.search(text) is not None
+
+    def score(self, text: str) -> float:
+        """Sum of weights of every keyword occurrence in text"""
+        return sum(hit.weight for hit in self.find_all(text))
+
+    def _keyword_for(self, matched: str) -> str:
+        """
+        Configured keyword for matched text
+
+        IGNORECASE matches some non-ASCII text (e.g. "WİN", "ſale") whose
+        lowercase form is not the keyword; those fall back to a per-keyword check.
+        """
+
+        lowered = matched.lower()
+        if lowered in self.weights:
+            return lowered
+        for keyword in self.weights:
+            if re.fullmatch(re.escape(keyword), matched, re.IGNORECASE):
+                return keyword
+        return lowered
+
+    @classmethod
+    def _compile(cls, weights: Dict[str, float], whole_words: bool):
+        if not weights:
+            return None
+
+        trie: Dict = {}
+        for keyword in weights:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[""] = True
+
+        pattern = cls._trie_pattern(trie)
+        if whole_words:
+            # Boundaries only where the keyword edge is a word character, so "% off" still matches "50% off"
+            pattern = rf"(?:(?=\W)|(?<!\w))(?:{pattern})(?:(?<=\W)|(?!\w))"
+        return re.compile(pattern, re.IGNORECASE)
+
+    @classmethod
+    def _trie_pattern(cls, node: Dict) -> str:
+        """Regex for a trie node; optional tails are greedy so longer keywords win"""
+
+        branches = [re.escape(char) + cls._trie_pattern(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return "(?:" + body + ")?"
+        return body
@@ -0,0 +1,591 @@
+"""
+Local Classifier - CPU-only model trained on past Gemini verdicts
+Hashed TF-IDF features + naive Bayes predict category and action; confident emails skip the LLM
+
+Usage:
+    python local_classifier.py train              # fit on recorded verdicts and save the model
+    python local_classifier.py evaluate           # held-out accuracy, coverage and calibration
+    python local_classifier.py export model.json  # copy the trained model (or --examples data.jsonl)
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from config import (
+    LOCAL_CLASSIFIER_MIN_CONFIDENCE, LOCAL_CLASSIFIER_MIN_EXAMPLES, LOCAL_CLASSIFIER_MAX_EXAMPLES,
+    LOCAL_CLASSIFIER_FEATURES, LOCAL_CLASSIFIER_MIN_DF, LOCAL_CLASSIFIER_HOLDOUT,
+    LOCAL_CLASSIFIER_MODEL_PATH, TRAINING_EXAMPLES_PATH, MESSAGE_CACHE_PATH, VERDICT_CACHE_PATH,
+    MAX_EMAIL_BODY_LENGTH
+)
+from sender_reputation import priority_value
+from sqlite_store import SqliteStore, sender_address
+from verdict_cache import VerdictCache
+
+
+WORD_RE = re.compile(r"[a-z][a-z0-9']+|\d+|[$€£%!]")
+
+# Header presence is a strong bulk-mail signal
+FEATURE_HEADERS = ["list-unsubscribe", "list-id", "precedence"]
+
+# Softmax temperatures tried when calibrating confidence
+TEMPERATURES = [0.05 * 1.25 ** step for step in range(30)]
+
+MODEL_FORMAT = 1
+
+
+def email_terms(email_data: Dict) -> Counter:
+    """Term counts for an email: sender parts, subject words and bigrams, body words, bulk headers"""
+
+    terms = Counter()
+
+    local_part, _, domain = sender_address(email_data.get('sender', '')).partition("@")
+    if local_part:
+        terms["from:" + local_part] += 1
+    if domain:
+        terms["domain:" + domain] += 1
+        terms["domain:" + ".".join(domain.split(".")[-2:])] += 1
+
+    subject_words = ["#" if word.isdigit() else word for word in WORD_RE.findall(email_data.get('subject', '').lower())]
+    terms.update("s:" + word for word in subject_words)
+    terms.update(f"s2:{first}_{second}" for first, second in zip(subject_words, subject_words[1:]))
+
+    body = email_data.get('body', '')[:MAX_EMAIL_BODY_LENGTH].lower()
+    terms.update("b:" + ("#" if word.isdigit() else word) for word in WORD_RE.findall(body))
+
+    headers = {name.lower(): value for name, value in (email_data.get('headers') or {}).items()}
+    for name in FEATURE_HEADERS:
+        if headers.get(name):
+            terms["h:" + name] += 1
+
+    return terms
+
+
+def hashed_counts(terms: Counter, dim: int) -> Dict[int, int]:
+    """Fold terms into a fixed-size feature space (crc32 is stable across processes)"""
+
+    counts = defaultdict(int)
+    for term, count in terms.items():
+        counts[zlib.crc32(term.encode("utf-8")) % dim] += count
+    return dict(counts)
+
+
+def is_holdout(digest: str, fraction: float = LOCAL_CLASSIFIER_HOLDOUT, salt: int = 0) -> bool:
+    """Deterministic train/holdout split by email digest; each salt reads different digest bits"""
+    return int(digest[salt * 8:salt * 8 + 8], 16) % 1000 < fraction * 1000
+
+
+class NaiveBayes:
+    """Multinomial naive Bayes over sparse TF-IDF vectors, with a softmax temperature"""
+
+    def __init__(self, classes: List[str], log_prior: Dict[str, float],
+                 feature_log_prob: Dict[str, Dict[int, float]], unseen_log_prob: Dict[str, float],
+                 temperature: float = 1.0):
+        self.classes = classes
+        self.log_prior = log_prior
+        self.feature_log_prob = feature_log_prob
+        self.unseen_log_prob = unseen_log_prob
+        self.temperature = temperature
+
+    @classmethod
+    def fit(cls, vectors: List[Dict[int, float]], labels: List[str], vocabulary_size: int,
+            alpha: float = 0.1) -> "NaiveBayes":
+        label_counts = Counter(labels)
+        feature_totals = {label: defaultdict(float) for label in label_counts}
+        for vector, label in zip(vectors, labels):
+            totals = feature_totals[label]
+            for index, value in vector.items():
+                totals[index] += value
+
+        classes = sorted(label_counts)
+        log_prior = {label: math.log(label_counts[label] / len(labels)) for label in classes}
+        feature_log_prob = {}
+        unseen_log_prob = {}
+        for label in classes:
+            totals = feature_totals[label]
+            denominator = math.log(sum(totals.values()) + alpha * vocabulary_size)
+            feature_log_prob[label] = {index: math.log(value + alpha) - denominator for index, value in totals.items()}
+            unseen_log_prob[label] = math.log(alpha) - denominator
+
+        return cls(classes, log_prior, feature_log_prob, unseen_log_prob)
+
+    def log_scores(self, vector: Dict[int, float]) -> Dict[str, float]:
+        scores = {}
+        for label in self.classes:
+            log_probs = self.feature_log_prob[label]
+            unseen = self.unseen_log_prob[label]
+            scores[label] = self.log_prior[label] + sum(
+                value * log_probs.get(index, unseen) for index, value in vector.items()
+            )
+        return scores
+
+    def predict_proba(self, vector: Dict[int, float]) -> Dict[str, float]:
+        return self.softmax(self.log_scores(vector), self.temperature)
+
+    @staticmethod
+    def softmax(scores: Dict[str, float], temperature: float) -> Dict[str, float]:
+        top = max(scores.values())
+        exps = {label: math.exp((score - top) / temperature) for label, score in scores.items()}
+        total = sum(exps.values())
+        return {label: value / total for label, value in exps.items()}
+
+    def calibrate(self, vectors: List[Dict[int, float]], labels: List[str]):
+        """Pick the temperature that minimizes log loss on held-out examples"""
+
+        known = [(self.log_scores(vector), label) for vector, label in zip(vectors, labels) if label in self.log_prior]
+        if not known:
+            return
+
+        def log_loss(temperature: float) -> float:
+            return -sum(math.log(max(self.softmax(scores, temperature)[label], 1e-12)) for scores, label in known)
+
+        self.temperature = min(TEMPERATURES, key=log_loss)
+
+    def to_dict(self) -> Dict:
+        return {
+            'classes': self.classes,
+            'log_prior': self.log_prior,
+            'feature_log_prob': {label: {str(index): value for index, value in log_probs.items()}
+                                 for label, log_probs in self.feature_log_prob.items()},
+            'unseen_log_prob': self.unseen_log_prob,
+            'temperature': self.temperature
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "NaiveBayes":
+        return cls(
+            data['classes'], data['log_prior'],
+            {label: {int(index): value for index, value in log_probs.items()}
+             for label, log_probs in data['feature_log_prob'].items()},
+            data['unseen_log_prob'], data['temperature']
+        )
+
+
+class LocalClassifier:
+    """
+    Predicts EmailCategory and EmailAction names from past AI verdicts
+
+    Confidence is the lower of the two calibrated probabilities. classify()
+    only answers above min_confidence, and only with a category/action pair
+    the AI has actually produced; otherwise the email goes to the LLM.
+    """
+
+    def __init__(self, model: Dict, min_confidence: float = LOCAL_CLASSIFIER_MIN_CONFIDENCE):
+        self.model = model
+        self.min_confidence = min_confidence
+        self.dim = model['dim']
+        self.idf = {int(index): value for index, value in model['idf'].items()}
+        self.category_model = NaiveBayes.from_dict(model['category'])
+        self.action_model = NaiveBayes.from_dict(model['action'])
+        self.pairs = {tuple(pair) for pair in model['pairs']}
+        self.classified = 0
+        self.deferred = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def train(cls, examples: List[Dict], dim: int = LOCAL_CLASSIFIER_FEATURES, min_df: int = LOCAL_CLASSIFIER_MIN_DF,
+              holdout: float = LOCAL_CLASSIFIER_HOLDOUT) -> "LocalClassifier":
+        """
+        Fit both models on labeled examples (see TrainingStore.examples)
+
+        A deterministic share of the examples calibrates the confidence
+        temperature; the final models are then refit on every example.
+        """
+
+        if not examples:
+            raise ValueError("No training examples")
+
+        counts = [hashed_counts(email_terms(example), dim) for example in examples]
+
+        document_frequency = Counter()
+        for vector in counts:
+            document_frequency.update(vector.keys())
+        total = len(counts)
+        idf = {index: math.log((1 + total) / (1 + df)) + 1 for index, df in document_frequency.items() if df >= min_df}
+
+        model = {'format': MODEL_FORMAT, 'dim': dim, 'idf': idf}
+        vectors = [cls._tfidf(vector, idf) for vector in counts]
+        # Independent of evaluate()'s split, so a model trained there is still calibrated
+        calibration = [is_holdout(example['digest'], holdout, salt=1) for example in examples]
+
+        for head in ('category', 'action'):
+            labels = [example[head] for example in examples]
+            fit_vectors = [vector for vector, held in zip(vectors, calibration) if not held]
+            fit_labels = [label for label, held in zip(labels, calibration) if not held]
+            temperature = 1.0
+            if fit_vectors and len(fit_vectors) < len(vectors):
+                probe = NaiveBayes.fit(fit_vectors, fit_labels, len(idf))
+                probe.calibrate([vector for vector, held in zip(vectors, calibration) if held],
+                                [label for label, held in zip(labels, calibration) if held])
+                temperature = probe.temperature
+
+            final = NaiveBayes.fit(vectors, labels, len(idf))
+            final.temperature = temperature
+            model[head] = final.to_dict()
+
+        model['pairs'] = sorted({(example['category'], example['action']) for example in examples})
+        model['profiles'] = cls._category_profiles(examples)
+        model['trained_examples'] = total
+        model['trained_at'] = time.time()
+        return cls({**model, 'idf': {str(index): value for index, value in idf.items()}})
+
+    @classmethod
+    def load(cls, path: str = LOCAL_CLASSIFIER_MODEL_PATH,
+             min_confidence: float = LOCAL_CLASSIFIER_MIN_CONFIDENCE) -> Optional["LocalClassifier"]:
+        """Load a trained model, or None if there is none (or it is from another format)"""
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                model = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if model.get('format') != MODEL_FORMAT:
+            return None
+        return cls(model, min_confidence)
+
+    def save(self, path: str = LOCAL_CLASSIFIER_MODEL_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.model, f)
+        os.replace(tmp_path, path)
+
+    def predict(self, email_data: Dict) -> Dict:
+        """Most likely category and action with their calibrated probabilities"""
+
+        vector = self._tfidf(hashed_counts(email_terms(email_data), self.dim), self.idf)
+        category_probs = self.category_model.predict_proba(vector)
+        action_probs = self.action_model.predict_proba(vector)
+        category = max(category_probs, key=category_probs.get)
+        action = max(action_probs, key=action_probs.get)
+
+        return {
+            'category': category,
+            'action': action,
+            'category_confidence': category_probs[category],
+            'action_confidence': action_probs[action],
+            'confidence': min(category_probs[category], action_probs[action])
+        }
+
+    def classify(self, email_data: Dict) -> Optional[Dict]:
+        """Return an analysis dict in Gemini's shape when confident, or None to defer to the LLM"""
+
+        prediction = self.predict(email_data)
+        if (prediction['confidence'] < self.min_confidence
+                or (prediction['category'], prediction['action']) not in self.pairs):
+            with self._lock:
+                self.deferred += 1
+            return None
+
+        with self._lock:
+            self.classified += 1
+
+        profile = self.model['profiles'].get(prediction['category'], {})
+        return {
+            "category": prediction['category'],
+            "action": prediction['action'],
+            "priority_score": profile.get('priority_score', 5),
+            "summary": email_data.get('subject', '') or "No subject",
+            "reasoning": (
+                f"Local model trained on {self.model['trained_examples']} past AI verdicts: "
+                f"{prediction['category']} ({prediction['category_confidence']:.0%}), "
+                f"{prediction['action']} ({prediction['action_confidence']:.0%})"
+            ),
+            "key_points": [f"Local classifier confidence {prediction['confidence']:.0%}"],
+            "sentiment": profile.get('sentiment', "neutral"),
+            "requires_response": profile.get('requires_response', False)
+        }
+
+    def get_statistics(self) -> Dict:
+        """Get how many emails the model settled vs sent to the LLM"""
+        with self._lock:
+            return {
+                'classified': self.classified,
+                'deferred': self.deferred,
+                'trained_examples': self.model['trained_examples']
+            }
+
+    @staticmethod
+    def _tfidf(counts: Dict[int, int], idf: Dict[int, float]) -> Dict[int, float]:
+        """Sublinear TF × IDF, L2-normalized; features outside the vocabulary are dropped"""
+
+        vector = {index: (1 + math.log(count)) * idf[index] for index, count in counts.items() if index in idf}
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        if norm:
+            vector = {index: value / norm for index, value in vector.items()}
+        return vector
+
+    @staticmethod
+    def _category_profiles(examples: List[Dict]) -> Dict[str, Dict]:
+        """Typical priority, sentiment and response need per category, reused in local verdicts"""
+
+        grouped = defaultdict(list)
+        for example in examples:
+            grouped[example['category']].append(example)
+
+        profiles = {}
+        for category, group in grouped.items():
+            priorities = sorted(priority_value(example.get('priority_score')) for example in group)
+            sentiments = Counter(example.get('sentiment') or "neutral" for example in group)
+            responses = sum(1 for example in group if example.get('requires_response'))
+            profiles[category] = {
+                'priority_score': priorities[len(priorities) // 2],
+                'sentiment': sentiments.most_common(1)[0][0],
+                'requires_response': responses * 2 > len(group)
+            }
+        return profiles
+
+
+class TrainingStore(SqliteStore):
+    """SQLite store of emails the AI analyzed, with its verdicts, used as training data"""
+
+    def __init__(self, path: str = TRAINING_EXAMPLES_PATH, max_examples: int = LOCAL_CLASSIFIER_MAX_EXAMPLES):
+        super().__init__(path)
+        self.max_examples = max_examples
+
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS examples (
+                digest TEXT PRIMARY KEY,
+                email TEXT NOT NULL,
+                verdict TEXT NOT NULL,
+                recorded_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def add(self, email_data: Dict, ai_response: Dict, digest: Optional[str] = None):
+        """Record an email with a validated AI response (latest verdict wins)"""
+
+        digest = digest or VerdictCache.email_digest(email_data)
+        email = {
+            'sender': email_data.get('sender', ''),
+            'subject': email_data.get('subject', ''),
+            'body': email_data.get('body', '')[:MAX_EMAIL_BODY_LENGTH],
+            'headers': email_data.get('headers') or {}
+        }
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO examples VALUES (?, ?, ?, ?)",
+                (digest, json.dumps(email), json.dumps(ai_response), time.time())
+            )
+            self._db.commit()
+
+    def examples(self) -> List[Dict]:
+        """Every example as an email dict plus digest and the AI's labels"""
+
+        with self._lock:
+            rows = self._db.execute("SELECT digest, email, verdict FROM examples ORDER BY recorded_at").fetchall()
+
+        examples = []
+        for digest, email, verdict in rows:
+            verdict = json.loads(verdict)
+            examples.append({
+                **json.loads(email),
+                'digest': digest,
+                'category': verdict.get('category', "NORMAL"),
+                'action': verdict.get('action', "NOTHING"),
+                'priority_score': verdict.get('priority_score', 5),
+                'sentiment': verdict.get('sentiment', "neutral"),
+                'requires_response': verdict.get('requires_response', False)
+            })
+        return examples
+
+    def import_cached_verdicts(self, message_cache_path: str = MESSAGE_CACHE_PATH,
+                               verdict_cache_path: str = VERDICT_CACHE_PATH) -> int:
+        """
+        Backfill examples from verdicts analyzed before recording started
+
+        The verdict cache only keeps digests, so emails are recovered by
+        digesting the locally cached messages and joining on the digest.
+
+        Returns:
+            Number of examples imported
+        """
+
+        if not (os.path.exists(message_cache_path) and os.path.exists(verdict_cache_path)):
+            return 0
+
+        verdicts_db = sqlite3.connect(verdict_cache_path)
+        messages_db = sqlite3.connect(message_cache_path)
+        try:
+            verdicts = dict(verdicts_db.execute("SELECT digest, data FROM verdicts ORDER BY cached_at").fetchall())
+            with self._lock:
+                known = {digest for (digest,) in self._db.execute("SELECT digest FROM examples")}
+
+            imported = 0
+            for (data,) in messages_db.execute("SELECT data FROM messages"):
+                email_data = json.loads(data)
+                digest = VerdictCache.email_digest(email_data)
+                if digest in verdicts and digest not in known:
+                    self.add(email_data, json.loads(verdicts[digest]), digest)
+                    known.add(digest)
+                    imported += 1
+        except sqlite3.Error as e:
+            print(f"   ⚠️  Could not import cached verdicts: {e}")
+            return 0
+        finally:
+            verdicts_db.close()
+            messages_db.close()
+
+        return imported
+
+    def prune(self):
+        """Keep only the newest max_examples examples"""
+
+        if not self.max_examples:
+            return
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM examples WHERE digest NOT IN "
+                "(SELECT digest FROM examples ORDER BY recorded_at DESC LIMIT ?)",
+                (self.max_examples,)
+            )
+            self._db.commit()
+
+    def get_statistics(self) -> Dict:
+        """Get example counts per category"""
+        examples = self.examples()
+        return {
+            'examples': len(examples),
+            'categories': dict(Counter(example['category'] for example in examples))
+        }
+
+    def _size(self) -> int:
+        return self._count_rows("examples")
+
+
+def evaluate(examples: List[Dict], min_confidence: float = LOCAL_CLASSIFIER_MIN_CONFIDENCE,
+             holdout: float = LOCAL_CLASSIFIER_HOLDOUT) -> Dict:
+    """
+    Train on one split and score the held-out split
+
+    Reports plain accuracy, how many emails would skip the LLM at
+    min_confidence (coverage) and how often those were right, plus the
+    expected calibration error of the combined confidence.
+    """
+
+    train_set = [example for example in examples if not is_holdout(example['digest'], holdout)]
+    test_set = [example for example in examples if is_holdout(example['digest'], holdout)]
+    if not train_set or not test_set:
+        raise ValueError("Not enough examples for a train/holdout split")
+
+    classifier = LocalClassifier.train(train_set, holdout=holdout)
+    classifier.min_confidence = min_confidence
+
+    rows = []  # (confidence, both correct, category correct, action correct, answered locally)
+    for example in test_set:
+        prediction = classifier.predict(example)
+        category_ok = prediction['category'] == example['category']
+        action_ok = prediction['action'] == example['action']
+        answered = (prediction['confidence'] >= min_confidence
+                    and (prediction['category'], prediction['action']) in classifier.pairs)
+        rows.append((prediction['confidence'], category_ok and action_ok, category_ok, action_ok, answered))
+
+    answered = [row for row in rows if row[4]]
+    bins = defaultdict(list)
+    for row in rows:
+        bins[min(int(row[0] * 10), 9)].append(row)
+    calibration_error = sum(
+        len(group) / len(rows) * abs(sum(row[0] for row in group) / len(group) - sum(row[1] for row in group) / len(group))
+        for group in bins.values()
+    )
+
+    return {
+        'train_examples': len(train_set),
+        'test_examples': len(test_set),
+        'category_accuracy': sum(row[2] for row in rows) / len(rows),
+        'action_accuracy': sum(row[3] for row in rows) / len(rows),
+        'coverage': len(answered) / len(rows),
+        'answered_accuracy': sum(row[1] for row in answered) / len(answered) if answered else 0.0,
+        'calibration_error': calibration_error,
+        'min_confidence': min_confidence
+    }
+
+
+def _load_examples(store: TrainingStore) -> List[Dict]:
+    imported = store.import_cached_verdicts()
+    if imported:
+        print(f"📥 Imported {imported} examples from cached verdicts")
+    store.prune()
+    return store.examples()
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Train, evaluate or export the local email classifier")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = commands.add_parser("train", help="fit on recorded AI verdicts and save the model")
+    train_parser.add_argument("--model", default=LOCAL_CLASSIFIER_MODEL_PATH)
+    train_parser.add_argument("--min-examples", type=int, default=LOCAL_CLASSIFIER_MIN_EXAMPLES)
+
+    evaluate_parser = commands.add_parser("evaluate", help="score a fresh model on held-out verdicts")
+    evaluate_parser.add_argument("--min-confidence", type=float, default=LOCAL_CLASSIFIER_MIN_CONFIDENCE)
+
+    export_parser = commands.add_parser("export", help="write the trained model (or the examples) to a file")
+    export_parser.add_argument("output")
+    export_parser.add_argument("--model", default=LOCAL_CLASSIFIER_MODEL_PATH)
+    export_parser.add_argument("--examples", action="store_true", help="export training examples as JSON lines")
+
+    args = parser.parse_args(argv)
+    store = TrainingStore()
+
+    try:
+        if args.command == "train":
+            examples = _load_examples(store)
+            if len(examples) < args.min_examples:
+                print(f"❌ Only {len(examples)} examples recorded (need {args.min_examples})")
+                return 1
+
+            classifier = LocalClassifier.train(examples)
+            classifier.save(args.model)
+            print(f"✅ Trained on {len(examples)} examples → {args.model}")
+            print(f"   Categories: {dict(Counter(example['category'] for example in examples))}")
+            print(f"   Temperatures: category {classifier.category_model.temperature:.2f}, "
+                  f"action {classifier.action_model.temperature:.2f}")
+
+        elif args.command == "evaluate":
+            metrics = evaluate(_load_examples(store), args.min_confidence)
+            print(f"📊 Held-out evaluation ({metrics['train_examples']} train / {metrics['test_examples']} test)")
+            print(f"   Category accuracy: {metrics['category_accuracy']:.1%}")
+            print(f"   Action accuracy: {metrics['action_accuracy']:.1%}")
+            print(f"   Answered locally at ≥{metrics['min_confidence']:.0%}: {metrics['coverage']:.1%} "
+                  f"(accuracy {metrics['answered_accuracy']:.1%})")
+            print(f"   Calibration error: {metrics['calibration_error']:.3f}")
+
+        elif args.command == "export":
+            if args.examples:
+                examples = store.examples()
+                with open(args.output, "w", encoding="utf-8") as f:
+                    for example in examples:
+                        f.write(json.dumps(example) + "\n")
+                print(f"✅ Exported {len(examples)} examples → {args.output}")
+            else:
+                classifier = LocalClassifier.load(args.model)
+                if classifier is None:
+                    print(f"❌ No trained model at {args.model} (run: python local_classifier.py train)")
+                    return 1
+                classifier.save(args.output)
+                print(f"✅ Exported model ({classifier.model['trained_examples']} examples) → {args.output}")
+
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        store.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,12 +4,15 @@ Intelligent email management with AI-powered analysis and actions
 """
 
 import sys
-from typing import List, Dict
+from typing import List, Dict, Optional
 
-from config import check_api_keys, DATE_RANGES
+from config import check_api_keys, DATE_RANGES, DEFAULT_FOLDER
 from gmail_connector import GmailConnector
+from triage_pipeline import TriagePipeline
+from idle_watcher import IdleWatcher
 from email_analyzer import EmailAnalyzer, EmailAction
 from scaledown_service import ScaleDownService
+from resilience import get_resilience_status
 
 
 def print_header():
@@ -27,8 +30,9 @@ def get_login_choice() -> str:
     print("\n🔐 Choose Mode:")
     print("1. Login with Gmail (analyze your real inbox)")
     print("2. See Demo (sample emails)")
+    print("3. Watch Gmail (triage new mail as it arrives)")
     
-    choice = input("\nEnter choice (1 or 2): ").strip()
+    choice = input("\nEnter choice (1-3): ").strip()
     return choice
 
 
@@ -77,11 +81,11 @@ def demo_mode():
         }
     ]
     
-    # Analyze each sample
+    # Analyze all samples in one batched AI request
     analyzer = EmailAnalyzer()
+    results = analyzer.analyze_batch(sample_emails)
     
-    for i, email_data in enumerate(sample_emails, 1):
-        result = analyzer.analyze(email_data)
+    for i, (email_data, result) in enumerate(zip(sample_emails, results), 1):
         print_analysis_summary(i, len(sample_emails), email_data, result)
     
     print("\n" + "=" * 70)
@@ -97,51 +101,34 @@ def gmail_mode():
     print("=" * 70)
     
     print("\n⚠️  Important: Gmail Security")
-    print("   You need an 'App Password' (not your regular password)")
-    print("   Steps:")
-    print("   1. Enable 2-Step Verification")
-    print("   2. Go to: https://myaccount.google.com/apppasswords")
-    print("   3. Generate App Password")
-    print("   4. Use that password here\n")
-    
-    email_address = input("Gmail address: ").strip()
-    password = input("App Password: ").strip()
-    
-    if not email_address or not password:
-        print("\n❌ Email and password required!")
-        return
-    
-    # Connect to Gmail
-    gmail = GmailConnector(email_address, password)
-    
-    if not gmail.connect():
+    gmail = login_gmail()
+    if not gmail:
         return
     
     # Select date range
     date_range = select_date_range()
+    query, folder = select_search_filter()
     
-    # Fetch emails
-    emails = gmail.fetch_emails(date_range)
-    
-    if not emails:
-        gmail.disconnect()
-        return
-    
-    # Analyze emails
-    print("\n" + "=" * 70)
-    print("🔍 AI ANALYSIS IN PROGRESS")
-    print("=" * 70)
-    
+    # Fetch, compress and analyze concurrently - IMAP download overlaps with AI analysis
     analyzer = EmailAnalyzer()
     analysis_results = []
+    pipeline = TriagePipeline(gmail, analyzer)
     
-    for i, email_data in enumerate(emails, 1):
-        result = analyzer.analyze(email_data)
+    for email_data, result in pipeline.run(date_range, query=query, folder=folder):
+        if not analysis_results:
+            print("\n" + "=" * 70)
+            print("🔍 AI ANALYSIS IN PROGRESS")
+            print("=" * 70)
+        
         analysis_results.append({
             'email': email_data,
             'analysis': result
         })
-        print_analysis_summary(i, len(emails), email_data, result)
+        print_analysis_summary(len(analysis_results), gmail.last_fetch_total, email_data, result)
+    
+    if not analysis_results:
+        gmail.disconnect()
+        return
     
     # Show summary and get confirmation
     show_action_summary(analysis_results)
@@ -159,6 +146,60 @@ def gmail_mode():
     gmail.disconnect()
 
 
+def watch_mode():
+    """Watch Gmail with IMAP IDLE and analyze new mail as it arrives"""
+    print("\n" + "=" * 70)
+    print("👀 GMAIL WATCH MODE")
+    print("=" * 70)
+    
+    print("\n⚠️  Important: Gmail Security")
+    gmail = login_gmail()
+    if not gmail:
+        return
+    
+    analyzer = EmailAnalyzer()
+    
+    def on_result(email_data: Dict, analysis):
+        count = watcher.emails_triaged
+        print_analysis_summary(count, count, email_data, analysis)
+    
+    watcher = IdleWatcher(gmail, analyzer, on_result=on_result)
+    
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print("\n\n⏹️  Stopped watching")
+    
+    # Watch mode only previews - actions still go through option 1
+    show_session_statistics(analyzer.scaledown)
+    gmail.disconnect()
+
+
+def login_gmail() -> Optional[GmailConnector]:
+    """Prompt for Gmail credentials and connect"""
+    print("   You need an 'App Password' (not your regular password)")
+    print("   Steps:")
+    print("   1. Enable 2-Step Verification")
+    print("   2. Go to: https://myaccount.google.com/apppasswords")
+    print("   3. Generate App Password")
+    print("   4. Use that password here\n")
+    
+    email_address = input("Gmail address: ").strip()
+    password = input("App Password: ").strip()
+    
+    if not email_address or not password:
+        print("\n❌ Email and password required!")
+        return None
+    
+    # Connect to Gmail
+    gmail = GmailConnector(email_address, password)
+    
+    if not gmail.connect():
+        return None
+    
+    return gmail
+
+
 def select_date_range() -> str:
     """Let user select email date range"""
     print("\n📅 Select Email Range:")
@@ -183,6 +224,17 @@ def select_date_range() -> str:
     return "latest7"
 
 
+def select_search_filter():
+    """Let user narrow the fetch server-side with Gmail search syntax and a label"""
+    print("\n🔎 Optional Gmail filter (press Enter to skip)")
+    print("   e.g. -category:promotions is:unread newer_than:2d")
+    
+    query = input("Filter: ").strip()
+    folder = input(f"Label/folder (default {DEFAULT_FOLDER}): ").strip()
+    
+    return query or None, folder or None
+
+
 def print_analysis_summary(current: int, total: int, email_data: Dict, analysis):
     """Print summary of email analysis"""
     print(f"\n{'─'*70}")
@@ -195,6 +247,8 @@ def print_analysis_summary(current: int, total: int, email_data: Dict, analysis)
     print(f"   Action: {analysis.action.value}")
     print(f"   Summary: {analysis.summary}")
     print(f"   Reasoning: {analysis.reasoning}")
+    if analysis.duplicate_of:
+        print(f"   Reused verdict of near-duplicate: {analysis.duplicate_of['subject']}")
     if analysis.key_points:
         print(f"   Key Points: {', '.join(analysis.key_points)}")
 
@@ -252,33 +306,30 @@ def execute_actions(gmail: GmailConnector, results: List[Dict]):
     print("🔄 EXECUTING ACTIONS")
     print("=" * 70)
     
+    # One UID-set STORE per action instead of one round trip per email
+    outcome = gmail.execute_bulk_actions(results)
+    
+    done_labels = {
+        EmailAction.STAR: "Starred",
+        EmailAction.MOVE_TO_SPAM: "Moved to spam",
+        EmailAction.ARCHIVE: "Archived",
+        EmailAction.MARK_READ: "Marked as read"
+    }
+    
     for i, result in enumerate(results, 1):
         email_data = result['email']
-        analysis = result['analysis']
-        action = analysis.action
+        action = result['analysis'].action
         msg_id = email_data['msg_id']
         
         print(f"\n[{i}/{len(results)}] {email_data['subject'][:50]}...")
         print(f"   Action: {action.value}")
         
-        if action == EmailAction.STAR:
-            if gmail.star_email(msg_id):
-                print(f"   ✓ Starred")
-        
-        elif action == EmailAction.MOVE_TO_SPAM:
-            if gmail.move_to_spam(msg_id):
-                print(f"   ✓ Moved to spam")
-        
-        elif action == EmailAction.ARCHIVE:
-            if gmail.archive_email(msg_id):
-                print(f"   ✓ Archived")
-        
-        elif action == EmailAction.MARK_READ:
-            if gmail.mark_as_read(msg_id):
-                print(f"   ✓ Marked as read")
-        
-        else:
+        if action == EmailAction.NOTHING:
             print(f"   ➖ No action taken")
+        elif outcome.get(str(msg_id)):
+            print(f"   ✓ {done_labels[action]}")
+        else:
+            print(f"   ❌ Failed: {action.value}")
     
     print("\n" + "=" * 70)
     print("✅ ALL ACTIONS COMPLETED!")
@@ -296,8 +347,17 @@ def show_session_statistics(scaledown: ScaleDownService):
     print(f"  Total compressions: {stats['total_compressions']}")
     print(f"  Total tokens saved: {stats['total_tokens_saved']}")
     print(f"  Average savings: {stats['average_savings']:.0f} tokens per email")
+    print(f"  Cache hits: {stats['cache_hits']} (misses: {stats['cache_misses']})")
+    print(f"  Skipped (too short to benefit): {stats['skipped_compressions']}")
     print(f"\n💰 Cost Savings: ~{stats['total_tokens_saved'] * 0.0000005:.4f} USD")
     print(f"   (Based on typical LLM pricing)")
+    
+    upstreams = get_resilience_status()
+    if upstreams:
+        print(f"\nUpstream APIs:")
+        for endpoint, status in upstreams.items():
+            print(f"  {endpoint}: {status['state']} "
+                  f"({status['calls']} calls, {status['retries']} retries, {status['failures']} failures)")
 
 
 def main():
@@ -323,6 +383,8 @@ def main():
         demo_mode()
     elif choice == "1":
         gmail_mode()
+    elif choice == "3":
+        watch_mode()
     else:
         print("\n❌ Invalid choice")
         return 1
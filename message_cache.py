@@ -0,0 +1,132 @@
+"""
+Message Cache - Local SQLite store of parsed emails
+Keyed by account, folder, UIDVALIDITY, UID and fetch mode so unchanged mail is never re-downloaded
+"""
+
+import json
+import time
+from typing import Dict, List
+
+from config import MESSAGE_CACHE_PATH, MESSAGE_CACHE_TTL_SECONDS, MESSAGE_CACHE_MAX_ENTRIES
+from sqlite_store import SqliteStore
+
+
+# Bump whenever the parsed email dict changes shape - older entries are dropped on open
+SCHEMA_VERSION = 2  # 2: 'headers' dict, per fetch mode
+
+# Expire and cap entries every this many stored emails
+PRUNE_INTERVAL = 500
+
+
+class MessageCache(SqliteStore):
+    """On-disk cache of parsed email dicts (subject, sender, date, truncated body)"""
+
+    size_label = 'cached_messages'
+
+    def __init__(self, path: str = MESSAGE_CACHE_PATH, ttl_seconds: float = MESSAGE_CACHE_TTL_SECONDS,
+                 max_entries: int = MESSAGE_CACHE_MAX_ENTRIES):
+        super().__init__(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._writes = 0
+
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._db.execute("DROP TABLE IF EXISTS messages")
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                account TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                uid INTEGER NOT NULL,
+                mode TEXT NOT NULL,
+                data TEXT NOT NULL,
+                cached_at REAL NOT NULL,
+                PRIMARY KEY (account, folder, uidvalidity, uid, mode)
+            )
+        """)
+        self._prune(time.time())
+        self._db.commit()
+
+    def get_many(self, account: str, folder: str, uidvalidity: int, uids: List[int],
+                 mode: str = "full") -> Dict[int, Dict]:
+        """Look up cached emails fetched in a given mode ("full"/"partial"), returning {uid: email dict}"""
+
+        found = {}
+        if not uids:
+            return found
+
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(uids), 500):
+                chunk = uids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT uid, data FROM messages WHERE account = ? AND folder = ? "
+                    f"AND uidvalidity = ? AND mode = ? AND cached_at >= ? AND uid IN ({placeholders})",
+                    [account.lower(), folder, uidvalidity, mode, self._cutoff()] + list(chunk)
+                ).fetchall()
+                found.update((uid, json.loads(data)) for uid, data in rows)
+
+            self.hits += len(found)
+            self.misses += len(uids) - len(found)
+
+        return found
+
+    def cached_uids(self, account: str, folder: str, uidvalidity: int, mode: str = "full") -> set:
+        """UIDs already cached for a mailbox and fetch mode (without loading their contents)"""
+
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT uid FROM messages WHERE account = ? AND folder = ? AND uidvalidity = ? AND mode = ? "
+                "AND cached_at >= ?",
+                (account.lower(), folder, uidvalidity, mode, self._cutoff())
+            ).fetchall()
+        return {uid for (uid,) in rows}
+
+    def put_many(self, account: str, folder: str, uidvalidity: int, emails: List[Dict], mode: str = "full"):
+        """Store freshly fetched emails (msg_id is the UID)"""
+
+        if not emails:
+            return
+
+        now = time.time()
+        rows = [
+            (account.lower(), folder, uidvalidity, int(email_data['msg_id']), mode, json.dumps(email_data), now)
+            for email_data in emails
+        ]
+
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            previous, self._writes = self._writes, self._writes + len(rows)
+            if previous // PRUNE_INTERVAL != self._writes // PRUNE_INTERVAL:
+                self._prune(now)
+            self._db.commit()
+
+    def prune_stale(self, account: str, folder: str, uidvalidity: int):
+        """Drop entries from an older UIDVALIDITY - their UIDs no longer mean anything"""
+
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM messages WHERE account = ? AND folder = ? AND uidvalidity != ?",
+                (account.lower(), folder, uidvalidity)
+            )
+            self._db.commit()
+
+    def _size(self) -> int:
+        return self._count_rows("messages")
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds else 0.0
+
+    def _prune(self, now: float):
+        """Drop expired entries, then the oldest beyond max_entries (caller commits)"""
+
+        if self.ttl_seconds:
+            self._db.execute("DELETE FROM messages WHERE cached_at < ?", (now - self.ttl_seconds,))
+        if self.max_entries:
+            self._db.execute("""
+                DELETE FROM messages WHERE rowid IN (
+                    SELECT rowid FROM messages ORDER BY cached_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
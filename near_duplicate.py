@@ -0,0 +1,214 @@
+"""
+Near-Duplicate Index - MinHash LSH over normalized email text
+Lets mail blasts and alerts that differ only in names, dates or tracking IDs reuse one AI verdict
+"""
+
+import hashlib
+import json
+import random
+import re
+import time
+from array import array
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    NEAR_DUPLICATE_MIN_SIMILARITY, NEAR_DUPLICATE_MIN_TOKENS, NEAR_DUPLICATE_SAME_SENDER,
+    NEAR_DUPLICATE_MAX_ENTRIES, NEAR_DUPLICATE_INDEX_PATH, VERDICT_CACHE_TTL_SECONDS, MAX_EMAIL_BODY_LENGTH
+)
+from sqlite_store import SqliteStore, sender_address
+
+
+SHINGLE_SIZE = 3
+
+# 20 bands of 5 rows: pairs at 0.8 similarity become candidates >99.9% of the time,
+# pairs below ~0.5 rarely do; candidates are then checked against the real threshold
+BANDS = 20
+ROWS = 5
+MERSENNE_PRIME = (1 << 61) - 1
+_permutation_rng = random.Random(20240601)  # Fixed seed - signatures are persisted
+PERMUTATIONS = [
+    (_permutation_rng.randrange(1, MERSENNE_PRIME), _permutation_rng.randrange(MERSENNE_PRIME))
+    for _ in range(BANDS * ROWS)
+]
+
+# Variable parts of templated mail, replaced before hashing
+URL_RE = re.compile(r'https?://\S+|www\.\S+', re.IGNORECASE)
+EMAIL_RE = re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')
+ID_RE = re.compile(r'\b(?=[a-z]*\d)[a-z\d_-]{6,}\b')  # tracking IDs, order numbers, hashes
+NUMBER_RE = re.compile(r'\d+')
+WORD_RE = re.compile(r'[a-z#]+')
+
+
+def normalized_tokens(email_data: Dict) -> List[str]:
+    """Subject and body words with URLs, addresses, IDs and numbers masked"""
+
+    text = f"{email_data.get('subject', '')}\n{email_data.get('body', '')[:MAX_EMAIL_BODY_LENGTH]}".lower()
+    text = URL_RE.sub(" url ", text)
+    text = EMAIL_RE.sub(" addr ", text)
+    text = ID_RE.sub(" id ", text)
+    text = NUMBER_RE.sub("#", text)
+    return WORD_RE.findall(text)
+
+
+def minhash(tokens: List[str]) -> array:
+    """MinHash signature of the word shingles; equal positions estimate Jaccard similarity"""
+
+    shingles = {
+        int.from_bytes(hashlib.blake2b(" ".join(tokens[start:start + SHINGLE_SIZE]).encode("utf-8"),
+                                       digest_size=8).digest(), "big")
+        for start in range(max(1, len(tokens) - SHINGLE_SIZE + 1))
+    }
+    return array("I", (
+        min((a * shingle + b) % MERSENNE_PRIME for shingle in shingles) & 0xFFFFFFFF
+        for a, b in PERMUTATIONS
+    ))
+
+
+def similarity(first: array, second: array) -> float:
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+
+def sender_scope(email_data: Dict) -> str:
+    """Sender domain - near-duplicates are only matched within one sender"""
+
+    return sender_address(email_data.get('sender', '')).rpartition("@")[2]
+
+
+class NearDuplicateIndex(SqliteStore):
+    """
+    LSH index of AI verdicts keyed by MinHash signature, persisted in SQLite
+
+    Signatures are split into bands; emails sharing any band are candidates,
+    and a candidate is reused only if its estimated similarity reaches
+    min_similarity.
+    """
+
+    size_label = 'indexed_emails'
+
+    def __init__(self, version: str, path: str = NEAR_DUPLICATE_INDEX_PATH,
+                 min_similarity: float = NEAR_DUPLICATE_MIN_SIMILARITY, min_tokens: int = NEAR_DUPLICATE_MIN_TOKENS,
+                 same_sender: bool = NEAR_DUPLICATE_SAME_SENDER, max_entries: int = NEAR_DUPLICATE_MAX_ENTRIES,
+                 ttl_seconds: float = VERDICT_CACHE_TTL_SECONDS):
+        super().__init__(path)
+        self.version = version
+        self.min_similarity = min_similarity
+        self.min_tokens = min_tokens
+        self.same_sender = same_sender
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._buckets = defaultdict(set)  # (band, rows) → digests
+        self._entries = {}  # digest → (signature, scope, subject, ai_response)
+
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                digest TEXT NOT NULL,
+                version TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                scope TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                data TEXT NOT NULL,
+                indexed_at REAL NOT NULL,
+                PRIMARY KEY (digest, version)
+            )
+        """)
+        self._prune()
+        self._load()
+
+    def find(self, email_data: Dict) -> Optional[Dict]:
+        """
+        Look up the most similar already-analyzed email
+
+        Returns:
+            {'digest', 'subject', 'similarity', 'ai_response'} or None
+        """
+
+        key = self._signature(email_data)
+        if key is None:
+            return None
+        signature, scope = key
+
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(signature):
+                candidates |= self._buckets.get(band_key, set())
+
+            best = None
+            for digest in candidates:
+                other, other_scope, subject, ai_response = self._entries[digest]
+                if self.same_sender and other_scope != scope:
+                    continue
+                score = similarity(signature, other)
+                if score >= self.min_similarity and (best is None or score > best['similarity']):
+                    best = {'digest': digest, 'subject': subject, 'similarity': score, 'ai_response': ai_response}
+
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return best
+
+    def add(self, email_data: Dict, digest: str, ai_response: Dict):
+        """Index an email the AI analyzed (emails too short to match reliably are skipped)"""
+
+        key = self._signature(email_data)
+        if key is None:
+            return
+        signature, scope = key
+        subject = email_data.get('subject', '')
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO signatures VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (digest, self.version, signature.tobytes(), scope, subject, json.dumps(ai_response), time.time())
+            )
+            self._db.commit()
+            self._remember(digest, signature, scope, subject, ai_response)
+
+    def _size(self) -> int:
+        return len(self._entries)
+
+    def _signature(self, email_data: Dict) -> Optional[Tuple[array, str]]:
+        tokens = normalized_tokens(email_data)
+        if len(tokens) < self.min_tokens:
+            return None
+        return minhash(tokens), sender_scope(email_data)
+
+    @staticmethod
+    def _band_keys(signature: array):
+        for band in range(BANDS):
+            yield band, signature[band * ROWS:(band + 1) * ROWS].tobytes()
+
+    def _remember(self, digest: str, signature: array, scope: str, subject: str, ai_response: Dict):
+        previous = self._entries.get(digest)
+        if previous is not None:
+            for band_key in self._band_keys(previous[0]):
+                self._buckets[band_key].discard(digest)
+
+        self._entries[digest] = (signature, scope, subject, ai_response)
+        for band_key in self._band_keys(signature):
+            self._buckets[band_key].add(digest)
+
+    def _prune(self):
+        """Drop other prompt/model versions, expired entries and the oldest beyond max_entries"""
+
+        self._db.execute("DELETE FROM signatures WHERE version != ?", (self.version,))
+        if self.ttl_seconds:
+            self._db.execute("DELETE FROM signatures WHERE indexed_at < ?", (time.time() - self.ttl_seconds,))
+        if self.max_entries:
+            self._db.execute(
+                "DELETE FROM signatures WHERE digest NOT IN "
+                "(SELECT digest FROM signatures ORDER BY indexed_at DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+        self._db.commit()
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT digest, signature, scope, subject, data FROM signatures ORDER BY indexed_at"
+        ).fetchall()
+        for digest, blob, scope, subject, data in rows:
+            signature = array("I")
+            signature.frombytes(blob)
+            if len(signature) == BANDS * ROWS:
+                self._remember(digest, signature, scope, subject, json.loads(data))
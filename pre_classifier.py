@@ -0,0 +1,127 @@
+"""
+Pre-Classifier - Deterministic first pass over header signals
+Settles obvious bulk mail (newsletters, promotions, failed-auth spam) without an LLM call
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from config import (
+    PROMO_SENDER_DOMAINS, PROMO_SENDER_PREFIXES, PROMO_SUBJECT_KEYWORDS,
+    NEWSLETTER_KEYWORDS, PROTECTED_KEYWORDS, PRE_CLASSIFIER_MIN_SCORE
+)
+from keyword_matcher import KeywordMatcher
+from sqlite_store import sender_address
+
+
+AUTH_RESULT_RE = re.compile(r'\b(spf|dkim|dmarc)=(\w+)', re.IGNORECASE)
+BULK_PRECEDENCE = {"bulk", "list", "junk"}
+
+PROMO_MATCHER = KeywordMatcher(PROMO_SUBJECT_KEYWORDS, whole_words=True)
+NEWSLETTER_MATCHER = KeywordMatcher(NEWSLETTER_KEYWORDS, whole_words=True)
+PROTECTED_MATCHER = KeywordMatcher(PROTECTED_KEYWORDS, whole_words=True)
+
+
+class RuleClassifier:
+    """
+    Header-based classifier that only answers when it is confident
+
+    Returns verdicts in the same dict shape as the Gemini response, so
+    EmailAnalyzer._parse_ai_response turns them into EmailAnalysisResult.
+    """
+
+    def __init__(self, min_score: int = PRE_CLASSIFIER_MIN_SCORE):
+        self.min_score = min_score
+        self.classified = 0
+        self.deferred = 0
+
+    def classify(self, email_data: Dict) -> Optional[Dict]:
+        """Return an analysis dict for obvious bulk/spam mail, or None to defer to the LLM"""
+
+        headers = {name.lower(): value for name, value in (email_data.get('headers') or {}).items()}
+        sender = email_data.get('sender', '')
+        subject = email_data.get('subject', '')
+
+        address = sender_address(sender)
+        local_part, _, domain = address.partition("@")
+
+        # Only the receiving server's (topmost) Authentication-Results is trusted
+        auth = {}
+        for method, result in AUTH_RESULT_RE.findall(headers.get('authentication-results', '')):
+            auth.setdefault(method.lower(), result.lower())
+
+        # Spoofed mail: the sender's domain failed DMARC and another check
+        if auth.get('dmarc') == 'fail' and 'fail' in (auth.get('spf'), auth.get('dkim')):
+            return self._verdict(
+                "SPAM", "MOVE_TO_SPAM", 1,
+                f"Sender authentication failed for {domain or address}",
+                ["DMARC fail", f"SPF {auth.get('spf', 'none')}", f"DKIM {auth.get('dkim', 'none')}"]
+            )
+
+        # Anything that might matter personally goes to the LLM
+        if PROTECTED_MATCHER.search(subject):
+            self.deferred += 1
+            return None
+
+        bulk_signals = []
+        if headers.get('list-unsubscribe'):
+            bulk_signals.append("List-Unsubscribe header")
+        if headers.get('list-id'):
+            bulk_signals.append("List-Id header")
+        if headers.get('precedence', '').strip().lower() in BULK_PRECEDENCE:
+            bulk_signals.append(f"Precedence: {headers['precedence'].strip().lower()}")
+
+        promo_signals = []
+        if local_part in PROMO_SENDER_PREFIXES:
+            promo_signals.append(f"promotional sender '{local_part}@'")
+        if any(domain == promo or domain.endswith("." + promo) for promo in PROMO_SENDER_DOMAINS):
+            promo_signals.append(f"marketing domain {domain}")
+        if PROMO_MATCHER.search(subject):
+            promo_signals.append("promotional subject")
+
+        newsletter_signals = []
+        if NEWSLETTER_MATCHER.search(subject) or NEWSLETTER_MATCHER.search(local_part):
+            newsletter_signals.append("newsletter/digest wording")
+
+        # Bulk headers alone are not enough - receipts, alerts, code review and
+        # company mailing lists carry them too, so a content signal is required
+        if not bulk_signals:
+            self.deferred += 1
+            return None
+
+        if len(bulk_signals) + len(promo_signals) >= self.min_score and promo_signals:
+            return self._verdict(
+                "PROMOTIONAL", "ARCHIVE", 2,
+                f"Marketing email from {domain or address}",
+                bulk_signals + promo_signals
+            )
+
+        if len(bulk_signals) + len(newsletter_signals) >= self.min_score and newsletter_signals:
+            return self._verdict(
+                "NEWSLETTER", "ARCHIVE", 3,
+                f"Mailing list / newsletter from {domain or address}",
+                bulk_signals + newsletter_signals
+            )
+
+        self.deferred += 1
+        return None
+
+    def get_statistics(self) -> Dict:
+        """Get how many emails were settled locally vs sent to the LLM"""
+        return {
+            'classified': self.classified,
+            'deferred': self.deferred
+        }
+
+    def _verdict(self, category: str, action: str, priority: int, summary: str, signals: List[str]) -> Dict:
+        self.classified += 1
+        return {
+            "category": category,
+            "action": action,
+            "priority_score": priority,
+            "summary": summary,
+            "reasoning": "Rule-based pre-classification: " + ", ".join(signals),
+            "key_points": signals,
+            "sentiment": "neutral",
+            "requires_response": False
+        }
@@ -0,0 +1,121 @@
+"""
+Rate Limiter - Token buckets for requests/min and tokens/min per upstream API
+Lets concurrent analysis workers share one budget without tripping provider quotas
+"""
+
+import threading
+import time
+from typing import Dict
+
+from config import (
+    SCALEDOWN_REQUESTS_PER_MINUTE, SCALEDOWN_TOKENS_PER_MINUTE,
+    GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE
+)
+
+
+# Upstream name → (requests per minute, tokens per minute); 0 = unlimited
+UPSTREAM_LIMITS = {
+    "scaledown": (SCALEDOWN_REQUESTS_PER_MINUTE, SCALEDOWN_TOKENS_PER_MINUTE),
+    "gemini": (GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE),
+}
+
+
+class RateLimiter:
+    """
+    Blocking limiter with a request bucket and a token bucket
+
+    Each bucket holds up to one minute of budget and refills continuously,
+    so short bursts go through immediately and sustained load is paced.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+
+        self._request_budget = float(requests_per_minute)
+        self._token_budget = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+        self.waits = 0
+        self.waited_seconds = 0.0
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Block until one request costing `tokens` fits in both buckets
+
+        Returns:
+            Seconds spent waiting
+        """
+
+        # A single oversized request may use at most a full bucket
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+
+                wait = max(0.0, self._paused_until - time.monotonic())
+                if self.requests_per_minute and self._request_budget < 1:
+                    wait = max(wait, (1 - self._request_budget) * 60.0 / self.requests_per_minute)
+                if self.tokens_per_minute and self._token_budget < tokens:
+                    wait = max(wait, (tokens - self._token_budget) * 60.0 / self.tokens_per_minute)
+
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._request_budget -= 1
+                    if self.tokens_per_minute:
+                        self._token_budget -= tokens
+                    if waited:
+                        self.waits += 1
+                        self.waited_seconds += waited
+                    return waited
+
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds: float):
+        """Hold back every caller for a while (e.g. after a 429 with Retry-After)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def get_statistics(self) -> Dict:
+        """Get configured limits and how long callers were held back"""
+        with self._lock:
+            return {
+                'requests_per_minute': self.requests_per_minute,
+                'tokens_per_minute': self.tokens_per_minute,
+                'waits': self.waits,
+                'waited_seconds': self.waited_seconds
+            }
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+
+        if self.requests_per_minute:
+            self._request_budget = min(
+                self.requests_per_minute, self._request_budget + elapsed * self.requests_per_minute / 60.0
+            )
+        if self.tokens_per_minute:
+            self._token_budget = min(
+                self.tokens_per_minute, self._token_budget + elapsed * self.tokens_per_minute / 60.0
+            )
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(upstream: str) -> RateLimiter:
+    """Process-wide limiter for an upstream API, shared by every service instance"""
+
+    with _limiters_lock:
+        if upstream not in _limiters:
+            requests_per_minute, tokens_per_minute = UPSTREAM_LIMITS.get(upstream, (0, 0))
+            _limiters[upstream] = RateLimiter(requests_per_minute, tokens_per_minute)
+        return _limiters[upstream]
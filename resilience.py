@@ -0,0 +1,262 @@
+"""
+Resilience - Retries, backoff, circuit breakers and time budgets for upstream APIs
+Shared by ScaleDownService and GeminiService so rate limiting slows a batch down instead of failing it
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+from config import (
+    RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY_SECONDS, RETRY_MAX_DELAY_SECONDS,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS
+)
+
+
+# Statuses worth retrying; 429 paces callers but never trips a breaker
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMITED_STATUS = 429
+
+
+class ResilienceError(Exception):
+    """Base class for requests the resilience layer refused to send"""
+
+
+class CircuitOpenError(ResilienceError):
+    """Endpoint has failed repeatedly and is cooling down"""
+
+
+class BudgetExhaustedError(ResilienceError):
+    """The current email's time budget ran out"""
+
+
+class CircuitBreaker:
+    """Closed → open after repeated failures → half-open single probe → closed"""
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.last_error = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a request may be sent right now"""
+
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    return False
+                self.state = "half_open"
+                self._probing = False
+
+            if self.state == "half_open":
+                # Only one probe at a time while half-open
+                if self._probing:
+                    return False
+                self._probing = True
+
+            self.calls += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probing = False
+
+    def record_failure(self, error: str):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = error
+            self._probing = False
+
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"   🔌 Circuit open for {self.name} ({error})")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def release_probe(self):
+        """End a half-open probe that neither succeeded nor failed (e.g. 429)"""
+        with self._lock:
+            self._probing = False
+
+    def get_status(self) -> Dict:
+        with self._lock:
+            retry_in = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at)) if self.state == "open" else 0.0
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'calls': self.calls,
+                'failures': self.failures,
+                'retries': self.retries,
+                'retry_in': retry_in,
+                'last_error': self.last_error
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_budget = threading.local()
+
+
+def get_circuit_breaker(endpoint: str) -> CircuitBreaker:
+    """Process-wide breaker for an endpoint"""
+
+    with _breakers_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(endpoint)
+        return _breakers[endpoint]
+
+
+def get_resilience_status() -> Dict[str, Dict]:
+    """State of every endpoint seen so far"""
+
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.get_status() for name, breaker in breakers.items()}
+
+
+@contextmanager
+def time_budget(seconds: Optional[float] = None, deadline: Optional[float] = None):
+    """
+    Bound the total time upstream calls may take in this thread
+
+    Nested budgets never extend an outer one. Yields the effective
+    time.monotonic() deadline.
+    """
+
+    previous = getattr(_budget, 'deadline', None)
+    if deadline is None:
+        deadline = time.monotonic() + seconds if seconds else None
+    if previous is not None:
+        deadline = previous if deadline is None else min(deadline, previous)
+
+    _budget.deadline = deadline
+    try:
+        yield deadline
+    finally:
+        _budget.deadline = previous
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left in this thread's budget (None = unbounded)"""
+    deadline = getattr(_budget, 'deadline', None)
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def call_with_retry(endpoint: str, send: Callable[[float], object], timeout: float, rate_limiter=None,
+                    tokens: int = 0, max_attempts: int = RETRY_MAX_ATTEMPTS):
+    """
+    Send a request with backoff, Retry-After handling and a circuit breaker
+
+    Args:
+        endpoint: Breaker name (e.g. "scaledown", "gemini:gemini-1.5-flash")
+        send: Performs one attempt given a timeout in seconds, returns the response
+        timeout: Per-attempt timeout, shortened to fit the time budget
+        rate_limiter: Shared limiter to acquire before each attempt and pause on 429
+        tokens: Estimated tokens per attempt for the limiter
+
+    Returns:
+        The last response - successful, non-retryable, or still failing after max_attempts
+
+    Raises:
+        CircuitOpenError, BudgetExhaustedError, or the last transport error
+    """
+
+    breaker = get_circuit_breaker(endpoint)
+    max_attempts = max(1, max_attempts)
+
+    for attempt in range(max_attempts):
+        remaining = remaining_budget()
+        if remaining is not None and remaining <= 0:
+            raise BudgetExhaustedError(f"time budget exhausted before calling {endpoint}")
+        if not breaker.allow():
+            raise CircuitOpenError(f"{endpoint} is cooling down after repeated failures")
+
+        if rate_limiter is not None:
+            rate_limiter.acquire(tokens)
+            remaining = remaining_budget()
+            if remaining is not None and remaining <= 0:
+                breaker.release_probe()
+                raise BudgetExhaustedError(f"time budget exhausted waiting to call {endpoint}")
+
+        attempt_timeout = timeout if remaining is None else max(1.0, min(timeout, remaining))
+        last_attempt = attempt == max_attempts - 1
+
+        try:
+            response = send(attempt_timeout)
+        except Exception as e:
+            breaker.record_failure(type(e).__name__)
+            if last_attempt:
+                raise
+            delay = _backoff_delay(attempt)
+        else:
+            status = response.status_code
+            if status not in RETRYABLE_STATUSES:
+                breaker.record_success()
+                return response
+
+            retry_after = _retry_after(response)
+            if status == RATE_LIMITED_STATUS:
+                # Throttled, not broken - slow every caller of this upstream down
+                breaker.release_probe()
+                delay = retry_after if retry_after is not None else _backoff_delay(attempt)
+                if rate_limiter is not None:
+                    rate_limiter.pause(delay)
+            else:
+                breaker.record_failure(f"HTTP {status}")
+                delay = retry_after if retry_after is not None else _backoff_delay(attempt)
+
+            if last_attempt:
+                return response
+
+        remaining = remaining_budget()
+        if remaining is not None and delay >= remaining:
+            raise BudgetExhaustedError(f"no time left to retry {endpoint}")
+
+        breaker.record_retry()
+        print(f"   ⏳ Retrying {endpoint} in {delay:.1f}s (attempt {attempt + 2}/{max_attempts})")
+        time.sleep(delay)
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff, jittered over the upper half so concurrent workers spread out"""
+    ceiling = min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * (2 ** attempt))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def _retry_after(response) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date)"""
+
+    value = response.headers.get("Retry-After") if getattr(response, "headers", None) is not None else None
+    if not value:
+        return None
+
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+
+    return min(RETRY_MAX_DELAY_SECONDS, max(0.0, delay))
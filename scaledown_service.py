@@ -3,10 +3,31 @@ ScaleDown Service - Intelligent Prompt Compression
 Reduces token usage by 60-80% while preserving meaning
 """
 
-import requests
-import json
-from typing import Dict
-from config import SCALEDOWN_API_KEY
+import hashlib
+import threading
+import time
+from typing import Dict, Optional
+from config import (
+    SCALEDOWN_API_KEY, SCALEDOWN_RATE, COMPRESS_STATIC_PROMPT, STATIC_PROMPT_RETRY_SECONDS, COMPRESSION_CACHE_ENABLED,
+    COMPRESSION_MIN_TOKENS, COMPRESSION_MIN_SAVED_MS, LLM_MS_PER_INPUT_TOKEN
+)
+from http_session import get_http_session, HTTP_ERRORS
+from compression_cache import CompressionCache, get_compression_cache
+from rate_limiter import get_rate_limiter
+from token_estimator import estimate_tokens
+from resilience import call_with_retry, ResilienceError
+
+
+# Static instruction blocks compressed once per process (sha256 → (text, retry_at or None))
+_static_cache: Dict[str, tuple] = {}
+_static_lock = threading.Lock()
+
+STATIC_PROMPT_FOCUS = "Keep every category, action, rule and the exact JSON response format."
+
+# Priors for the skip policy until this session has observed real compressions
+DEFAULT_COMPRESSION_RATIO = 0.5   # compressed / original tokens
+DEFAULT_COMPRESSION_LATENCY_MS = 400.0
+OBSERVATION_SMOOTHING = 0.2
 
 
 class ScaleDownService:
@@ -17,6 +38,16 @@ class ScaleDownService:
         self.base_url = "https://api.scaledown.xyz/compress/raw/"
         self.total_tokens_saved = 0
         self.compression_count = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.skipped_count = 0
+        self.observed_ratio = DEFAULT_COMPRESSION_RATIO
+        self.observed_latency_ms = DEFAULT_COMPRESSION_LATENCY_MS
+        self.session = get_http_session()
+        self.cache = get_compression_cache() if COMPRESSION_CACHE_ENABLED else None
+        self.rate_limiter = get_rate_limiter("scaledown")
+        # Counters are updated from concurrent analysis workers
+        self._stats_lock = threading.Lock()
     
     def compress_prompt(self, context: str, prompt: str) -> Dict:
         """
@@ -28,12 +59,44 @@ class ScaleDownService:
         - compressed_tokens: Compressed token count
         - savings_percent: Percentage saved
         - success: Whether compression succeeded
+        - decision: "compressed", "cached", "skipped" (not worth a round trip) or "failed"
         """
         
         print(f"\n🗜️  ScaleDown Compression:")
         print(f"   Original context length: {len(context)} chars")
         print(f"   Original prompt length: {len(prompt)} chars")
         
+        # Short prompts go straight to the LLM - the round trip would cost more than it saves
+        estimated_tokens = estimate_tokens(context) + estimate_tokens(prompt)
+        skip_reason = self._skip_reason(estimated_tokens)
+        if skip_reason:
+            with self._stats_lock:
+                self.skipped_count += 1
+            print(f"   ➖ Skipped: {skip_reason}")
+            return {
+                'compressed_prompt': f"{context}\n\n{prompt}",
+                'original_tokens': estimated_tokens,
+                'compressed_tokens': estimated_tokens,
+                'savings_percent': 0,
+                'success': False,
+                'decision': "skipped",
+                'skip_reason': skip_reason
+            }
+        
+        cache_key = CompressionCache.make_key(context, prompt, SCALEDOWN_RATE)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                with self._stats_lock:
+                    self.cache_hits += 1
+                    self.total_tokens_saved += cached['original_tokens'] - cached['compressed_tokens']
+                    self.compression_count += 1
+                print(f"   ✓ Cache hit: {cached['original_tokens']} → {cached['compressed_tokens']} tokens")
+                cached['decision'] = "cached"
+                return cached
+            with self._stats_lock:
+                self.cache_misses += 1
+        
         headers = {
             'x-api-key': self.api_key,
             'Content-Type': 'application/json'
@@ -42,15 +105,23 @@ class ScaleDownService:
         payload = {
             "context": context,
             "prompt": prompt,
-            "scaledown": {"rate": "auto"}
+            "scaledown": {"rate": SCALEDOWN_RATE}
         }
         
         try:
-            response = requests.post(
-                self.base_url,
-                headers=headers,
-                json=payload,
-                timeout=30
+            started = time.monotonic()
+            # Retries 429/5xx with backoff, paced by the shared limiter
+            response = call_with_retry(
+                "scaledown",
+                lambda timeout: self.session.post(
+                    self.base_url,
+                    headers=headers,
+                    json=payload,
+                    timeout=timeout
+                ),
+                timeout=30,
+                rate_limiter=self.rate_limiter,
+                tokens=estimate_tokens(context) + estimate_tokens(prompt)
             )
             response.raise_for_status()
             data = response.json()
@@ -65,20 +136,26 @@ class ScaleDownService:
                 savings = ((original_tokens - compressed_tokens) / original_tokens * 100) if original_tokens > 0 else 0
                 
                 # Track statistics
-                self.total_tokens_saved += (original_tokens - compressed_tokens)
-                self.compression_count += 1
+                with self._stats_lock:
+                    self.total_tokens_saved += (original_tokens - compressed_tokens)
+                    self.compression_count += 1
+                    self._observe(original_tokens, compressed_tokens, (time.monotonic() - started) * 1000)
                 
                 print(f"   ✓ Compressed: {original_tokens} → {compressed_tokens} tokens")
                 print(f"   ✓ Savings: {savings:.1f}%")
                 print(f"   ✓ Total saved this session: {self.total_tokens_saved} tokens")
                 
-                return {
+                result = {
                     'compressed_prompt': compressed_text,
                     'original_tokens': original_tokens,
                     'compressed_tokens': compressed_tokens,
                     'savings_percent': savings,
-                    'success': True
+                    'success': True,
+                    'decision': "compressed"
                 }
+                if self.cache is not None:
+                    self.cache.put(cache_key, result)
+                return result
             else:
                 # Fallback if format is different
                 compressed_text = data.get('compressed_prompt', f"{context}\n\n{prompt}")
@@ -87,10 +164,12 @@ class ScaleDownService:
                     'original_tokens': 0,
                     'compressed_tokens': 0,
                     'savings_percent': 0,
-                    'success': False
+                    'success': False,
+                    'decision': "failed"
                 }
         
-        except requests.exceptions.RequestException as e:
+        # ValueError: a non-JSON body (httpx raises a plain json.JSONDecodeError)
+        except HTTP_ERRORS + (ResilienceError, ValueError) as e:
             print(f"   ⚠️  ScaleDown API error: {e}")
             print(f"   → Falling back to uncompressed prompt")
             
@@ -100,13 +179,80 @@ class ScaleDownService:
                 'original_tokens': 0,
                 'compressed_tokens': 0,
                 'savings_percent': 0,
-                'success': False
+                'success': False,
+                'decision': "failed"
             }
     
+    def compress_static(self, text: str) -> str:
+        """
+        Compress an instruction block that is identical for every email
+        
+        The result is cached for the life of the process, so the block is
+        sent to ScaleDown once instead of alongside every email. A failed
+        compression falls back to the original text, which is reused for
+        STATIC_PROMPT_RETRY_SECONDS so an outage is not retried per email.
+        """
+        
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        
+        with _static_lock:
+            entry = _static_cache.get(key)
+            if entry is not None and (entry[1] is None or time.monotonic() < entry[1]):
+                return entry[0]
+        
+        retry_at = None
+        if not COMPRESS_STATIC_PROMPT:
+            compressed = text
+        else:
+            print(f"\n🗜️  Compressing static analysis instructions (once per session)")
+            result = self.compress_prompt(text, STATIC_PROMPT_FOCUS)
+            if result['success']:
+                compressed = result['compressed_prompt']
+            else:
+                compressed = text
+                retry_at = time.monotonic() + STATIC_PROMPT_RETRY_SECONDS
+                print(f"   → Sending instructions uncompressed for the next {STATIC_PROMPT_RETRY_SECONDS}s")
+        
+        with _static_lock:
+            _static_cache[key] = (compressed, retry_at)
+        return compressed
+    
+    def _skip_reason(self, estimated_tokens: int) -> Optional[str]:
+        """
+        Decide whether compression is worth a round trip
+        
+        Skips prompts under COMPRESSION_MIN_TOKENS, and - when
+        COMPRESSION_MIN_SAVED_MS is set - prompts whose expected LLM time
+        saved (from this session's observed ratio) minus the observed
+        ScaleDown latency falls short of it.
+        """
+        
+        if estimated_tokens < COMPRESSION_MIN_TOKENS:
+            return f"~{estimated_tokens} tokens is below {COMPRESSION_MIN_TOKENS}"
+        
+        if COMPRESSION_MIN_SAVED_MS is not None:
+            with self._stats_lock:
+                saved_tokens = estimated_tokens * (1 - self.observed_ratio)
+                net_ms = saved_tokens * LLM_MS_PER_INPUT_TOKEN - self.observed_latency_ms
+            if net_ms < COMPRESSION_MIN_SAVED_MS:
+                return f"expected net saving {net_ms:.0f} ms is below {COMPRESSION_MIN_SAVED_MS} ms"
+        
+        return None
+    
+    def _observe(self, original_tokens: int, compressed_tokens: int, latency_ms: float):
+        """Fold a real compression into the policy's ratio/latency estimates (caller holds _stats_lock)"""
+        if original_tokens > 0:
+            ratio = compressed_tokens / original_tokens
+            self.observed_ratio += OBSERVATION_SMOOTHING * (ratio - self.observed_ratio)
+        self.observed_latency_ms += OBSERVATION_SMOOTHING * (latency_ms - self.observed_latency_ms)
+    
     def get_statistics(self) -> Dict:
         """Get compression statistics for this session"""
         return {
             'total_compressions': self.compression_count,
             'total_tokens_saved': self.total_tokens_saved,
-            'average_savings': (self.total_tokens_saved / self.compression_count) if self.compression_count > 0 else 0
+            'average_savings': (self.total_tokens_saved / self.compression_count) if self.compression_count > 0 else 0,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'skipped_compressions': self.skipped_count
         }
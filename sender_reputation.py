@@ -0,0 +1,195 @@
+"""
+Sender Reputation - Per-sender and per-domain verdict statistics
+Held in memory for O(1) lookups and persisted in SQLite, so consistent senders skip the LLM
+"""
+
+import json
+import time
+from typing import Dict, Optional
+
+from config import (
+    SENDER_REPUTATION_PATH, SENDER_REPUTATION_MIN_EMAILS, SENDER_REPUTATION_MIN_SHARE,
+    SENDER_REPUTATION_FAST_PATH_CATEGORIES, SENDER_REPUTATION_RECORDED_TTL_SECONDS, SHARED_MAIL_DOMAINS
+)
+from sqlite_store import SqliteStore, sender_address
+
+
+# Drop expired recorded digests every this many new messages
+RECORDED_PRUNE_INTERVAL = 1000
+
+
+def priority_value(priority_score) -> int:
+    """AI priority as an int 1-10; missing or non-numeric values ("high", "7/10") count as 5"""
+
+    try:
+        return min(10, max(1, int(float(priority_score))))
+    except (TypeError, ValueError, OverflowError):
+        return 5
+
+
+def sender_keys(email_data: Dict) -> Dict[str, str]:
+    """Store keys for an email's sender: its address and, unless it is a shared provider, its domain"""
+
+    address = sender_address(email_data.get('sender', ''))
+    domain = address.rpartition("@")[2]
+
+    keys = {'address': "address:" + address} if address else {}
+    if domain and domain not in SHARED_MAIL_DOMAINS:
+        keys['domain'] = "domain:" + domain
+    return keys
+
+
+class SenderReputation(SqliteStore):
+    """
+    Category/action histograms, average priority and last-seen time per sender
+
+    A sender address is trusted for the fast path once it has at least
+    min_emails recorded verdicts and one category and action each cover at
+    least min_share of them. Domain statistics only seed the fallback
+    rules - a new address never inherits its domain's fast-path verdict.
+    Each message (by verdict cache digest) is counted once, however often
+    it is re-triaged within recorded_ttl_seconds.
+    """
+
+    size_label = 'senders'
+
+    def __init__(self, path: str = SENDER_REPUTATION_PATH, min_emails: int = SENDER_REPUTATION_MIN_EMAILS,
+                 min_share: float = SENDER_REPUTATION_MIN_SHARE,
+                 fast_path_categories=SENDER_REPUTATION_FAST_PATH_CATEGORIES,
+                 recorded_ttl_seconds: float = SENDER_REPUTATION_RECORDED_TTL_SECONDS):
+        super().__init__(path)
+        self.min_emails = min_emails
+        self.min_share = min_share
+        self.fast_path_categories = set(fast_path_categories)
+        self.recorded_ttl_seconds = recorded_ttl_seconds
+        self._recorded = {}  # digest → recorded_at
+        self._new_records = 0
+
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS senders (
+                sender TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS recorded (
+                digest TEXT PRIMARY KEY,
+                recorded_at REAL NOT NULL
+            )
+        """)
+        self._prune_recorded(time.time())
+        self._db.commit()
+
+        # Whole store in memory - lookups never touch the database
+        self._stats = {sender: json.loads(data) for sender, data in self._db.execute("SELECT sender, data FROM senders")}
+        self._recorded = dict(self._db.execute("SELECT digest, recorded_at FROM recorded"))
+
+    def record(self, email_data: Dict, digest: str, category: str, action: str, priority_score: int):
+        """Add one verdict (category/action enum names) to the sender's and domain's statistics, once per digest"""
+
+        now = time.time()
+        with self._lock:
+            recorded_at = self._recorded.get(digest)
+            if recorded_at is not None and not self._expired(recorded_at, now):
+                return
+            self._recorded[digest] = now
+
+            rows = []
+            for key in sender_keys(email_data).values():
+                stats = self._stats.setdefault(key, {
+                    'categories': {}, 'actions': {}, 'count': 0, 'priority_total': 0, 'first_seen': now
+                })
+                stats['categories'][category] = stats['categories'].get(category, 0) + 1
+                stats['actions'][action] = stats['actions'].get(action, 0) + 1
+                stats['count'] += 1
+                stats['priority_total'] += priority_value(priority_score)
+                stats['last_seen'] = now
+                rows.append((key, json.dumps(stats), now))
+
+            self._db.executemany("INSERT OR REPLACE INTO senders VALUES (?, ?, ?)", rows)
+            self._db.execute("INSERT OR REPLACE INTO recorded VALUES (?, ?)", (digest, now))
+            self._new_records += 1
+            if self._new_records % RECORDED_PRUNE_INTERVAL == 0:
+                self._prune_recorded(now)
+            self._db.commit()
+
+    def lookup(self, email_data: Dict) -> Optional[Dict]:
+        """
+        Statistics for the sender's address, else its domain
+
+        Returns:
+            Dict with 'sender', 'count', 'categories', 'actions',
+            'average_priority', 'last_seen' and the dominant 'category' /
+            'action' with their 'category_share' / 'action_share', or None
+        """
+
+        with self._lock:
+            for key in sender_keys(email_data).values():
+                stats = self._stats.get(key)
+                if stats:
+                    return self._summarize(key, stats)
+        return None
+
+    def classify(self, email_data: Dict) -> Optional[Dict]:
+        """Return an analysis dict in Gemini's shape for a trusted sender address, or None to defer"""
+
+        with self._lock:
+            key = sender_keys(email_data).get('address')
+            stats = self._stats.get(key) if key else None
+            summary = self._summarize(key, stats) if stats and stats['count'] >= self.min_emails else None
+
+            if (summary is None
+                    or summary['category'] not in self.fast_path_categories
+                    or summary['category_share'] < self.min_share
+                    or summary['action_share'] < self.min_share):
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        sender = summary['sender'].partition(":")[2]
+        return {
+            "category": summary['category'],
+            "action": summary['action'],
+            "priority_score": round(summary['average_priority']),
+            "summary": email_data.get('subject', '') or "No subject",
+            "reasoning": (
+                f"Sender reputation: {summary['categories'][summary['category']]} of {summary['count']} "
+                f"earlier emails from {sender} were {summary['category']}"
+            ),
+            "key_points": [f"Trusted sender pattern ({summary['category_share']:.0%} {summary['category']})"],
+            "sentiment": "neutral",
+            "requires_response": False
+        }
+
+    def _size(self) -> int:
+        return len(self._stats)
+
+    def _expired(self, recorded_at: float, now: float) -> bool:
+        return bool(self.recorded_ttl_seconds) and now - recorded_at > self.recorded_ttl_seconds
+
+    def _prune_recorded(self, now: float):
+        """Forget message digests older than recorded_ttl_seconds, on disk and in memory"""
+
+        if not self.recorded_ttl_seconds:
+            return
+        cutoff = now - self.recorded_ttl_seconds
+        self._db.execute("DELETE FROM recorded WHERE recorded_at < ?", (cutoff,))
+        self._recorded = {digest: at for digest, at in self._recorded.items() if at >= cutoff}
+
+    @staticmethod
+    def _summarize(key: str, stats: Dict) -> Dict:
+        category = max(stats['categories'], key=stats['categories'].get)
+        action = max(stats['actions'], key=stats['actions'].get)
+        return {
+            'sender': key,
+            'count': stats['count'],
+            'categories': dict(stats['categories']),
+            'actions': dict(stats['actions']),
+            'average_priority': stats['priority_total'] / stats['count'],
+            'last_seen': stats['last_seen'],
+            'category': category,
+            'category_share': stats['categories'][category] / stats['count'],
+            'action': action,
+            'action_share': stats['actions'][action] / stats['count']
+        }
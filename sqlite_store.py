@@ -0,0 +1,69 @@
+"""
+SQLite Store - Shared plumbing for the local SQLite stores
+One connection per store, shared by worker threads behind a lock, plus sender address parsing
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+
+ADDRESS_RE = re.compile(r'<([^>]+)>')
+
+
+def sender_address(sender: str) -> str:
+    """Bare lowercase address from a From header ("Name <a@b.com>" → "a@b.com")"""
+
+    sender = sender or ''
+    address = ADDRESS_RE.search(sender)
+    return (address.group(1) if address else sender).strip().lower()
+
+
+class SqliteStore(ABC):
+    """
+    Base for stores backed by one SQLite file
+
+    Opens the connection (creating the directory), tracks session hit/miss
+    counts and closes under the lock. Subclasses create their tables and
+    implement _size(), reported under size_label by get_statistics. A path
+    of None gives a store without a database (self._db is None).
+    """
+
+    size_label = 'entries'
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            # Worker threads share the connection, guarded by the lock
+            self._db = sqlite3.connect(path, check_same_thread=False)
+
+    def get_statistics(self) -> Dict:
+        """Get store size and hit/miss counts for this session"""
+        with self._lock:
+            return {
+                self.size_label: self._size(),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    @abstractmethod
+    def _size(self) -> int:
+        """Number of stored entries (called with the lock held)"""
+
+    def _count_rows(self, table: str) -> int:
+        return self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] if self._db is not None else 0
@@ -4,16 +4,21 @@ Beautiful, user-friendly interface for email management
 """
 
 import streamlit as st
+import itertools
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Add current directory to path for imports
 sys.path.append(str(Path(__file__).parent))
 
-from config import check_api_keys, DATE_RANGES
+from config import (
+    check_api_keys, DATE_RANGES, DEFAULT_FOLDER, DEFAULT_GMAIL_QUERY, STREAM_BATCH_SIZE, ANALYSIS_CONCURRENCY,
+    EMAIL_TIME_BUDGET_SECONDS
+)
 from gmail_connector import GmailConnector
 from email_analyzer import EmailAnalyzer, EmailAction, EmailCategory
-from scaledown_service import ScaleDownService
+from resilience import time_budget
 
 # Page configuration
 st.set_page_config(
@@ -200,6 +205,8 @@ if 'analyzer' not in st.session_state:
     st.session_state.analyzer = None
 if 'actions_executed' not in st.session_state:
     st.session_state.actions_executed = False
+if 'failed_actions' not in st.session_state:
+    st.session_state.failed_actions = 0
 
 
 def main_header():
@@ -255,6 +262,7 @@ def sidebar_config():
             st.metric("Emails Analyzed", len(st.session_state.analyses))
             st.metric("Tokens Saved", f"{stats['total_tokens_saved']:,}")
             st.metric("Avg Savings", f"{stats['average_savings']:.0f} tokens")
+            st.metric("Compression Cache Hits", f"{stats['cache_hits']}/{stats['cache_hits'] + stats['cache_misses']}")
         
         st.markdown("---")
         
@@ -359,6 +367,14 @@ def fetch_emails_page():
         )
 
         selected_key = date_keys[date_options.index(selected_label)]
+        
+        gmail_query = st.text_input(
+            "Gmail filter (optional):",
+            value=DEFAULT_GMAIL_QUERY,
+            placeholder="-category:promotions is:unread newer_than:2d",
+            help="Gmail search syntax, applied on the server before download"
+        )
+        folder = st.text_input("Label / folder:", value=DEFAULT_FOLDER)
 
     with col2:
         st.markdown("""
@@ -378,23 +394,26 @@ def fetch_emails_page():
     col_center = st.columns([1,2,1])
     with col_center[1]:
         if st.button("📬 Fetch & Analyze Emails", use_container_width=True):
-            fetch_and_analyze(selected_key, auto_execute)
+            fetch_and_analyze(selected_key, auto_execute, gmail_query.strip(), folder.strip())
 
 
 
-def fetch_and_analyze(date_range: str, auto_execute: bool):
+def fetch_and_analyze(date_range: str, auto_execute: bool, gmail_query: str = "", folder: str = ""):
     """Fetch and analyze emails"""
     
-    # Fetch emails
+    # Stream emails so analysis starts with the first fetched batch
+    gmail = st.session_state.gmail_client
+    stream = gmail.iter_emails(date_range, query=gmail_query, folder=folder or None)
+    
     with st.spinner(f"📬 Fetching emails ({DATE_RANGES[date_range]})..."):
-        emails = st.session_state.gmail_client.fetch_emails(date_range)
+        first_email = next(stream, None)
         
-        if not emails:
+        if first_email is None:
             st.warning("📭 No emails found in this range")
             return
         
-        st.session_state.emails = emails
-        st.success(f"✓ Found {len(emails)} emails")
+        total = gmail.last_fetch_total
+        st.success(f"✓ Found {total} emails")
     
     # Analyze emails
     st.markdown("---")
@@ -403,106 +422,132 @@ def fetch_and_analyze(date_range: str, auto_execute: bool):
     progress_bar = st.progress(0)
     status_text = st.empty()
     
+    emails = []
     analyses = []
+    analyzer = st.session_state.analyzer
+    email_stream = itertools.chain([first_email], stream)
     
-    for i, email_data in enumerate(emails):
-        status_text.text(f"Analyzing email {i+1}/{len(emails)}: {email_data['subject'][:50]}...")
-        progress_bar.progress((i + 1) / len(emails))
-        
-        with st.expander(f"📧 Email {i+1}: {email_data['subject']}", expanded=(i == 0)):
-            # Show original content
-            st.markdown("**📄 Original Email:**")
-            col1, col2 = st.columns([1, 3])
-            with col1:
-                st.metric("From", "")
-                st.markdown(f"_{email_data['sender']}_")
-            with col2:
-                st.markdown(f"**Subject:** {email_data['subject']}")
-                with st.expander("View full body"):
-                    st.text_area("Email Body", email_data['body'], height=150, disabled=True, 
-                                label_visibility="collapsed", key=f"email_body_{i}")
-            
-            st.markdown("---")
-            
-            # Build context for compression
-            email_context = f"""
-EMAIL TO ANALYZE:
-From: {email_data['sender']}
-Subject: {email_data['subject']}
-Body: {email_data['body'][:500]}
-"""
-            
-            # Show compression in real-time
-            st.markdown("**🗜️ ScaleDown Compression:**")
-            
-            # Create columns for before/after
-            col1, col2, col3 = st.columns([1, 1, 1])
-            
-            with col1:
-                original_length = len(email_context)
-                st.metric("Original", f"{original_length} chars")
-            
-            # Do compression
-            compression_result = st.session_state.analyzer.scaledown.compress_prompt(
-                email_context, 
-                st.session_state.analyzer._build_analysis_prompt()
-            )
-            
-            compressed_text = compression_result['compressed_prompt']
-            compressed_length = len(compressed_text)
-            savings_pct = compression_result['savings_percent']
-            
-            with col2:
-                st.metric("Compressed", f"{compressed_length} chars", 
-                         delta=f"-{original_length - compressed_length}")
-            
-            with col3:
-                st.metric("Savings", f"{savings_pct:.1f}%",
-                         delta=f"{compression_result['original_tokens'] - compression_result['compressed_tokens']} tokens")
-            
-            # Show compressed content
-            with st.expander("🔍 View Compressed Content"):
-                st.markdown("**Compressed Email Context:**")
-                st.text_area("", compressed_text, height=200, disabled=True, 
-                            label_visibility="collapsed", key=f"compressed_text_{i}")
-                st.caption(f"Token reduction: {compression_result['original_tokens']} → {compression_result['compressed_tokens']}")
+    # Compress + analyze each fetched chunk concurrently, then render it in order
+    with ThreadPoolExecutor(max_workers=ANALYSIS_CONCURRENCY) as executor:
+        for chunk in iter(lambda: list(itertools.islice(email_stream, STREAM_BATCH_SIZE)), []):
+            status_text.text(f"Analyzing emails {len(emails) + 1}-{len(emails) + len(chunk)} of {total}...")
             
-            st.markdown("---")
-            st.markdown("**🤖 AI Analysis:**")
+            with st.spinner("Compressing and analyzing with Gemini AI..."):
+                chunk_results = list(executor.map(lambda email_data: compress_and_analyze(analyzer, email_data), chunk))
             
-            # Get AI analysis (using already compressed prompt)
-            with st.spinner("Analyzing with Gemini AI..."):
-                ai_response = st.session_state.analyzer.gemini.analyze_email(compressed_text)
+            for email_data, (email_context, compression_result, result) in zip(chunk, chunk_results):
+                i = len(emails)
+                emails.append(email_data)
+                progress_bar.progress(min(1.0, (i + 1) / total))
                 
-                if ai_response:
-                    result = st.session_state.analyzer._parse_ai_response(ai_response)
-                else:
-                    result = st.session_state.analyzer._fallback_analysis(email_data)
-            
-            analyses.append({
-                'email': email_data,
-                'analysis': result,
-                'compression': compression_result
-            })
-            
-            # Show analysis result
-            col1, col2 = st.columns([3, 1])
-            with col1:
-                st.markdown(f"**Category:** {result.category.value}")
-                st.markdown(f"**Summary:** {result.summary}")
-                st.markdown(f"**Reasoning:** _{result.reasoning}_")
-                if result.key_points:
-                    st.markdown(f"**Key Points:** {', '.join(result.key_points)}")
-            with col2:
-                st.metric("Priority", f"{result.priority_score}/10")
-                st.markdown(f"**Action:**")
-                st.markdown(f"_{result.action.value}_")
+                with st.expander(f"📧 Email {i+1}: {email_data['subject']}", expanded=(i == 0)):
+                    # Show original content
+                    st.markdown("**📄 Original Email:**")
+                    col1, col2 = st.columns([1, 3])
+                    with col1:
+                        st.metric("From", "")
+                        st.markdown(f"_{email_data['sender']}_")
+                    with col2:
+                        st.markdown(f"**Subject:** {email_data['subject']}")
+                        with st.expander("View full body"):
+                            st.text_area("Email Body", email_data['body'], height=150, disabled=True, 
+                                        label_visibility="collapsed", key=f"email_body_{i}")
+                    
+                    st.markdown("---")
+                    
+                    # Show compression results
+                    st.markdown("**🗜️ ScaleDown Compression:**")
+                    
+                    # Create columns for before/after
+                    col1, col2, col3 = st.columns([1, 1, 1])
+                    
+                    original_length = len(email_context)
+                    compressed_text = compression_result['compressed_prompt']
+                    compressed_length = len(compressed_text)
+                    savings_pct = compression_result['savings_percent']
+                    
+                    with col1:
+                        st.metric("Original", f"{original_length} chars")
+                    
+                    with col2:
+                        st.metric("Compressed", f"{compressed_length} chars", 
+                                 delta=f"-{original_length - compressed_length}")
+                    
+                    with col3:
+                        st.metric("Savings", f"{savings_pct:.1f}%",
+                                 delta=f"{compression_result['original_tokens'] - compression_result['compressed_tokens']} tokens")
+                    
+                    if compression_result.get('decision') == "skipped":
+                        st.caption(f"Compression skipped: {compression_result['skip_reason']}")
+                    
+                    # Show compressed content
+                    with st.expander("🔍 View Compressed Content"):
+                        st.markdown("**Compressed Email Context:**")
+                        st.text_area("", compressed_text, height=200, disabled=True, 
+                                    label_visibility="collapsed", key=f"compressed_text_{i}")
+                        st.caption(f"Token reduction: {compression_result['original_tokens']} → {compression_result['compressed_tokens']}")
+                    
+                    st.markdown("---")
+                    st.markdown("**🤖 AI Analysis:**")
+                    
+                    analyses.append({
+                        'email': email_data,
+                        'analysis': result,
+                        'compression': compression_result
+                    })
+                    
+                    # Show analysis result
+                    col1, col2 = st.columns([3, 1])
+                    with col1:
+                        st.markdown(f"**Category:** {result.category.value}")
+                        st.markdown(f"**Summary:** {result.summary}")
+                        st.markdown(f"**Reasoning:** _{result.reasoning}_")
+                        if result.duplicate_of:
+                            st.caption(f"Verdict reused from near-duplicate: {result.duplicate_of['subject']}")
+                        if result.key_points:
+                            st.markdown(f"**Key Points:** {', '.join(result.key_points)}")
+                    with col2:
+                        st.metric("Priority", f"{result.priority_score}/10")
+                        st.markdown(f"**Action:**")
+                        st.markdown(f"_{result.action.value}_")
     
     status_text.text("✅ Analysis complete!")
+    st.session_state.emails = emails
     st.session_state.analyses = analyses
     
 
 
+def compress_and_analyze(analyzer: EmailAnalyzer, email_data: dict):
+    """Compress one email and run AI analysis (runs in a worker thread, so no st.* calls)"""
+    
+    # Same stages as EmailAnalyzer.analyze, so verdicts feed the caches, training data and sender stats
+    email_context = analyzer.analysis_context(email_data)
+    
+    # Header rules, earlier verdicts, sender reputation or the local model may settle it without ScaleDown/Gemini
+    digest, local_result = analyzer.local_verdict(email_data)
+    if local_result is not None:
+        return email_context, {
+            'compressed_prompt': email_context,
+            'original_tokens': 0,
+            'compressed_tokens': 0,
+            'savings_percent': 0,
+            'success': False,
+            'decision': "skipped",
+            'skip_reason': "settled locally (header rules, earlier verdict, sender reputation or local model)"
+        }, local_result
+    
+    # Instructions are compressed once per session; only the email context is compressed per email
+    instructions = analyzer.analysis_instructions()
+    
+    with time_budget(EMAIL_TIME_BUDGET_SECONDS):
+        compression_result = analyzer.compress_email(email_data)
+        result = analyzer.analyze_compressed(
+            email_data, compression_result['compressed_prompt'], instructions, digest
+        )
+    
+    return email_context, compression_result, result
+
+
 def results_page():
     """Display analysis results"""
     st.markdown("## 📊 Analysis Results")
@@ -627,6 +672,9 @@ def results_page():
         with col2:
             if st.button("✅ Execute All Actions", use_container_width=True, type="primary"):
                 execute_actions()
+    elif st.session_state.failed_actions:
+        st.warning(f"⚠️ {st.session_state.failed_actions} action(s) could not be applied - "
+                   f"the rest were applied to your Gmail inbox")
     else:
         st.markdown("""
         <div class="success-box">
@@ -639,23 +687,16 @@ def results_page():
 def execute_actions():
     """Execute approved actions"""
     with st.spinner("🔄 Executing actions..."):
-        for result in st.session_state.analyses:
-            email_data = result['email']
-            analysis = result['analysis']
-            action = analysis.action
-            msg_id = email_data['msg_id']
-            
-            if action == EmailAction.STAR:
-                st.session_state.gmail_client.star_email(msg_id)
-            elif action == EmailAction.MOVE_TO_SPAM:
-                st.session_state.gmail_client.move_to_spam(msg_id)
-            elif action == EmailAction.ARCHIVE:
-                st.session_state.gmail_client.archive_email(msg_id)
-            elif action == EmailAction.MARK_READ:
-                st.session_state.gmail_client.mark_as_read(msg_id)
+        outcome = st.session_state.gmail_client.execute_bulk_actions(st.session_state.analyses)
         
+        failed = [msg_id for msg_id, ok in outcome.items() if not ok]
+        if failed:
+            st.warning(f"⚠️ {len(failed)} action(s) could not be applied")
+        else:
+            st.success("✅ All actions completed!")
+        
+        st.session_state.failed_actions = len(failed)
         st.session_state.actions_executed = True
-        st.success("✅ All actions completed!")
         st.rerun()
 
 
@@ -696,16 +737,12 @@ def demo_mode():
     if st.button("🔍 Analyze Sample Emails"):
         with st.spinner("Analyzing..."):
             st.session_state.analyzer = EmailAnalyzer()
-            analyses = []
-            
-            for email_data in sample_emails:
-                result = st.session_state.analyzer.analyze(email_data)
-                analyses.append({
-                    'email': email_data,
-                    'analysis': result
-                })
+            results = st.session_state.analyzer.analyze_many(sample_emails)
             
-            st.session_state.analyses = analyses
+            st.session_state.analyses = [
+                {'email': email_data, 'analysis': result}
+                for email_data, result in zip(sample_emails, results)
+            ]
             st.success("✅ Analysis complete!")
             st.rerun()
 
@@ -0,0 +1,64 @@
+"""
+Sync State - Persistent IMAP sync checkpoints
+Remembers UIDVALIDITY, last seen UID and HIGHESTMODSEQ per account and folder
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import SYNC_STATE_PATH
+
+
+class SyncStateStore:
+    """JSON-backed store of mailbox sync checkpoints"""
+
+    def __init__(self, path: str = SYNC_STATE_PATH):
+        self.path = path
+        self.states = self._load()
+
+    def get(self, account: str, folder: str) -> Optional[Dict]:
+        """Get the checkpoint for an account/folder, or None if never synced"""
+        return self.states.get(self._key(account, folder))
+
+    def update(self, account: str, folder: str, uidvalidity: int, last_uid: int,
+               highest_modseq: Optional[int] = None, uid_next: Optional[int] = None):
+        """Record a new checkpoint and persist it"""
+
+        self.states[self._key(account, folder)] = {
+            'uidvalidity': uidvalidity,
+            'last_uid': last_uid,
+            'highest_modseq': highest_modseq,
+            'uid_next': uid_next,
+            'synced_at': datetime.now().isoformat(timespec="seconds")
+        }
+        self._save()
+
+    def clear(self, account: str, folder: str):
+        """Forget the checkpoint so the next sync starts over"""
+        if self.states.pop(self._key(account, folder), None) is not None:
+            self._save()
+
+    def _key(self, account: str, folder: str) -> str:
+        return f"{account.lower()}:{folder}"
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"   ⚠️  Could not read sync state ({e}), starting fresh")
+            return {}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.states, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"   ⚠️  Could not save sync state: {e}")
@@ -0,0 +1,10 @@
+"""
+Shared test setup - import the flat modules from the repo root and keep local state out of .triage_data
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TRIAGE_DATA_DIR", tempfile.mkdtemp(prefix="triage-tests-"))
@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+import compression_cache
+from compression_cache import CompressionCache
+
+
+RESULT = {'compressed_prompt': "short", 'original_tokens': 400, 'compressed_tokens': 120}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def test_key_depends_on_every_input():
+    key = CompressionCache.make_key("context", "prompt", "auto")
+
+    assert key == CompressionCache.make_key("context", "prompt", "auto")
+    assert key != CompressionCache.make_key("context", "prompt", 0.5)
+    assert key != CompressionCache.make_key("context!", "prompt", "auto")
+
+
+def test_memory_only_cache_evicts_least_recently_used(clock):
+    cache = CompressionCache(max_entries=2, disk_path=None)
+    cache.put("a", RESULT)
+    cache.put("b", RESULT)
+    cache.get("a")
+    cache.put("c", RESULT)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == RESULT
+    assert cache.get_statistics() == {'memory_entries': 2, 'disk_entries': 0}
+
+
+def test_results_are_copies(clock):
+    cache = CompressionCache(disk_path=None)
+    cache.put("a", RESULT)
+
+    cache.get("a")['compressed_prompt'] = "mutated"
+
+    assert cache.get("a") == RESULT
+
+
+def test_entries_expire(clock, tmp_path):
+    cache = CompressionCache(ttl_seconds=60, disk_path=str(tmp_path / "compressions.db"))
+    cache.put("a", RESULT)
+
+    clock[0] += 61
+
+    assert cache.get("a") is None
+    assert cache.get_statistics() == {'memory_entries': 0, 'disk_entries': 0}
+    cache.close()
+
+
+def test_disk_tier_survives_restart_and_promotes(clock, tmp_path):
+    path = str(tmp_path / "compressions.db")
+    first = CompressionCache(disk_path=path)
+    first.put("a", RESULT)
+    first.close()
+
+    reopened = CompressionCache(disk_path=path)
+    assert reopened.get_statistics() == {'memory_entries': 0, 'disk_entries': 1}
+    assert reopened.get("a") == RESULT
+    assert reopened.get_statistics()['memory_entries'] == 1
+    reopened.close()
+
+
+def test_disk_tier_is_pruned_to_its_cap(clock, tmp_path, monkeypatch):
+    monkeypatch.setattr(compression_cache, "DISK_PRUNE_INTERVAL", 4)
+    cache = CompressionCache(max_entries=1, disk_path=str(tmp_path / "compressions.db"), disk_max_entries=2)
+    for key in "abcd":
+        cache.put(key, RESULT)
+        clock[0] += 1
+
+    assert cache.get_statistics()['disk_entries'] == 2
+    assert cache.get("a") is None
+    assert cache.get("c") == RESULT
+    cache.close()
@@ -0,0 +1,201 @@
+import email.message
+
+import pytest
+
+from email_analyzer import EmailAction
+from gmail_connector import GmailConnector
+from sync_state import SyncStateStore
+
+
+ACCOUNT = "me@example.com"
+
+
+class FakeImap:
+    """Enough of imaplib.IMAP4 for SELECT, UID SEARCH, UID FETCH (RFC822) and UID STORE"""
+
+    def __init__(self, uids, uidvalidity=1, modseq=100, fail_fetch=()):
+        self.uids = list(uids)
+        self.uidvalidity = uidvalidity
+        self.modseq = modseq
+        self.fail_fetch = set(fail_fetch)
+        self.searches = []
+        self.fetches = []
+        self.stores = []
+
+    def select(self, folder):
+        return "OK", [str(len(self.uids)).encode()]
+
+    def response(self, name):
+        value = {'UIDVALIDITY': self.uidvalidity, 'UIDNEXT': max(self.uids, default=0) + 1,
+                 'HIGHESTMODSEQ': self.modseq}[name]
+        return name, [str(value).encode()]
+
+    def uid(self, command, *args):
+        if command == "search":
+            self.searches.append(args)
+            criteria = args[-1]
+            low = int(criteria.split()[1].split(":")[0]) if criteria.startswith("UID") else 0
+            # "n:*" always includes the highest UID
+            matches = [uid for uid in self.uids if uid >= low] or self.uids[-1:]
+            return "OK", [" ".join(map(str, matches)).encode()]
+
+        if command == "fetch":
+            uid_set = args[0]
+            self.fetches.append(uid_set)
+            requested = [int(uid) for uid in uid_set.split(",")]
+            if self.fail_fetch & set(requested):
+                raise OSError("connection reset")
+            data = []
+            for uid in reversed(requested):  # servers may answer out of order
+                message = email.message.EmailMessage()
+                message['From'] = "Sender <sender@example.org>"
+                message['Subject'] = f"Email {uid}"
+                message.set_content(f"Body of {uid}")
+                raw = message.as_bytes()
+                data.append((f"{uid} (UID {uid} RFC822 {{{len(raw)}}}".encode(), raw))
+                data.append(b")")
+            return "OK", data
+
+        if command == "store":
+            self.stores.append(args)
+            return "OK", [f"1 (UID {uid} FLAGS (\\Seen))".encode() for uid in self._expand(args[0])]
+
+        raise AssertionError(f"unexpected UID {command}")
+
+    @staticmethod
+    def _expand(uid_set):
+        uids = []
+        for part in uid_set.split(","):
+            low, _, high = part.partition(":")
+            uids.extend(range(int(low), int(high or low) + 1))
+        return uids
+
+
+@pytest.fixture
+def connector(tmp_path):
+    gmail = GmailConnector(ACCOUNT, "app-password")
+    gmail.sync_state = SyncStateStore(path=str(tmp_path / "sync_state.json"))
+    gmail.message_cache = None
+    gmail.connected = True
+    return gmail
+
+
+def subjects(emails):
+    return [email_data['subject'] for email_data in emails]
+
+
+def test_batched_fetch_keeps_most_recent_first(connector):
+    connector.imap = FakeImap(range(1, 11))
+
+    emails = connector.fetch_emails("latest7", fetch_mode="full", batch_size=3)
+
+    assert subjects(emails) == [f"Email {uid}" for uid in range(10, 3, -1)]
+    assert connector.imap.fetches == ["10,9,8", "7,6,5", "4"]
+    assert connector.last_fetch_total == 7
+
+
+def test_first_new_run_takes_latest_seven_and_saves_checkpoint(connector):
+    connector.imap = FakeImap(range(1, 21))
+
+    emails = connector.fetch_emails("new", fetch_mode="full")
+
+    assert len(emails) == 7
+    state = connector.sync_state.get(ACCOUNT, "INBOX")
+    assert (state['uidvalidity'], state['last_uid'], state['highest_modseq'], state['uid_next']) == (1, 20, 100, 21)
+
+
+def test_new_run_fetches_only_the_delta(connector):
+    connector.sync_state.update(ACCOUNT, "INBOX", uidvalidity=1, last_uid=18, highest_modseq=90, uid_next=19)
+    connector.imap = FakeImap(range(1, 21))
+
+    emails = connector.fetch_emails("new", fetch_mode="full")
+
+    assert subjects(emails) == ["Email 20", "Email 19"]
+    assert connector.imap.searches[-1][-1] == "UID 19:*"
+    assert connector.sync_state.get(ACCOUNT, "INBOX")['last_uid'] == 20
+
+
+def test_unchanged_modseq_skips_the_search(connector):
+    connector.sync_state.update(ACCOUNT, "INBOX", uidvalidity=1, last_uid=20, highest_modseq=100, uid_next=21)
+    connector.imap = FakeImap(range(1, 21))
+
+    assert connector.fetch_emails("new", fetch_mode="full") == []
+    assert connector.imap.searches == []
+
+
+def test_highest_uid_echo_is_not_new_mail(connector):
+    # UID 21:* matches UID 20 when nothing newer exists
+    connector.sync_state.update(ACCOUNT, "INBOX", uidvalidity=1, last_uid=20, highest_modseq=90, uid_next=None)
+    connector.imap = FakeImap(range(1, 21))
+
+    assert connector.fetch_emails("new", fetch_mode="full") == []
+
+
+def test_uidvalidity_change_discards_the_checkpoint(connector):
+    connector.sync_state.update(ACCOUNT, "INBOX", uidvalidity=1, last_uid=500, highest_modseq=90, uid_next=501)
+    connector.imap = FakeImap(range(1, 11), uidvalidity=2)
+
+    emails = connector.fetch_emails("new", fetch_mode="full")
+
+    assert len(emails) == 7
+    state = connector.sync_state.get(ACCOUNT, "INBOX")
+    assert (state['uidvalidity'], state['last_uid']) == (2, 10)
+
+
+def test_checkpoint_stops_below_a_failed_fetch(connector):
+    connector.sync_state.update(ACCOUNT, "INBOX", uidvalidity=1, last_uid=8, highest_modseq=90, uid_next=9)
+    connector.imap = FakeImap(range(1, 13), fail_fetch={10})
+
+    emails = connector.fetch_emails("new", fetch_mode="full", batch_size=1)
+
+    assert subjects(emails) == ["Email 12", "Email 11", "Email 9"]
+    state = connector.sync_state.get(ACCOUNT, "INBOX")
+    assert state['last_uid'] == 9
+    assert state['highest_modseq'] is None
+
+    connector.imap.fail_fetch = set()
+    assert subjects(connector.fetch_emails("new", fetch_mode="full")) == ["Email 12", "Email 11", "Email 10"]
+    assert connector.sync_state.get(ACCOUNT, "INBOX")['last_uid'] == 12
+
+
+def test_filtered_runs_keep_their_own_checkpoint(connector):
+    connector.imap = FakeImap(range(1, 11))
+
+    connector.fetch_emails("new", fetch_mode="full", query="is:unread")
+
+    assert connector.sync_state.get(ACCOUNT, "INBOX") is None
+    assert connector.sync_state.get(ACCOUNT, "INBOX [is:unread]")['last_uid'] == 10
+
+
+def test_sync_state_survives_a_corrupt_file(tmp_path):
+    path = tmp_path / "sync_state.json"
+    path.write_text("{not json")
+
+    store = SyncStateStore(path=str(path))
+    store.update(ACCOUNT, "INBOX", uidvalidity=3, last_uid=7)
+
+    assert SyncStateStore(path=str(path)).get(ACCOUNT.upper(), "INBOX")['last_uid'] == 7
+
+
+class Analysis:
+    def __init__(self, action):
+        self.action = action
+
+
+def test_bulk_actions_use_one_store_per_action(connector):
+    connector.imap = FakeImap([])
+    results = [{'email': {'msg_id': str(uid)}, 'analysis': Analysis(action)} for uid, action in [
+        (1, EmailAction.ARCHIVE), (2, EmailAction.ARCHIVE), (3, EmailAction.ARCHIVE), (7, EmailAction.ARCHIVE),
+        (5, EmailAction.STAR), (6, EmailAction.NOTHING)
+    ]]
+
+    outcome = connector.execute_bulk_actions(results)
+
+    assert sorted(store[0] for store in connector.imap.stores) == ["1:3,7", "5"]
+    assert outcome == {'1': True, '2': True, '3': True, '7': True, '5': True}
+
+
+def test_store_outcome_reports_unconfirmed_uids(connector):
+    assert connector._store_outcome([1, 2], "OK", [b"1 (UID 1 FLAGS (\\Seen))"]) == {'1': True, '2': False}
+    assert connector._store_outcome([1, 2], "OK", [None]) == {'1': True, '2': True}
+    assert connector._store_outcome([1], "NO", []) == {'1': False}
@@ -0,0 +1,38 @@
+from keyword_matcher import KeywordMatcher
+
+
+def test_longest_keyword_wins():
+    matcher = KeywordMatcher({'free': 1, 'free money': 3, 'freebie': 2})
+
+    hits = matcher.find_all("Free money and a freebie, all free")
+
+    assert [hit.keyword for hit in hits] == ["free money", "freebie", "free"]
+    assert matcher.score("Free money and a freebie, all free") == 6
+
+
+def test_hits_carry_positions_and_field():
+    hits = KeywordMatcher(["urgent"]).scan({'subject': "Re: URGENT", 'body': "not urgent"})
+
+    assert [(hit.field, hit.start, hit.end) for hit in hits] == [("subject", 4, 10), ("body", 4, 10)]
+
+
+def test_substring_matching_by_default():
+    assert KeywordMatcher(["deal"]).search("Ideal dealer")
+
+
+def test_whole_words():
+    matcher = KeywordMatcher(["deal", "sale", "% off"], whole_words=True)
+
+    assert not matcher.search("Ideal wholesale dealer")
+    assert matcher.search("Deal of the day")
+    assert matcher.search("50% off everything")
+
+
+def test_non_ascii_case_variants_map_to_the_keyword():
+    assert KeywordMatcher({'win': 2}).find_all("WİN now")[0].keyword == "win"
+    assert KeywordMatcher({'sale': 1}).score("ſale ends soon") == 1
+
+
+def test_empty_inputs():
+    assert KeywordMatcher([]).find_all("anything") == []
+    assert not KeywordMatcher(["x"]).search("")
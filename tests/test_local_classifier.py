@@ -0,0 +1,79 @@
+import hashlib
+
+from local_classifier import LocalClassifier, TrainingStore, email_terms, hashed_counts, is_holdout
+
+
+def make_example(index, category, action, sender, subject, body, priority=3):
+    return {
+        'digest': hashlib.sha256(f"{category}-{index}".encode()).hexdigest(),
+        'sender': sender, 'subject': subject, 'body': body,
+        'headers': {}, 'category': category, 'action': action, 'priority_score': priority,
+        'sentiment': "neutral", 'requires_response': False
+    }
+
+
+def training_examples():
+    examples = []
+    for index in range(30):
+        examples.append(make_example(index, "NEWSLETTER", "ARCHIVE", "Digest <digest@news.example>",
+                                     f"Weekly roundup {index}", "top stories this week unsubscribe"))
+        examples.append(make_example(index, "IMPORTANT", "FLAG", "Boss <boss@work.example>",
+                                     f"Budget review {index}", "please review the quarterly budget today", 8))
+    return examples
+
+
+def test_email_terms_cover_sender_subject_and_headers():
+    terms = email_terms({
+        'sender': "News <news@mail.shop.example>", 'subject': "Order 1234 shipped", 'body': "",
+        'headers': {'List-Unsubscribe': "<u>"}
+    })
+
+    assert terms["from:news"] == 1
+    assert terms["domain:mail.shop.example"] == 1
+    assert terms["domain:shop.example"] == 1
+    assert any("#" in term for term in terms)
+    assert sum(hashed_counts(terms, 64).values()) == sum(terms.values())
+
+
+def test_holdout_split_is_deterministic():
+    digests = [hashlib.sha256(str(index).encode()).hexdigest() for index in range(200)]
+
+    held = [is_holdout(digest, 0.2) for digest in digests]
+
+    assert held == [is_holdout(digest, 0.2) for digest in digests]
+    assert 0 < sum(held) < len(digests)
+
+
+def test_trained_model_separates_categories():
+    classifier = LocalClassifier.train(training_examples(), dim=1024, min_df=1)
+    classifier.min_confidence = 0.5
+
+    newsletter = classifier.classify({'sender': "Digest <digest@news.example>", 'subject': "Weekly roundup 99",
+                                      'body': "top stories this week unsubscribe", 'headers': {}})
+    important = classifier.predict({'sender': "Boss <boss@work.example>", 'subject': "Budget review",
+                                    'body': "please review the quarterly budget", 'headers': {}})
+
+    assert newsletter['category'] == "NEWSLETTER"
+    assert newsletter['priority_score'] == 3
+    assert important['category'] == "IMPORTANT"
+
+
+def test_training_tolerates_non_numeric_priorities():
+    examples = training_examples()
+    examples[0]['priority_score'] = "high"
+    examples[1]['priority_score'] = "7/10"
+
+    classifier = LocalClassifier.train(examples, dim=1024, min_df=1)
+
+    assert classifier.model['profiles']['NEWSLETTER']['priority_score'] == 3
+
+
+def test_training_store_keeps_the_latest_verdict(tmp_path):
+    store = TrainingStore(path=str(tmp_path / "examples.db"), max_examples=10)
+    email_data = {'sender': "a@b.example", 'subject': "Hi", 'body': "text"}
+    store.add(email_data, {'category': "NORMAL", 'action': "NOTHING"})
+    store.add(email_data, {'category': "IMPORTANT", 'action': "FLAG"})
+
+    assert [example['category'] for example in store.examples()] == ["IMPORTANT"]
+    assert store.get_statistics()['examples'] == 1
+    store.close()
@@ -0,0 +1,78 @@
+import sqlite3
+import time
+
+import pytest
+
+import message_cache
+from message_cache import MessageCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    store = MessageCache(path=str(tmp_path / "messages.db"), ttl_seconds=60, max_entries=0)
+    yield store
+    store.close()
+
+
+def emails(*uids):
+    return [{'msg_id': str(uid), 'subject': f"Email {uid}", 'headers': {}} for uid in uids]
+
+
+def test_round_trip_per_mode(cache):
+    cache.put_many("Me@Example.com", "INBOX", 7, emails(1, 2), mode="partial")
+
+    assert set(cache.get_many("me@example.com", "INBOX", 7, [1, 2, 3], mode="partial")) == {1, 2}
+    assert cache.get_many("me@example.com", "INBOX", 7, [1, 2], mode="full") == {}
+    assert cache.cached_uids("me@example.com", "INBOX", 7, mode="partial") == {1, 2}
+    assert cache.get_statistics() == {'cached_messages': 2, 'hits': 2, 'misses': 3}
+
+
+def test_prune_stale_uidvalidity(cache):
+    cache.put_many("me@example.com", "INBOX", 7, emails(1))
+    cache.put_many("me@example.com", "INBOX", 8, emails(1))
+
+    cache.prune_stale("me@example.com", "INBOX", 8)
+
+    assert cache.get_many("me@example.com", "INBOX", 7, [1]) == {}
+    assert set(cache.get_many("me@example.com", "INBOX", 8, [1])) == {1}
+
+
+def test_expired_entries_are_ignored_and_pruned(tmp_path, monkeypatch):
+    path = str(tmp_path / "messages.db")
+    store = MessageCache(path=path, ttl_seconds=60, max_entries=0)
+    store.put_many("me@example.com", "INBOX", 7, emails(1))
+    store.close()
+
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    reopened = MessageCache(path=path, ttl_seconds=60, max_entries=0)
+
+    assert reopened.cached_uids("me@example.com", "INBOX", 7) == set()
+    assert reopened.get_statistics()['cached_messages'] == 0
+    reopened.close()
+
+
+def test_oldest_entries_beyond_the_cap_are_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(message_cache, "PRUNE_INTERVAL", 2)
+    store = MessageCache(path=str(tmp_path / "messages.db"), ttl_seconds=0, max_entries=3)
+    for uid in range(1, 7):
+        store.put_many("me@example.com", "INBOX", 7, emails(uid))
+        time.sleep(0.001)
+
+    assert store.cached_uids("me@example.com", "INBOX", 7) == {4, 5, 6}
+    store.close()
+
+
+def test_old_schema_is_dropped(tmp_path):
+    path = str(tmp_path / "messages.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE messages (account TEXT, folder TEXT, uidvalidity INTEGER, uid INTEGER, "
+               "data TEXT, cached_at REAL)")
+    db.execute("INSERT INTO messages VALUES ('me@example.com', 'INBOX', 7, 1, '{}', 0)")
+    db.commit()
+    db.close()
+
+    store = MessageCache(path=path)
+
+    assert store.get_statistics()['cached_messages'] == 0
+    store.close()
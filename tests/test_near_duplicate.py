@@ -0,0 +1,85 @@
+import pytest
+
+from near_duplicate import NearDuplicateIndex, minhash, normalized_tokens, sender_scope, similarity
+
+
+TEMPLATE = (
+    "Hi {name}, your weekly account summary is ready. You sent {count} invoices and received "
+    "{paid} payments this week. Track order {order} at https://shop.example/t/{order} or reply to "
+    "support@shop.example with any questions about your plan, billing cycle and upcoming renewal date."
+)
+
+
+def make_email(name="Alice", count=3, paid=2, order="AB12345", sender="Shop <billing@shop.example>"):
+    return {
+        'sender': sender, 'subject': "Your weekly summary",
+        'body': TEMPLATE.format(name=name, count=count, paid=paid, order=order)
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    store = NearDuplicateIndex("v1", path=str(tmp_path / "near.db"), min_similarity=0.8, min_tokens=20)
+    yield store
+    store.close()
+
+
+def test_variable_parts_are_masked():
+    tokens = normalized_tokens({'subject': "Order 123", 'body': "See https://x.example/a1 or mail a@b.example re ZX98765"})
+
+    assert tokens == ["order", "#", "see", "url", "or", "mail", "addr", "re", "id"]
+
+
+def test_templated_emails_have_the_same_signature():
+    first = minhash(normalized_tokens(make_email()))
+    second = minhash(normalized_tokens(make_email(name="Bob", count=7, paid=1, order="ZZ99881")))
+
+    assert similarity(first, second) >= 0.8
+
+
+def test_different_emails_have_low_similarity():
+    first = minhash(normalized_tokens(make_email()))
+    other = minhash(normalized_tokens({'subject': "Lunch?", 'body': "Are we still on for lunch tomorrow at the "
+                                       "usual place near the office, or should we move it to Friday instead"}))
+
+    assert similarity(first, other) < 0.3
+
+
+def test_near_duplicate_reuses_the_verdict(index):
+    index.add(make_email(), "digest-1", {'category': "NORMAL"})
+
+    match = index.find(make_email(name="Bob", order="QQ55511"))
+
+    assert match['digest'] == "digest-1"
+    assert match['ai_response'] == {'category': "NORMAL"}
+    assert index.get_statistics() == {'indexed_emails': 1, 'hits': 1, 'misses': 0}
+
+
+def test_matches_stay_within_the_sender_domain(index):
+    index.add(make_email(), "digest-1", {'category': "NORMAL"})
+
+    assert sender_scope(make_email(sender="evil@phish.example")) == "phish.example"
+    assert index.find(make_email(sender="Shop <billing@phish.example>")) is None
+
+
+def test_short_emails_are_not_indexed(index):
+    short = {'sender': "a@b.example", 'subject': "Hi", 'body': "Thanks!"}
+    index.add(short, "digest-1", {'category': "NORMAL"})
+
+    assert index.find(short) is None
+    assert index.get_statistics()['indexed_emails'] == 0
+
+
+def test_index_survives_restarts_per_version(tmp_path):
+    path = str(tmp_path / "near.db")
+    first = NearDuplicateIndex("v1", path=path)
+    first.add(make_email(), "digest-1", {'category': "NORMAL"})
+    first.close()
+
+    same_version = NearDuplicateIndex("v1", path=path)
+    assert same_version.find(make_email(name="Bob"))['digest'] == "digest-1"
+    same_version.close()
+
+    new_version = NearDuplicateIndex("v2", path=path)
+    assert new_version.find(make_email(name="Bob")) is None
+    new_version.close()
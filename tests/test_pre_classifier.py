@@ -0,0 +1,77 @@
+from pre_classifier import RuleClassifier
+
+
+def make_email(sender="Shop <deals@shop.example>", subject="", headers=None):
+    return {'sender': sender, 'subject': subject, 'body': "", 'headers': headers or {}}
+
+
+def test_promotional_bulk_mail_is_archived():
+    verdict = RuleClassifier().classify(make_email(
+        subject="Big sale this weekend", headers={'List-Unsubscribe': "<mailto:u@shop.example>"}
+    ))
+
+    assert verdict['category'] == "PROMOTIONAL"
+    assert verdict['action'] == "ARCHIVE"
+
+
+def test_bulk_headers_alone_defer_to_the_llm():
+    classifier = RuleClassifier()
+    verdict = classifier.classify(make_email(
+        sender="GitHub <notifications@github.com>",
+        subject="Re: [org/repo] Fix parser (#42)",
+        headers={'List-Id': "<repo.org.github.com>", 'List-Unsubscribe': "<mailto:u@github.com>",
+                 'Precedence': "list"}
+    ))
+
+    assert verdict is None
+    assert classifier.deferred == 1
+
+
+def test_newsletter_needs_newsletter_wording():
+    verdict = RuleClassifier().classify(make_email(
+        sender="news@blog.example", subject="Weekly digest #12", headers={'List-Id': "<blog>",
+                                                                          'List-Unsubscribe': "<u>"}
+    ))
+
+    assert verdict['category'] == "NEWSLETTER"
+
+
+def test_protected_subject_is_never_classified():
+    verdict = RuleClassifier().classify(make_email(
+        subject="Your order receipt - 20% off next time", headers={'List-Unsubscribe': "<u>"}
+    ))
+
+    assert verdict is None
+
+
+def test_failed_authentication_is_spam():
+    verdict = RuleClassifier().classify(make_email(
+        sender="Bank <alerts@bank.example>",
+        headers={'Authentication-Results': "mx.google.com; spf=fail; dkim=none; dmarc=fail"}
+    ))
+
+    assert verdict['category'] == "SPAM"
+    assert "bank.example" in verdict['summary']
+
+
+def test_only_the_topmost_authentication_result_counts():
+    # Connector passes the topmost header; a forwarded hop's failure lives further down
+    verdict = RuleClassifier().classify(make_email(
+        headers={'Authentication-Results': "mx.google.com; spf=pass; dkim=pass; dmarc=pass "
+                                           "spf=fail dmarc=fail"}
+    ))
+
+    assert verdict is None
+
+
+def test_sender_without_domain():
+    promo = RuleClassifier().classify(make_email(
+        sender="Deals Team", subject="Big sale", headers={'List-Unsubscribe': "<u>"}
+    ))
+    spam = RuleClassifier().classify(make_email(
+        sender="", headers={'Authentication-Results': "mx; dmarc=fail spf=fail"}
+    ))
+
+    assert promo['category'] == "PROMOTIONAL"
+    assert "deals team" in promo['summary']
+    assert spam['category'] == "SPAM"
@@ -0,0 +1,76 @@
+import pytest
+
+import rate_limiter
+from rate_limiter import RateLimiter, get_rate_limiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock; sleeping advances it instead of blocking"""
+
+    now = [1000.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(rate_limiter.time, "sleep", sleep)
+    return now, sleeps
+
+
+def test_unlimited_never_waits(clock):
+    limiter = RateLimiter()
+
+    assert [limiter.acquire(10_000) for _ in range(100)] == [0.0] * 100
+
+
+def test_burst_up_to_a_minute_then_paced(clock):
+    _, sleeps = clock
+    limiter = RateLimiter(requests_per_minute=60)
+
+    for _ in range(60):
+        assert limiter.acquire() == 0.0
+
+    assert limiter.acquire() == pytest.approx(1.0)
+    assert sleeps == [pytest.approx(1.0)]
+    assert limiter.get_statistics()['waits'] == 1
+
+
+def test_token_budget_paces_large_requests(clock):
+    limiter = RateLimiter(tokens_per_minute=600)
+
+    assert limiter.acquire(500) == 0.0
+    # 100 left; 300 more need 200 tokens of refill at 10 tokens/second
+    assert limiter.acquire(300) == pytest.approx(20.0)
+
+
+def test_oversized_request_uses_at_most_a_full_bucket(clock):
+    limiter = RateLimiter(tokens_per_minute=600)
+
+    assert limiter.acquire(10_000) == 0.0
+    assert limiter.acquire(600) == pytest.approx(60.0)
+
+
+def test_budget_refills_while_idle(clock):
+    now, _ = clock
+    limiter = RateLimiter(requests_per_minute=2)
+    limiter.acquire()
+    limiter.acquire()
+
+    now[0] += 30
+    assert limiter.acquire() == 0.0
+
+
+def test_pause_holds_back_every_caller(clock):
+    limiter = RateLimiter(requests_per_minute=600)
+    limiter.pause(5)
+
+    assert limiter.acquire() == pytest.approx(5.0)
+    assert limiter.acquire() == 0.0
+
+
+def test_limiters_are_shared_per_upstream():
+    assert get_rate_limiter("gemini") is get_rate_limiter("gemini")
+    assert get_rate_limiter("gemini") is not get_rate_limiter("scaledown")
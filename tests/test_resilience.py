@@ -0,0 +1,167 @@
+import itertools
+
+import pytest
+
+import resilience
+from resilience import (
+    BudgetExhaustedError, CircuitBreaker, CircuitOpenError, call_with_retry, remaining_budget, time_budget
+)
+
+
+_endpoints = itertools.count()
+
+
+class Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(resilience.time, "sleep", sleep)
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)
+    return now, sleeps
+
+
+@pytest.fixture
+def endpoint():
+    """Fresh breaker name per test - breakers are process-wide"""
+    return f"test-endpoint-{next(_endpoints)}"
+
+
+def responder(*outcomes):
+    calls = []
+    outcomes = list(outcomes)
+
+    def send(timeout):
+        calls.append(timeout)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return Response(outcome) if isinstance(outcome, int) else outcome
+
+    return send, calls
+
+
+def test_success_is_returned_without_retry(clock, endpoint):
+    send, calls = responder(200)
+
+    assert call_with_retry(endpoint, send, timeout=30).status_code == 200
+    assert calls == [30]
+
+
+def test_server_errors_are_retried_with_backoff(clock, endpoint):
+    _, sleeps = clock
+    send, calls = responder(503, OSError("reset"), 200)
+
+    assert call_with_retry(endpoint, send, timeout=30, max_attempts=3).status_code == 200
+    assert len(calls) == 3
+    assert sleeps == [resilience.RETRY_BASE_DELAY_SECONDS, resilience.RETRY_BASE_DELAY_SECONDS * 2]
+
+
+def test_client_errors_are_not_retried(clock, endpoint):
+    send, calls = responder(400)
+
+    assert call_with_retry(endpoint, send, timeout=30).status_code == 400
+    assert len(calls) == 1
+
+
+def test_retry_after_is_honoured_and_pauses_the_limiter(clock, endpoint):
+    _, sleeps = clock
+    paused = []
+
+    class Limiter:
+        def acquire(self, tokens):
+            return 0.0
+
+        def pause(self, seconds):
+            paused.append(seconds)
+
+    send, _ = responder(Response(429, {'Retry-After': "3"}), 200)
+
+    call_with_retry(endpoint, send, timeout=30, rate_limiter=Limiter(), max_attempts=2)
+
+    assert paused == [3.0]
+    assert sleeps == [3.0]
+
+
+def test_last_transport_error_is_raised(clock, endpoint):
+    send, _ = responder(OSError("down"), OSError("still down"))
+
+    with pytest.raises(OSError, match="still down"):
+        call_with_retry(endpoint, send, timeout=30, max_attempts=2)
+
+
+def test_breaker_opens_then_probes_once(clock):
+    now, _ = clock
+    breaker = CircuitBreaker("probe", failure_threshold=2, reset_seconds=10)
+
+    breaker.record_failure("HTTP 500")
+    assert breaker.allow()
+    breaker.record_failure("HTTP 500")
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    now[0] += 10
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens_the_breaker(clock):
+    now, _ = clock
+    breaker = CircuitBreaker("probe", failure_threshold=1, reset_seconds=10)
+    breaker.record_failure("timeout")
+    now[0] += 10
+
+    assert breaker.allow()
+    breaker.record_failure("timeout")
+
+    assert breaker.state == "open"
+    assert breaker.get_status()['retry_in'] == 10
+
+
+def test_open_breaker_refuses_calls(clock, endpoint):
+    breaker = resilience.get_circuit_breaker(endpoint)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure("HTTP 503")
+    send, calls = responder(200)
+
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(endpoint, send, timeout=30)
+    assert calls == []
+
+
+def test_time_budget_shortens_timeouts_and_stops_retries(clock, endpoint, monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_BASE_DELAY_SECONDS", 10)
+    send, calls = responder(503, 200)
+
+    with time_budget(5):
+        with pytest.raises(BudgetExhaustedError):
+            call_with_retry(endpoint, send, timeout=30, max_attempts=2)
+
+    assert calls == [5]
+
+
+def test_nested_budgets_never_extend_the_outer_one(clock):
+    with time_budget(5) as outer:
+        with time_budget(60) as inner:
+            assert inner == outer
+            assert remaining_budget() == 5
+        with time_budget(2):
+            assert remaining_budget() == 2
+        assert remaining_budget() == 5
+    assert remaining_budget() is None
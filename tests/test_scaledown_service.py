@@ -0,0 +1,93 @@
+import pytest
+
+import scaledown_service
+from scaledown_service import ScaleDownService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(scaledown_service, "_static_cache", {})
+    monkeypatch.setattr(scaledown_service, "COMPRESS_STATIC_PROMPT", True)
+    return ScaleDownService()
+
+
+def fake_compressions(monkeypatch, service, results):
+    calls = []
+
+    def compress_prompt(context, prompt):
+        calls.append(context)
+        return results.pop(0)
+
+    monkeypatch.setattr(service, "compress_prompt", compress_prompt)
+    return calls
+
+
+def test_static_block_is_compressed_once(monkeypatch, service):
+    calls = fake_compressions(monkeypatch, service, [{'success': True, 'compressed_prompt': "short"}])
+
+    assert service.compress_static("long instructions") == "short"
+    assert service.compress_static("long instructions") == "short"
+    assert len(calls) == 1
+
+
+def test_failed_static_compression_is_not_retried_per_email(monkeypatch, service):
+    clock = [1000.0]
+    monkeypatch.setattr(scaledown_service.time, "monotonic", lambda: clock[0])
+    calls = fake_compressions(monkeypatch, service, [
+        {'success': False, 'compressed_prompt': "ignored"},
+        {'success': True, 'compressed_prompt': "short"}
+    ])
+
+    assert service.compress_static("long instructions") == "long instructions"
+    assert service.compress_static("long instructions") == "long instructions"
+    assert len(calls) == 1
+
+    clock[0] += scaledown_service.STATIC_PROMPT_RETRY_SECONDS + 1
+    assert service.compress_static("long instructions") == "short"
+    assert len(calls) == 2
+
+
+def test_short_prompts_skip_the_round_trip(service):
+    result = service.compress_prompt("Hi", "Classify")
+
+    assert result['decision'] == "skipped"
+    assert result['compressed_prompt'] == "Hi\n\nClassify"
+    assert service.get_statistics()['skipped_compressions'] == 1
+
+
+def test_non_json_response_falls_back(monkeypatch, service):
+    class HtmlResponse:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            raise ValueError("Expecting value: line 1 column 1 (char 0)")
+
+    monkeypatch.setattr(scaledown_service, "call_with_retry", lambda *args, **kwargs: HtmlResponse())
+    monkeypatch.setattr(service, "_skip_reason", lambda tokens: None)
+
+    result = service.compress_prompt("context", "prompt")
+
+    assert result['decision'] == "failed"
+    assert result['compressed_prompt'] == "context\n\nprompt"
+
+
+def test_skip_policy_weighs_saving_against_latency(monkeypatch, service):
+    monkeypatch.setattr(scaledown_service, "COMPRESSION_MIN_SAVED_MS", 100)
+    monkeypatch.setattr(scaledown_service, "LLM_MS_PER_INPUT_TOKEN", 1.0)
+    service.observed_ratio = 0.5
+    service.observed_latency_ms = 400
+
+    assert service._skip_reason(100) is not None
+    assert "net saving" in service._skip_reason(600)
+    assert service._skip_reason(2000) is None
+
+
+def test_observed_compressions_update_the_policy(service):
+    service.observed_ratio = 0.5
+    service.observed_latency_ms = 400
+
+    service._observe(1000, 200, 800)
+
+    assert service.observed_ratio < 0.5
+    assert service.observed_latency_ms > 400
@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from sender_reputation import SenderReputation, priority_value, sender_keys
+
+
+def make_email(sender="News <news@shop.example>", subject="Weekly picks"):
+    return {'sender': sender, 'subject': subject, 'body': ""}
+
+
+@pytest.fixture
+def reputation(tmp_path):
+    store = SenderReputation(path=str(tmp_path / "senders.db"), min_emails=3, min_share=0.9)
+    yield store
+    store.close()
+
+
+def record_many(store, email_data, count, category="NEWSLETTER", action="ARCHIVE", prefix="d"):
+    for index in range(count):
+        store.record(email_data, f"{prefix}{index}", category, action, 3)
+
+
+def test_sender_keys_skip_shared_provider_domains():
+    assert sender_keys(make_email("Ann <Ann@Gmail.com>")) == {'address': "address:ann@gmail.com"}
+    assert sender_keys(make_email()) == {'address': "address:news@shop.example", 'domain': "domain:shop.example"}
+    assert sender_keys(make_email("")) == {}
+
+
+@pytest.mark.parametrize("value, expected", [
+    (7, 7), ("8", 8), (4.6, 4), (None, 5), ("high", 5), ("7/10", 5), (42, 10), (-3, 1), (float("inf"), 5)
+])
+def test_priority_value(value, expected):
+    assert priority_value(value) == expected
+
+
+def test_non_numeric_priority_is_recorded(reputation):
+    reputation.record(make_email(), "d0", "NEWSLETTER", "ARCHIVE", "high")
+
+    assert reputation.lookup(make_email())['average_priority'] == 5
+
+
+def test_trusted_sender_takes_the_fast_path(reputation):
+    record_many(reputation, make_email(), 3)
+
+    verdict = reputation.classify(make_email())
+
+    assert verdict['category'] == "NEWSLETTER"
+    assert verdict['action'] == "ARCHIVE"
+    assert reputation.get_statistics()['hits'] == 1
+
+
+def test_mixed_history_defers(reputation):
+    record_many(reputation, make_email(), 2)
+    record_many(reputation, make_email(), 2, category="IMPORTANT", action="FLAG", prefix="i")
+
+    assert reputation.classify(make_email()) is None
+
+
+def test_fast_path_never_uses_domain_history(reputation):
+    record_many(reputation, make_email(), 5)
+    colleague = make_email("CEO <ceo@shop.example>")
+
+    assert reputation.classify(colleague) is None
+    assert reputation.lookup(colleague)['sender'] == "domain:shop.example"
+
+
+def test_each_message_counts_once(reputation, tmp_path):
+    for _ in range(4):
+        reputation.record(make_email(), "same-digest", "NEWSLETTER", "ARCHIVE", 3)
+    reputation.close()
+
+    reopened = SenderReputation(path=str(tmp_path / "senders.db"))
+    reopened.record(make_email(), "same-digest", "NEWSLETTER", "ARCHIVE", 3)
+
+    assert reopened.lookup(make_email())['count'] == 1
+    reopened.close()
+
+
+def test_expired_message_digests_are_pruned(tmp_path, monkeypatch):
+    path = str(tmp_path / "senders.db")
+    store = SenderReputation(path=path, recorded_ttl_seconds=60)
+    store.record(make_email(), "old", "NEWSLETTER", "ARCHIVE", 3)
+    store.close()
+
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    reopened = SenderReputation(path=path, recorded_ttl_seconds=60)
+
+    assert reopened._recorded == {}
+    assert reopened._db.execute("SELECT COUNT(*) FROM recorded").fetchone()[0] == 0
+    reopened.record(make_email(), "old", "NEWSLETTER", "ARCHIVE", 3)
+    assert reopened.lookup(make_email())['count'] == 2
+    reopened.close()
@@ -0,0 +1,19 @@
+from token_estimator import estimate_tokens
+
+
+def test_empty_text_has_no_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens(None) == 0
+
+
+def test_words_numbers_and_symbols_count_separately():
+    assert estimate_tokens("Hi Bob, pay 42 now!") == 7
+
+
+def test_long_words_split_into_subwords():
+    assert estimate_tokens("internationalization") == 5
+
+
+def test_never_below_four_characters_per_token():
+    assert estimate_tokens("a " * 400) == 400
+    assert estimate_tokens(" " * 400) == 100
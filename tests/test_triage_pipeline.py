@@ -0,0 +1,57 @@
+from triage_pipeline import TriagePipeline
+
+
+class FakeGmail:
+    def __init__(self, count):
+        self.emails = [{'msg_id': str(uid), 'subject': f"Email {uid}"} for uid in range(1, count + 1)]
+        self.yielded = 0
+
+    def iter_emails(self, date_range, query=None, folder=None):
+        for email_data in self.emails:
+            self.yielded += 1
+            yield email_data
+
+
+class FakeAnalyzer:
+    """Email 1 is a verdict cache hit, email 2 fails to compress, email 3 fails analysis"""
+
+    def analysis_instructions(self):
+        return "instructions"
+
+    def local_verdict(self, email_data):
+        return email_data['msg_id'], "cached" if email_data['msg_id'] == "1" else None
+
+    def compress_email(self, email_data):
+        if email_data['msg_id'] == "2":
+            raise OSError("ScaleDown down")
+        return {'compressed_prompt': f"compressed {email_data['msg_id']}"}
+
+    def analyze_compressed(self, email_data, compressed_context, instructions, digest):
+        if email_data['msg_id'] == "3":
+            raise ValueError("bad JSON")
+        assert (compressed_context, instructions, digest) == (f"compressed {digest}", "instructions", digest)
+        return "analyzed"
+
+    def fallback_analysis(self, email_data):
+        return "fallback"
+
+
+def test_every_email_gets_a_result():
+    pipeline = TriagePipeline(FakeGmail(6), FakeAnalyzer(), compress_workers=2, analyze_workers=2, queue_size=1)
+
+    results = {email_data['msg_id']: result for email_data, result in pipeline.run()}
+
+    assert results == {'1': "cached", '2': "fallback", '3': "fallback",
+                       '4': "analyzed", '5': "analyzed", '6': "analyzed"}
+    assert pipeline.get_statistics() == {'fetched': 6, 'compressed': 4, 'cached': 1, 'analyzed': 3, 'failed': 2}
+
+
+def test_closing_early_stops_the_fetch_stage():
+    gmail = FakeGmail(100)
+    pipeline = TriagePipeline(gmail, FakeAnalyzer(), queue_size=1)
+
+    stream = pipeline.run()
+    next(stream)
+    stream.close()
+
+    assert gmail.yielded < 100
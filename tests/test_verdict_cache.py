@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from verdict_cache import VerdictCache
+
+
+EMAIL = {'sender': "Alice <alice@example.com>", 'subject': "Quarterly report", 'body': "Numbers attached.\n\nThanks"}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    store = VerdictCache(path=str(tmp_path / "verdicts.db"), ttl_seconds=60)
+    yield store
+    store.close()
+
+
+def test_digest_ignores_case_whitespace_and_display_name():
+    variant = {'sender': "ALICE@example.com", 'subject': "  quarterly   REPORT", 'body': "numbers attached. thanks"}
+
+    assert VerdictCache.email_digest(variant) == VerdictCache.email_digest(EMAIL)
+    assert VerdictCache.email_digest(dict(EMAIL, body="Numbers missing")) != VerdictCache.email_digest(EMAIL)
+
+
+def test_version_changes_with_any_part():
+    assert VerdictCache.make_version("prompt", "model-a") == VerdictCache.make_version("prompt", "model-a")
+    assert VerdictCache.make_version("prompt", "model-a") != VerdictCache.make_version("prompt", "model-b")
+
+
+def test_round_trip_is_scoped_to_the_version(cache):
+    digest = VerdictCache.email_digest(EMAIL)
+    cache.put(digest, "v1", {'category': "NORMAL", 'priority_score': 4})
+
+    assert cache.get(digest, "v1") == {'category': "NORMAL", 'priority_score': 4}
+    assert cache.get(digest, "v2") is None
+    assert cache.get_statistics() == {'cached_verdicts': 1, 'hits': 1, 'misses': 1}
+
+
+def test_expired_verdicts_miss_and_are_pruned(cache, monkeypatch):
+    cache.put("digest", "v1", {'category': "NORMAL"})
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+
+    assert cache.get("digest", "v1") is None
+
+    cache.prune("v1")
+    assert cache.get_statistics()['cached_verdicts'] == 0
+
+
+def test_prune_drops_other_versions(cache):
+    cache.put("digest", "v1", {'category': "NORMAL"})
+    cache.put("digest", "v2", {'category': "URGENT"})
+
+    cache.prune("v2")
+
+    assert cache.get("digest", "v1") is None
+    assert cache.get("digest", "v2") == {'category': "URGENT"}
+
+
+def test_verdicts_survive_a_restart(tmp_path):
+    path = str(tmp_path / "verdicts.db")
+    first = VerdictCache(path=path)
+    first.put("digest", "v1", {'category': "NORMAL"})
+    first.close()
+
+    reopened = VerdictCache(path=path)
+    assert reopened.get("digest", "v1") == {'category': "NORMAL"}
+    reopened.close()
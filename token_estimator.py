@@ -0,0 +1,32 @@
+"""
+Token Estimator - Fast local token counts without a tokenizer dependency
+Good enough to decide whether a prompt is worth compressing or how much rate budget it needs
+"""
+
+import re
+
+
+# Words, numbers, and single punctuation/symbol characters
+TOKEN_PIECE_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+# Long words split into several subword tokens
+CHARS_PER_SUBWORD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate how many LLM tokens a text uses
+
+    Counts words (one token per ~4 letters), digit runs and symbols, then
+    takes the larger of that and the usual ~4 characters per token.
+    """
+
+    if not text:
+        return 0
+
+    pieces = 0
+    for match in TOKEN_PIECE_RE.finditer(text):
+        length = match.end() - match.start()
+        pieces += 1 if length <= CHARS_PER_SUBWORD else -(-length // CHARS_PER_SUBWORD)
+
+    return max(pieces, len(text) // 4, 1)
@@ -0,0 +1,186 @@
+"""
+Triage Pipeline - Overlapping fetch → compress → analyze stages
+Bounded queues between stages keep memory flat for any date range
+"""
+
+import queue
+import threading
+from typing import Dict, Iterator, Optional, Tuple
+
+from config import PIPELINE_COMPRESS_WORKERS, PIPELINE_ANALYZE_WORKERS, PIPELINE_QUEUE_SIZE, EMAIL_TIME_BUDGET_SECONDS
+from email_analyzer import EmailAnalyzer, EmailAnalysisResult
+from gmail_connector import GmailConnector
+from resilience import time_budget
+
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class TriagePipeline:
+    """
+    Runs IMAP download, ScaleDown compression and Gemini analysis concurrently
+
+    One thread streams emails from GmailConnector.iter_emails, a pool of
+    workers compresses them (verdict cache hits skip ahead), and another pool
+    calls Gemini. When a downstream queue is full the upstream stage blocks,
+    which in turn pauses the IMAP stream.
+    """
+
+    def __init__(self, gmail: GmailConnector, analyzer: EmailAnalyzer,
+                 compress_workers: int = PIPELINE_COMPRESS_WORKERS,
+                 analyze_workers: int = PIPELINE_ANALYZE_WORKERS,
+                 queue_size: int = PIPELINE_QUEUE_SIZE):
+        self.gmail = gmail
+        self.analyzer = analyzer
+        self.compress_workers = max(1, compress_workers)
+        self.analyze_workers = max(1, analyze_workers)
+        self.queue_size = max(1, queue_size)
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def run(self, date_range: str = "latest7", query: Optional[str] = None,
+            folder: Optional[str] = None) -> Iterator[Tuple[Dict, EmailAnalysisResult]]:
+        """
+        Yield (email, analysis) pairs as each email finishes, in completion order
+
+        The Gmail connection is used only by the fetch thread until the
+        generator is exhausted or closed.
+        """
+
+        self._stop.clear()
+        self._stats = {'fetched': 0, 'compressed': 0, 'cached': 0, 'analyzed': 0, 'failed': 0}
+
+        compress_queue = queue.Queue(self.queue_size)
+        analyze_queue = queue.Queue(self.queue_size)
+        result_queue = queue.Queue(self.queue_size)
+
+        # Instructions are shared by every email - compress them before the workers start
+        instructions = self.analyzer.analysis_instructions()
+        compressors_left = [self.compress_workers]
+
+        threads = [threading.Thread(
+            target=self._fetch_stage, args=(date_range, query, folder, compress_queue),
+            name="pipeline-fetch", daemon=True
+        )]
+        threads += [threading.Thread(
+            target=self._compress_stage, args=(compress_queue, analyze_queue, result_queue, compressors_left),
+            name=f"pipeline-compress-{n}", daemon=True
+        ) for n in range(self.compress_workers)]
+        threads += [threading.Thread(
+            target=self._analyze_stage, args=(analyze_queue, result_queue, instructions),
+            name=f"pipeline-analyze-{n}", daemon=True
+        ) for n in range(self.analyze_workers)]
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            analyzers_left = self.analyze_workers
+            while analyzers_left:
+                item = result_queue.get()
+                if item is _DONE:
+                    analyzers_left -= 1
+                    continue
+                yield item
+        finally:
+            # Consumer stopped early (or finished) - unblock and retire every stage
+            self._stop.set()
+            # The caller reuses the IMAP session next, so wait until the fetch thread is really out of it
+            threads[0].join()
+            for thread in threads[1:]:
+                thread.join(timeout=5)
+
+    def get_statistics(self) -> Dict:
+        """Get per-stage counts for the current/last run"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _fetch_stage(self, date_range: str, query: Optional[str], folder: Optional[str], out: queue.Queue):
+        try:
+            for email_data in self.gmail.iter_emails(date_range, query=query, folder=folder):
+                if not self._put(out, email_data):
+                    break
+                self._count('fetched')
+        except Exception as e:
+            print(f"   ❌ Pipeline fetch error: {e}")
+        finally:
+            for _ in range(self.compress_workers):
+                self._put(out, _DONE)
+
+    def _compress_stage(self, inbox: queue.Queue, out: queue.Queue, results: queue.Queue, compressors_left: list):
+        try:
+            while True:
+                email_data = self._get(inbox)
+                if email_data is _DONE:
+                    break
+
+                try:
+                    digest, cached_result = self.analyzer.local_verdict(email_data)
+                    if cached_result is not None:
+                        self._count('cached')
+                        self._put(results, (email_data, cached_result))
+                        continue
+
+                    with time_budget(EMAIL_TIME_BUDGET_SECONDS):
+                        compressed_context = self.analyzer.compress_email(email_data)['compressed_prompt']
+                    self._count('compressed')
+                    self._put(out, (email_data, digest, compressed_context))
+                except Exception as e:
+                    print(f"   ⚠️  Compression stage error: {e}")
+                    self._count('failed')
+                    self._put(results, (email_data, self.analyzer.fallback_analysis(email_data)))
+        finally:
+            # The last compressor to finish tells every analyzer to stop
+            with self._lock:
+                compressors_left[0] -= 1
+                last = compressors_left[0] == 0
+            if last:
+                for _ in range(self.analyze_workers):
+                    self._put(out, _DONE)
+
+    def _analyze_stage(self, inbox: queue.Queue, results: queue.Queue, instructions: str):
+        try:
+            while True:
+                item = self._get(inbox)
+                if item is _DONE:
+                    break
+
+                email_data, digest, compressed_context = item
+                try:
+                    with time_budget(EMAIL_TIME_BUDGET_SECONDS):
+                        result = self.analyzer.analyze_compressed(email_data, compressed_context, instructions, digest)
+                    self._count('analyzed')
+                except Exception as e:
+                    print(f"   ⚠️  Analysis stage error: {e}")
+                    self._count('failed')
+                    result = self.analyzer.fallback_analysis(email_data)
+
+                self._put(results, (email_data, result))
+        finally:
+            self._put(results, _DONE)
+
+    def _put(self, target: queue.Queue, item) -> bool:
+        """Blocking put that gives up once the pipeline is stopped"""
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source: queue.Queue):
+        """Blocking get that returns _DONE once the pipeline is stopped"""
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _count(self, stage: str):
+        with self._lock:
+            self._stats[stage] += 1
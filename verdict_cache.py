@@ -0,0 +1,91 @@
+"""
+Verdict Cache - Local SQLite store of AI analysis responses
+Keyed by a normalized digest of sender, subject and body, versioned by prompt and model
+"""
+
+import hashlib
+import json
+import re
+import time
+from typing import Dict, Optional
+
+from config import VERDICT_CACHE_PATH, VERDICT_CACHE_TTL_SECONDS
+from sqlite_store import SqliteStore, sender_address
+
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+class VerdictCache(SqliteStore):
+    """On-disk cache of parsed Gemini analysis dicts"""
+
+    size_label = 'cached_verdicts'
+
+    def __init__(self, path: str = VERDICT_CACHE_PATH, ttl_seconds: float = VERDICT_CACHE_TTL_SECONDS):
+        super().__init__(path)
+        self.ttl_seconds = ttl_seconds
+
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS verdicts (
+                digest TEXT NOT NULL,
+                version TEXT NOT NULL,
+                data TEXT NOT NULL,
+                cached_at REAL NOT NULL,
+                PRIMARY KEY (digest, version)
+            )
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def email_digest(email_data: Dict) -> str:
+        """Digest that ignores case and whitespace differences and display names"""
+
+        sender = sender_address(email_data.get('sender', ''))
+        subject = WHITESPACE_RE.sub(' ', email_data.get('subject', '')).strip().lower()
+        body = WHITESPACE_RE.sub(' ', email_data.get('body', '')).strip().lower()
+
+        raw = "\x00".join([sender, subject, body])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def make_version(*parts: str) -> str:
+        """Version tag from the prompt text and model names - any change invalidates old verdicts"""
+        return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()[:16]
+
+    def get(self, digest: str, version: str) -> Optional[Dict]:
+        """Look up a cached AI response for this email and prompt/model version"""
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, cached_at FROM verdicts WHERE digest = ? AND version = ?",
+                (digest, version)
+            ).fetchone()
+
+            if row is None or (self.ttl_seconds and time.time() - row[1] > self.ttl_seconds):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, digest: str, version: str, ai_response: Dict):
+        """Store a validated AI response"""
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?)",
+                (digest, version, json.dumps(ai_response), time.time())
+            )
+            self._db.commit()
+
+    def prune(self, version: str):
+        """Drop verdicts from other prompt/model versions and expired ones"""
+
+        with self._lock:
+            self._db.execute("DELETE FROM verdicts WHERE version != ?", (version,))
+            if self.ttl_seconds:
+                self._db.execute("DELETE FROM verdicts WHERE cached_at < ?", (time.time() - self.ttl_seconds,))
+            self._db.commit()
+
+    def _size(self) -> int:
+        return self._count_rows("verdicts")